@@ -0,0 +1,64 @@
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机，一次扫描找出文本中所有模式的出现位置"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._own: List[List[Tuple[int, Any]]] = [[]]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        self._built = True
+
+    def add(self, pattern: str, value: Any = None):
+        """添加模式串，value为匹配时返回的附带值（默认为模式串本身）"""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+                self._output.append([])
+            node = next_node
+        self._own[node].append((len(pattern), pattern if value is None else value))
+        self._built = False
+
+    def build(self):
+        """构建失败指针（BFS），添加模式后会在下次匹配前自动调用"""
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            self._output[node] = list(self._own[node])
+            queue.append(node)
+        while queue:
+            current = queue.popleft()
+            for char, child in self._goto[current].items():
+                queue.append(child)
+                fail = self._fail[current]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._own[child] + self._output[self._fail[child]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """返回所有匹配 (start, end, value)，end为开区间"""
+        if not self._built:
+            self.build()
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._output[node]:
+                yield index - length + 1, index + 1, value
+
+    def __len__(self) -> int:
+        return len(self._goto) - 1
@@ -1,67 +1,313 @@
 from typing import Dict, List, Optional
+import json
+import logging
 import openai
 from datetime import datetime, timedelta
 from config import Config
 from db_handler import HRDatabaseHandler
+from async_db import AsyncHRDatabase
+from intent_router import IntentRouter
+from employee_index import EmployeeIndex
+from date_parser import parse_date_range
+from metrics import INTENT_SOURCE, LLM_TOKENS
+from reply_pages import NEXT_PAGE_HINT, render_table
+from tracing import annotate, current_request_id, span
+
+logger = logging.getLogger(__name__)
+
+# 支持的查询意图
+INTENTS = ["个人信息", "考勤", "考勤统计", "履历", "部门", "下属", "搜索", "导出", "未知"]
+
+# 一次调用同时返回意图、员工和日期范围的函数定义
+QUERY_PARSER_FUNCTION = {
+    "name": "route_hr_query",
+    "description": "解析人力资源查询，返回意图及查询所需参数",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "intent": {
+                "type": "string",
+                "enum": INTENTS,
+                "description": "查询意图"
+            },
+            "employee_id": {
+                "type": "string",
+                "description": "查询中提到的员工工号，没有则留空"
+            },
+            "name": {
+                "type": "string",
+                "description": "查询中提到的员工姓名，没有则留空"
+            },
+            "start_date": {
+                "type": "string",
+                "description": "查询日期范围的开始日期，格式YYYY-MM-DD，没有则留空"
+            },
+            "end_date": {
+                "type": "string",
+                "description": "查询日期范围的结束日期，格式YYYY-MM-DD，没有则留空"
+            },
+            "department": {
+                "type": "string",
+                "description": "查询中提到的部门名称，没有则留空"
+            },
+            "search_term": {
+                "type": "string",
+                "description": "搜索员工时使用的关键词，没有则留空"
+            }
+        },
+        "required": ["intent"]
+    }
+}
+
+# 分页显示的查询：标题、表格列（表头, 字段名）
+PAGE_LAYOUTS = {
+    "个人信息": ("员工信息", [("姓名", "name"), ("工号", "employee_id"), ("部门", "department_name"),
+                        ("职位", "position_name"), ("邮箱", "email")]),
+    "考勤": ("考勤记录", [("日期", "date"), ("签到时间", "check_in"), ("签退时间", "check_out"), ("状态", "status")]),
+    "部门": ("部门信息", [("部门名称", "department_name"), ("部门主管", "manager_name"), ("部门描述", "description")]),
+    "下属": ("下属员工", [("姓名", "name"), ("工号", "employee_id"), ("部门", "department_name"),
+                      ("职位", "position_name"), ("邮箱", "email")]),
+    "搜索": ("搜索结果", [("姓名", "name"), ("工号", "employee_id"), ("部门", "department_name"),
+                      ("职位", "position_name")]),
+}
+
+# 分页键：下一页从本页最后一条记录的该字段之后继续；搜索结果按相关度排序，使用偏移量
+PAGE_KEYS = {"个人信息": "employee_id", "考勤": "date", "部门": "department_id", "下属": "employee_id"}
+
+PAGE_EMPTY_MESSAGES = {
+    "个人信息": "未找到相关员工信息",
+    "考勤": "未找到相关考勤记录",
+    "部门": "未找到相关部门信息",
+    "下属": "没有找到下属员工",
+    "搜索": "未找到匹配的员工信息",
+}
+
+# 未提到员工时默认查询发送者本人的意图
+SELF_INTENTS = {"个人信息", "考勤", "履历", "下属"}
+# 需要唯一员工（按工号查询）的意图，只给出姓名且重名时先列出候选员工
+SINGLE_EMPLOYEE_INTENTS = {"考勤", "考勤统计", "履历", "下属"}
+
+PERMISSION_DENIED = "抱歉，您只能查询本人、下属及所管理部门的数据"
 
 class HRAIAgent:
     def __init__(self):
         self.db = HRDatabaseHandler()
+        self.adb = AsyncHRDatabase(self.db)
         openai.api_key = Config.OPENAI_API_KEY
         self.context = Config.AGENT_PROMPT_TEMPLATE
+        self.router = IntentRouter()
+        self.employee_index = EmployeeIndex(
+            self.db, Config.EMPLOYEE_INDEX_REFRESH, Config.EMPLOYEE_INDEX_FULL_RELOAD_INTERVAL
+        )
+        self.org = self.db.org_graph
+
+    async def warm_up(self):
+        """预热连接池和内存索引，使首条消息不承担初始化开销"""
+        await self.adb.run(self.db.ping)
+        await self.adb.run(self.employee_index.refresh, True)
+        await self.adb.run(self.org.refresh, True)
+        await self.adb.run(self.db.ensure_search_index)
+
+    def start(self):
+        """启动后台任务（考勤汇总和员工搜索索引同步）"""
+        self.db.start_background_sync()
 
     def _extract_date_range(self, query: str) -> tuple:
         """从查询中提取日期范围"""
-        # 默认查询最近一个月
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
+        date_range = parse_date_range(query)
+        if date_range:
+            start_date, end_date = date_range
+        else:
+            # 默认查询最近一个月
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=30)
         
-        # TODO: 使用NLP提取具体的日期范围
         return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
 
     def _extract_employee_info(self, query: str) -> tuple:
         """从查询中提取员工信息"""
-        # TODO: 使用NLP提取员工ID或姓名
+        candidates = self.employee_index.resolve(query)
+        if len(candidates) == 1:
+            return str(candidates[0]['employee_id']), candidates[0].get('name')
+        if candidates:
+            # 重名或提到多人时按姓名查询，返回所有候选员工
+            names = {c.get('name') for c in candidates}
+            if len(names) == 1:
+                return None, names.pop()
         return None, None
 
-    def process_query(self, query: str) -> Dict:
-        """处理用户查询并返回响应"""
+    async def _resolve_department(self, query: str, name: str = None) -> Optional[str]:
+        """将查询中提到的部门名称解析为部门ID，有多个匹配时取名称最长的"""
+        departments = await self.adb.get_department_info()
+        if not isinstance(departments, list):
+            return None
+        mentioned = [
+            d for d in departments
+            if d.get('department_name') and (d['department_name'] in query or d['department_name'] == name)
+        ]
+        if not mentioned:
+            return None
+        return max(mentioned, key=lambda d: len(d['department_name']))['department_id']
+
+    async def _parse_query(self, query: str) -> Dict:
+        """解析意图、员工信息和日期范围，本地识别置信度不足时才调用LLM"""
+        with span('intent_router') as record:
+            prediction = self.router.classify(query)
+            record['confidence'] = round(prediction.confidence, 3)
+        if prediction.intent != "未知" and prediction.confidence >= Config.INTENT_ROUTER_THRESHOLD:
+            parsed = {"intent": prediction.intent, "source": "local"}
+        else:
+            parsed = await self._parse_query_with_llm(query)
+            parsed["source"] = "llm"
+        # 员工索引和组织架构到期刷新会查询数据库，放到数据库线程池中执行
+        await self.adb.run(self.employee_index.refresh)
+        await self.adb.run(self.org.refresh)
+        parsed = self._complete_parsed_query(query, parsed)
+        annotate(intent=parsed["intent"], intent_source=parsed["source"])
+        INTENT_SOURCE.inc(intent=parsed["intent"], source=parsed["source"])
+        return parsed
+
+    async def _parse_query_with_llm(self, query: str) -> Dict:
+        """通过一次结构化LLM调用解析意图、员工信息和日期范围"""
+        try:
+            with span('llm_parse', model=Config.OPENAI_MODEL):
+                response = await openai.ChatCompletion.acreate(
+                    model=Config.OPENAI_MODEL,
+                    messages=[
+                        {"role": "system", "content": self.context},
+                        {"role": "system", "content": f"今天是{datetime.now().strftime('%Y-%m-%d')}，请调用route_hr_query解析用户查询。"},
+                        {"role": "user", "content": query}
+                    ],
+                    functions=[QUERY_PARSER_FUNCTION],
+                    function_call={"name": QUERY_PARSER_FUNCTION["name"]},
+                    temperature=0
+                )
+            usage = response.get("usage") or {}
+            LLM_TOKENS.inc(usage.get("prompt_tokens", 0), model=Config.OPENAI_MODEL, kind="prompt")
+            LLM_TOKENS.inc(usage.get("completion_tokens", 0), model=Config.OPENAI_MODEL, kind="completion")
+            parsed = json.loads(response.choices[0].message["function_call"]["arguments"])
+        except Exception:
+            # 如果API调用失败，使用简单的关键词匹配
+            parsed = {"intent": self._match_intent_keywords(query)}
+        return parsed
+
+    def _complete_parsed_query(self, query: str, parsed: Dict) -> Dict:
+        """校验解析结果，缺失的参数使用本地规则补全"""
+        if parsed.get("intent") not in INTENTS:
+            parsed["intent"] = "未知"
+
+        if not parsed.get("employee_id") and not parsed.get("name"):
+            parsed["employee_id"], parsed["name"] = self._extract_employee_info(query)
+        if not self._is_valid_date(parsed.get("start_date")) or not self._is_valid_date(parsed.get("end_date")):
+            parsed["start_date"], parsed["end_date"] = self._extract_date_range(query)
+        # 未给出搜索词时由数据库层从原始查询中提取
+        parsed["search_term"] = parsed.get("search_term") or parsed.get("name") or query
+        return parsed
+
+    @staticmethod
+    def _is_valid_date(value: Optional[str]) -> bool:
+        """检查日期是否为YYYY-MM-DD格式"""
+        try:
+            datetime.strptime(value, '%Y-%m-%d')
+            return True
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def _mentions_self(query: str) -> bool:
+        """查询是否问的是发送者本人（“帮我”“给我”不算）"""
+        return "我" in query.replace("帮我", "").replace("给我", "")
+
+    def _may_view(self, viewer: Optional[str], employee_id: str = None, department_id: str = None) -> bool:
+        """
+        按组织架构检查查询范围
+
+        viewer为None（不限制权限）或属于HR_ADMIN_DEPARTMENTS时不限制；
+        其他人只能查看本人、下属及所管理部门（含下级部门）的数据。
+        """
+        if viewer is None or self.org.is_admin(viewer, Config.HR_ADMIN_DEPARTMENTS):
+            return True
+        if employee_id:
+            return self.org.can_view_employee(viewer, employee_id)
+        if department_id:
+            return self.org.can_view_department(viewer, department_id)
+        return False
+
+    async def process_query(self, query: str, viewer: str = None) -> Dict:
+        """
+        处理用户查询并返回响应
+
+        Args:
+            query: 用户查询
+            viewer: 发送者的工号，用于默认查询本人及限制查询范围；为None时不限制
+        """
         try:
-            # 使用OpenAI分析查询意图
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": self.context},
-                    {"role": "user", "content": query}
-                ]
-            )
-            
             # 解析意图和所需信息
-            intent = self._analyze_intent(query)
-            
-            if "个人信息" in intent or "基本信息" in intent:
-                employee_id, name = self._extract_employee_info(query)
-                result = self.db.get_employee_info(employee_id, name)
-                return self._format_employee_info_response(result)
-                
-            elif "考勤" in intent or "出勤" in intent:
-                employee_id, _ = self._extract_employee_info(query)
-                start_date, end_date = self._extract_date_range(query)
-                result = self.db.get_attendance_records(employee_id, start_date, end_date)
-                return self._format_attendance_response(result)
-                
-            elif "履历" in intent or "经历" in intent or "职业发展" in intent:
-                employee_id, _ = self._extract_employee_info(query)
-                result = self.db.get_career_history(employee_id)
-                return self._format_career_response(result)
-                
-            elif "部门" in intent:
-                result = self.db.get_department_info()
-                return self._format_department_response(result)
-                
-            elif "搜索" in intent:
-                result = self.db.search_employees(query)
-                return self._format_search_response(result)
+            parsed = await self._parse_query(query)
+            intent = parsed["intent"]
+            employee_id = parsed.get("employee_id") or None
+            name = parsed.get("name") or None
+            if viewer and not employee_id and not name and (intent in SELF_INTENTS or self._mentions_self(query)):
+                employee_id = viewer
+            if intent in SINGLE_EMPLOYEE_INTENTS and not employee_id and name:
+                # 这些意图按工号查询，按姓名取唯一匹配的员工；重名时列出候选员工
+                employees = await self.adb.get_employees_by_name(name)
+                if isinstance(employees, dict) and 'error' in employees:
+                    return {"type": "text", "content": employees['error']}
+                # 只考虑发送者有权查看的同名员工，无权查看的不出现在候选列表中
+                visible = [e for e in employees if self._may_view(viewer, str(e['employee_id']))]
+                if employees and not visible:
+                    return {"type": "text", "content": PERMISSION_DENIED}
+                if len(visible) != 1:
+                    with span('format'):
+                        response = self._render_page("个人信息", visible, {"employee_id": None, "name": name})
+                    # 候选列表不翻页，“下一页”会按姓名模糊查询而不经过权限过滤
+                    if response.pop("next", None):
+                        response["content"] = response["content"].replace(f"\n\n{NEXT_PAGE_HINT}", "")
+                    return response
+                employee_id = str(visible[0]['employee_id'])
+
+            if intent == "部门":
+                department_id = await self._resolve_department(query, parsed.get("department"))
+                if department_id is not None:
+                    with span('format'):
+                        return self._format_department_detail(department_id)
+
+            elif intent == "下属" and not employee_id:
+                return {"type": "text", "content": "请说明要查询哪位主管的下属，例如：张三的下属有哪些"}
+
+            if intent in PAGE_LAYOUTS:
+                if intent not in ("部门", "搜索") and not self._may_view(viewer, employee_id):
+                    return {"type": "text", "content": PERMISSION_DENIED}
+                return await self._query_page(intent, {
+                    "employee_id": employee_id,
+                    "name": name,
+                    "start_date": parsed["start_date"],
+                    "end_date": parsed["end_date"],
+                    "search_term": parsed["search_term"],
+                })
+
+            elif intent == "考勤统计":
+                department_id = None
+                if not employee_id:
+                    department_id = await self._resolve_department(query, parsed.get("department"))
+                if not self._may_view(viewer, employee_id, department_id):
+                    return {"type": "text", "content": PERMISSION_DENIED}
+                result = await self.adb.get_attendance_summary(
+                    parsed["start_date"], parsed["end_date"], employee_id, department_id
+                )
+                with span('format'):
+                    return self._format_attendance_summary_response(result, parsed)
+
+            elif intent == "导出":
+                return await self._prepare_export(query, parsed, viewer)
+
+            elif intent == "履历":
+                if not self._may_view(viewer, employee_id):
+                    return {"type": "text", "content": PERMISSION_DENIED}
+                result = await self.adb.get_career_history(employee_id)
+                with span('format'):
+                    return self._format_career_response(result)
                 
             else:
                 return {
@@ -70,73 +316,166 @@ class HRAIAgent:
                 }
                 
         except Exception as e:
+            logger.exception("处理查询时发生错误，请求ID %s", current_request_id())
             return {
                 "type": "text",
-                "content": f"处理查询时发生错误: {str(e)}"
+                "content": f"处理查询时发生错误: {str(e)}（请求ID: {current_request_id()}）"
             }
 
-    def _analyze_intent(self, query: str) -> str:
-        """分析查询意图"""
+    async def _prepare_export(self, query: str, parsed: Dict, viewer: str = None) -> Dict:
+        """
+        解析部门报表导出请求
+
+        报表由DingTalkHandler交给后台导出进程生成，响应中的export为导出任务参数。
+        """
+        department_id = await self._resolve_department(query, parsed.get("department"))
+        if department_id is None:
+            return {"type": "text", "content": "请说明要导出哪个部门的数据，例如：导出技术部上个月的考勤"}
+        if not self._may_view(viewer, department_id=department_id):
+            return {"type": "text", "content": PERMISSION_DENIED}
+        kind = "attendance" if any(word in query for word in ("考勤", "出勤", "打卡")) else "employees"
+        export_format = "csv" if "csv" in query.lower() else Config.EXPORT_FORMAT
+        title = "考勤" if kind == "attendance" else "员工"
+        period = f"（{parsed['start_date']} 至 {parsed['end_date']}）" if kind == "attendance" else ""
+        return {
+            "type": "text",
+            "content": f"正在生成部门{title}报表{period}，完成后会发送下载链接",
+            "export": {
+                "kind": kind,
+                "department_id": str(department_id),
+                "start_date": parsed["start_date"],
+                "end_date": parsed["end_date"],
+                "format": export_format,
+            }
+        }
+
+    async def next_page(self, state: Dict) -> Dict:
+        """按上一页返回的分页状态继续查询下一页"""
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "请分析以下人力资源相关查询的意图，可能的意图包括：个人信息查询、考勤查询、履历查询、部门查询、搜索员工"},
-                    {"role": "user", "content": query}
-                ]
-            )
-            return response.choices[0].message.content
-        except Exception:
-            # 如果API调用失败，使用简单的关键词匹配
-            intents = {
-                "个人信息": ["个人", "信息", "基本"],
-                "考勤": ["考勤", "出勤", "打卡"],
-                "履历": ["履历", "经历", "职业", "发展"],
-                "部门": ["部门", "团队"],
-                "搜索": ["搜索", "查找", "查询"]
+            annotate(intent=state["intent"], intent_source="page")
+            return await self._query_page(state["intent"], state["params"], state["cursor"], state.get("page", 1))
+        except Exception as e:
+            logger.exception("查询下一页时发生错误，请求ID %s", current_request_id())
+            return {
+                "type": "text",
+                "content": f"处理查询时发生错误: {str(e)}（请求ID: {current_request_id()}）"
             }
-            
-            for intent, keywords in intents.items():
-                if any(keyword in query for keyword in keywords):
-                    return intent
-            return "未知"
 
-    def _format_employee_info_response(self, data: List[Dict]) -> Dict:
-        """格式化员工信息响应"""
-        if not data:
-            return {"type": "text", "content": "未找到相关员工信息"}
+    @staticmethod
+    def _page_size(intent: str) -> int:
+        return Config.SEARCH_RESULT_LIMIT if intent == "搜索" else Config.REPLY_PAGE_SIZE
+
+    async def _query_page(self, intent: str, params: Dict, cursor=None, page: int = 0) -> Dict:
+        """
+        查询一页结果
+
+        多取一条记录用于判断是否还有下一页，cursor为上一页返回的分页键（搜索为偏移量）。
+        """
+        limit = self._page_size(intent) + 1
+        if intent == "个人信息":
+            rows = await self.adb.get_employee_info(params.get("employee_id"), params.get("name"), limit, cursor)
+        elif intent == "考勤":
+            rows = await self.adb.get_attendance_records(
+                params.get("employee_id"), params["start_date"], params["end_date"], limit, cursor
+            )
+        elif intent == "部门":
+            rows = await self.adb.get_department_info(None, limit, cursor)
+        elif intent == "下属":
+            rows = self.org.page(self.org.subordinates(params["employee_id"]), limit, cursor)
+        else:
+            rows = await self.adb.search_employees(params["search_term"], limit, cursor or 0)
+        with span('format'):
+            return self._render_page(intent, rows, params, cursor, page)
+
+    def _render_page(self, intent: str, rows: List[Dict], params: Dict, cursor=None, page: int = 0) -> Dict:
+        """
+        将一页记录渲染为markdown表格
+
+        超出REPLY_MAX_CHARS或每页条数的记录留到下一页，响应中的next为继续查询所需的分页状态。
+        """
+        if isinstance(rows, dict) and 'error' in rows:
+            return {"type": "text", "content": rows['error']}
+        if not rows:
+            return {"type": "text", "content": "没有更多结果了" if page else PAGE_EMPTY_MESSAGES[intent]}
+
+        title, columns = PAGE_LAYOUTS[intent]
+        if page:
+            title = f"{title}（第{page + 1}页）"
+        budget = Config.REPLY_MAX_CHARS - len(NEXT_PAGE_HINT) - 2
+        content, shown = render_table(title, columns, rows[:self._page_size(intent)], budget)
+        response = {"type": "markdown", "content": content}
+        if len(rows) > shown:
+            if intent in PAGE_KEYS:
+                next_cursor = str(rows[shown - 1][PAGE_KEYS[intent]])
+            else:
+                next_cursor = (cursor or 0) + shown
+            response["content"] = f"{content}\n\n{NEXT_PAGE_HINT}"
+            response["next"] = {"intent": intent, "params": params, "cursor": next_cursor, "page": page + 1}
+        return response
+
+    def _match_intent_keywords(self, query: str) -> str:
+        """使用关键词匹配查询意图"""
+        intents = {
+            "个人信息": ["个人", "信息", "基本"],
+            "导出": ["导出", "报表", "下载", "excel", "csv"],
+            "下属": ["下属", "手下", "汇报"],
+            "考勤统计": ["统计", "汇总", "几次", "几天", "多少次", "平均"],
+            "考勤": ["考勤", "出勤", "打卡"],
+            "履历": ["履历", "经历", "职业", "发展"],
+            "部门": ["部门", "团队"],
+            "搜索": ["搜索", "查找", "查询"]
+        }
         
-        if isinstance(data, dict) and 'error' in data:
-            return {"type": "text", "content": data['error']}
-            
-        response = "员工信息如下：\n\n"
-        for employee in data:
-            response += f"姓名：{employee.get('name', 'N/A')}\n"
-            response += f"工号：{employee.get('employee_id', 'N/A')}\n"
-            response += f"部门：{employee.get('department_name', 'N/A')}\n"
-            response += f"职位：{employee.get('position_name', 'N/A')}\n"
-            response += f"邮箱：{employee.get('email', 'N/A')}\n"
-            response += "-------------------\n"
-            
-        return {"type": "text", "content": response.strip()}
+        for intent, keywords in intents.items():
+            if any(keyword in query for keyword in keywords):
+                return intent
+        return "未知"
 
-    def _format_attendance_response(self, data: List[Dict]) -> Dict:
-        """格式化考勤记录响应"""
-        if not data:
-            return {"type": "text", "content": "未找到相关考勤记录"}
-            
+    def _format_attendance_summary_response(self, data: Dict, parsed: Dict) -> Dict:
+        """格式化考勤统计响应"""
         if isinstance(data, dict) and 'error' in data:
             return {"type": "text", "content": data['error']}
-            
-        response = "考勤记录如下：\n\n"
-        for record in data:
-            response += f"日期：{record.get('date', 'N/A')}\n"
-            response += f"签到时间：{record.get('check_in', 'N/A')}\n"
-            response += f"签退时间：{record.get('check_out', 'N/A')}\n"
-            response += f"状态：{record.get('status', 'N/A')}\n"
-            response += "-------------------\n"
-            
-        return {"type": "text", "content": response.strip()}
+        if not data or not data.get('total_days'):
+            return {"type": "text", "content": "该时间段内没有考勤记录"}
+
+        lines = [
+            f"考勤统计（{parsed['start_date']} 至 {parsed['end_date']}）：",
+            "",
+            f"记录天数：{data['total_days']}",
+            f"正常：{data.get('normal_days', 0)}",
+            f"迟到：{data.get('late_days', 0)}",
+            f"早退：{data.get('early_leave_days', 0)}",
+            f"缺勤：{data.get('absent_days', 0)}",
+            f"请假：{data.get('leave_days', 0)}",
+        ]
+        if data.get('other_days'):
+            lines.append(f"其他：{data['other_days']}")
+        lines.append(f"平均签到时间：{data.get('average_check_in') or 'N/A'}")
+        lines.append(f"总工时：{data.get('total_hours', 0)}小时")
+
+        return {"type": "text", "content": "\n".join(lines)}
+
+    def _format_department_detail(self, department_id: str) -> Dict:
+        """格式化单个部门的信息：上级部门、主管、含下级部门的人数及下级部门"""
+        department = self.org.get_department(department_id)
+        if department is None:
+            return {"type": "text", "content": "未找到相关部门信息"}
+
+        def name_of(other_id: str) -> str:
+            other = self.org.get_department(other_id) or {}
+            return other.get('department_name') or other_id
+
+        ancestors = self.org.ancestors(department_id)
+        children = self.org.children(department_id)
+        lines = [
+            f"部门：{department.get('department_name')}",
+            f"上级部门：{' > '.join(name_of(a) for a in reversed(ancestors)) if ancestors else '无'}",
+            f"部门主管：{department.get('manager_name') or 'N/A'}",
+            f"人数：{self.org.headcount(department_id)}（含下级部门），其中本部门{self.org.headcount(department_id, recursive=False)}",
+        ]
+        if children:
+            lines.append(f"下级部门：{'、'.join(name_of(c) for c in children)}")
+        return {"type": "text", "content": "\n".join(lines)}
 
     def _format_career_response(self, data: List[Dict]) -> Dict:
         """格式化职业发展历程响应"""
@@ -146,51 +485,19 @@ class HRAIAgent:
         if isinstance(data, dict) and 'error' in data:
             return {"type": "text", "content": data['error']}
             
-        response = "职业发展历程如下：\n\n"
+        lines = ["职业发展历程如下：", ""]
         for record in data:
-            response += f"时间段：{record.get('start_date', 'N/A')} 至 {record.get('end_date', 'N/A')}\n"
-            response += f"部门：{record.get('department_name', 'N/A')}\n"
-            response += f"职位：{record.get('position_name', 'N/A')}\n"
-            response += f"职责：{record.get('responsibilities', 'N/A')}\n"
-            response += "-------------------\n"
-            
-        return {"type": "text", "content": response.strip()}
+            lines.extend([
+                f"时间段：{record.get('start_date', 'N/A')} 至 {record.get('end_date', 'N/A')}",
+                f"部门：{record.get('department_name', 'N/A')}",
+                f"职位：{record.get('position_name', 'N/A')}",
+                f"职责：{record.get('responsibilities', 'N/A')}",
+                "-------------------",
+            ])
 
-    def _format_department_response(self, data: List[Dict]) -> Dict:
-        """格式化部门信息响应"""
-        if not data:
-            return {"type": "text", "content": "未找到相关部门信息"}
-            
-        if isinstance(data, dict) and 'error' in data:
-            return {"type": "text", "content": data['error']}
-            
-        response = "部门信息如下：\n\n"
-        for dept in data:
-            response += f"部门名称：{dept.get('department_name', 'N/A')}\n"
-            response += f"部门主管：{dept.get('manager_name', 'N/A')}\n"
-            response += f"部门描述：{dept.get('description', 'N/A')}\n"
-            response += "-------------------\n"
-            
-        return {"type": "text", "content": response.strip()}
-
-    def _format_search_response(self, data: List[Dict]) -> Dict:
-        """格式化搜索结果响应"""
-        if not data:
-            return {"type": "text", "content": "未找到匹配的员工信息"}
-            
-        if isinstance(data, dict) and 'error' in data:
-            return {"type": "text", "content": data['error']}
-            
-        response = "搜索结果如下：\n\n"
-        for employee in data:
-            response += f"姓名：{employee.get('name', 'N/A')}\n"
-            response += f"工号：{employee.get('employee_id', 'N/A')}\n"
-            response += f"部门：{employee.get('department_name', 'N/A')}\n"
-            response += f"职位：{employee.get('position_name', 'N/A')}\n"
-            response += "-------------------\n"
-            
-        return {"type": "text", "content": response.strip()}
+        return {"type": "text", "content": "\n".join(lines)}
 
     def close(self):
         """关闭数据库连接"""
+        self.adb.close()
         self.db.close()
@@ -1,10 +1,20 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from dingtalk_handler import DingTalkHandler
+from job_queue import MessageJobQueue
+from cache import ExpiringKeySet
+from rate_limit import RateLimiter
+from shared_store import SharedStore
+from metrics import REGISTRY
+import tracing
+import asyncio
+import logging
 import uvicorn
 import json
 import hmac
 import base64
+import os
 import time
 from config import Config
 
@@ -19,8 +29,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 创建DingTalk处理器实例
-dingtalk_handler = DingTalkHandler()
+logger = logging.getLogger(__name__)
+
+# 以下对象在startup事件中创建：导入模块时不连接数据库和钉钉，
+# 多进程部署时每个worker进程各自创建
+shared_store: SharedStore = None
+dingtalk_handler: DingTalkHandler = None
+job_queue: MessageJobQueue = None
+seen_messages: ExpiringKeySet = None
+# 多个worker进程各自限流，按进程数均分配额
+rate_limiter = RateLimiter(
+    user_rate=Config.USER_RATE_LIMIT / Config.SERVER_WORKERS,
+    user_burst=max(Config.USER_BURST / Config.SERVER_WORKERS, 1),
+    global_rate=Config.GLOBAL_RATE_LIMIT / Config.SERVER_WORKERS,
+    global_burst=max(Config.GLOBAL_BURST / Config.SERVER_WORKERS, 1)
+)
+ready = False
+
+RATE_LIMITED_REPLIES = {
+    RateLimiter.USER_LIMITED: "您的查询有点频繁，请稍等片刻再试",
+    RateLimiter.GLOBAL_LIMITED: "当前查询较多，请稍后再试",
+}
+
+
+def text_reply(content: str) -> dict:
+    """直接在回调响应中返回的文本消息"""
+    return {"msgtype": "text", "text": {"content": content}}
 
 def verify_signature(timestamp: str, signature: str, request_body: bytes) -> bool:
     """验证钉钉请求签名"""
@@ -38,6 +72,11 @@ def verify_signature(timestamp: str, signature: str, request_body: bytes) -> boo
 @app.post("/webhook")
 async def handle_webhook(request: Request):
     """处理钉钉回调请求"""
+    if not ready:
+        raise HTTPException(status_code=503, detail="服务启动中")
+    # 每条回调一个链路，随消息进入后台队列，各阶段耗时按请求ID关联
+    trace = tracing.Trace()
+    token = tracing.activate(trace)
     try:
         # 获取钉钉的签名信息
         timestamp = request.headers.get("timestamp")
@@ -47,31 +86,150 @@ async def handle_webhook(request: Request):
         body = await request.body()
         
         # 验证签名
-        if not verify_signature(timestamp, signature, body):
+        with tracing.span('verify_signature'):
+            verified = verify_signature(timestamp, signature, body)
+        if not verified:
             raise HTTPException(status_code=401, detail="签名验证失败")
         
         # 解析请求数据
         data = json.loads(body)
         
-        # 处理回调数据
+        # 消息入队后立即应答，由后台worker处理并主动推送回复，避免回调超时重试
         if data.get("type") == "message":
-            response = await dingtalk_handler.handle_message(data.get("message", {}))
-            return response
+            message = data.get("message", {})
+            msg_id = message.get("msgId")
+            if msg_id:
+                trace.request_id = msg_id
+            if msg_id and not seen_messages.add(msg_id):
+                return {"message": "success"}
+            # 超出限流或排队已满时直接回复，不进入LLM和数据库处理
+            limited = rate_limiter.check(message.get("senderStaffId"))
+            if limited:
+                tracing.annotate(intent='rejected', outcome=f'{limited}_rate_limited')
+                tracing.finish(trace)
+                return text_reply(RATE_LIMITED_REPLIES[limited])
+            if not job_queue.submit(message, trace):
+                # 未入队的消息允许钉钉重试时再次处理
+                if msg_id:
+                    seen_messages.discard(msg_id)
+                tracing.annotate(intent='rejected', outcome='queue_full')
+                tracing.finish(trace)
+                return text_reply(RATE_LIMITED_REPLIES[RateLimiter.GLOBAL_LIMITED])
             
         return {"message": "success"}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.exception("回调处理失败，请求ID %s", trace.request_id)
+        raise HTTPException(status_code=500, detail={"error": str(e), "request_id": trace.request_id})
+    finally:
+        tracing.deactivate(token)
 
 @app.get("/health")
 async def health_check():
     """健康检查接口"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查：预热完成、后台worker运行中且数据库可连接时返回200"""
+    checks = {"warmed_up": ready, "workers": bool(job_queue and job_queue.get_stats()["workers"])}
+    try:
+        db = dingtalk_handler.ai_agent
+        checks["database"] = await asyncio.wait_for(db.adb.run(db.db.ping), timeout=Config.READY_TIMEOUT)
+    except Exception:
+        checks["database"] = False
+    status_code = 200 if all(checks.values()) else 503
+    return JSONResponse(status_code=status_code, content={"ready": status_code == 200, "checks": checks})
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus格式的指标：各意图及各阶段的耗时分布、LLM token、数据库查询耗时和缓存命中"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def _collect_runtime_metrics() -> dict:
+    """抓取时读取队列和缓存的当前计数"""
+    queue = job_queue.get_stats()
+    values = {
+        'hr_queue_depth': queue['queue_depth'],
+        'hr_queue_busy_workers': queue['busy_workers'],
+        'hr_queue_rejected': queue['rejected'],
+    }
+    for name, stats in (
+        ('user_cache', dingtalk_handler.user_cache.get_stats()),
+        ('dedup', seen_messages.get_stats()),
+        ('rate_limit', rate_limiter.get_stats()),
+        ('coalesced_queries', dingtalk_handler.inflight_queries.get_stats()),
+        ('db_router', dingtalk_handler.ai_agent.db.router.get_stats()),
+        ('export', dingtalk_handler.exporter.get_stats()),
+        ('org', dingtalk_handler.ai_agent.org.get_stats()),
+        ('reference_cache', dingtalk_handler.ai_agent.db.reference.get_stats()),
+    ):
+        for key, value in stats.items():
+            values[f'hr_{name}_{key}'] = value
+    return values
+
+@app.get("/queue/stats")
+async def queue_stats():
+    """后台消息队列状态：队列深度、worker数量及任务耗时"""
+    return {
+        **job_queue.get_stats(),
+        'dedup': seen_messages.get_stats(),
+        'rate_limit': rate_limiter.get_stats(),
+        'coalesced_queries': dingtalk_handler.inflight_queries.get_stats(),
+        'user_cache': dingtalk_handler.user_cache.get_stats(),
+        'export': dingtalk_handler.exporter.get_stats()
+    }
+
+@app.get("/exports/{filename}")
+async def download_export(filename: str):
+    """下载生成的报表，文件名含随机令牌，过期文件在下次导出时清理"""
+    path = os.path.join(Config.EXPORT_DIR, os.path.basename(filename))
+    if (filename != os.path.basename(filename) or filename.endswith('.part') or not os.path.isfile(path)
+            or time.time() - os.path.getmtime(path) > Config.EXPORT_TTL):
+        raise HTTPException(status_code=404, detail="报表不存在或已过期")
+    return FileResponse(path, filename=filename)
+
+@app.on_event("startup")
+async def startup_event():
+    """创建处理器并预热，完成后启动访问令牌刷新和后台消息处理worker"""
+    global shared_store, dingtalk_handler, job_queue, seen_messages, ready
+    tracing.configure_export(Config.TRACE_EXPORT_PATH)
+    shared_store = SharedStore(Config.SHARED_CACHE_PATH)
+    dingtalk_handler = DingTalkHandler(shared_store)
+    job_queue = MessageJobQueue(
+        dingtalk_handler,
+        workers=Config.JOB_WORKERS,
+        maxsize=Config.JOB_QUEUE_SIZE,
+        max_pending_per_user=Config.JOB_MAX_PENDING_PER_USER,
+        job_timeout=Config.JOB_TIMEOUT,
+        slow_threshold=Config.SLOW_REQUEST_THRESHOLD
+    )
+    # 钉钉会重试回调，已接收的消息ID在有效期内不再处理，各worker进程通过共享存储去重
+    seen_messages = ExpiringKeySet(maxsize=Config.DEDUP_SIZE, ttl=Config.DEDUP_TTL, shared=shared_store)
+
+    try:
+        await dingtalk_handler.warm_up()
+    except Exception:
+        # 预热失败不阻止启动，/ready会持续报告数据库状态
+        logger.exception("预热失败")
+    dingtalk_handler.start()
+    job_queue.start()
+    REGISTRY.register_collector(_collect_runtime_metrics)
+    ready = True
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时的清理工作"""
-    dingtalk_handler.close()
+    global ready
+    ready = False
+    if job_queue:
+        await job_queue.stop()
+    if dingtalk_handler:
+        dingtalk_handler.close()
+    if shared_store:
+        shared_store.close()
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,77 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from config import Config
+from db_handler import HRDatabaseHandler
+from metrics import DB_QUERY_SECONDS
+from tracing import span
+
+
+class AsyncHRDatabase:
+    """
+    HRDatabaseHandler的异步封装
+
+    查询在专用线程池中执行，线程数即并发查询上限（默认等于连接池容量），
+    不会阻塞事件循环，并发请求可同时查询数据库。
+    """
+
+    def __init__(self, db: HRDatabaseHandler, max_workers: int = None):
+        self.db = db
+        self.max_workers = max_workers or Config.DB_MAX_CONCURRENCY
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='hr-db'
+        )
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """在数据库线程池中执行任意阻塞调用，耗时计入当前链路和数据库查询指标"""
+        loop = asyncio.get_running_loop()
+        name = getattr(func, '__name__', 'call')
+        # 复制上下文，使线程中执行的代码也能访问当前链路
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            with span(f'db.{name}'):
+                return await loop.run_in_executor(self._executor, call)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, query=name)
+
+    async def get_employee_info(self, employee_id: str = None, name: str = None,
+                                limit: int = None, after_id: str = None) -> Dict:
+        """获取员工基本信息"""
+        return await self.run(self.db.get_employee_info, employee_id, name, limit, after_id)
+
+    async def get_employees_by_name(self, name: str) -> List[Dict]:
+        """获取同名员工"""
+        return await self.run(self.db.get_employees_by_name, name)
+
+    async def get_attendance_records(self, employee_id: str, start_date: str, end_date: str,
+                                     limit: int = None, after_date: str = None) -> List[Dict]:
+        """获取考勤记录"""
+        return await self.run(self.db.get_attendance_records, employee_id, start_date, end_date, limit, after_date)
+
+    async def get_attendance_summary(self, start_date: str, end_date: str, employee_id: str = None,
+                                     department_id: str = None) -> Dict:
+        """获取考勤统计"""
+        return await self.run(self.db.get_attendance_summary, start_date, end_date, employee_id, department_id)
+
+    async def get_career_history(self, employee_id: str) -> List[Dict]:
+        """获取职业发展历程"""
+        return await self.run(self.db.get_career_history, employee_id)
+
+    async def get_department_info(self, department_id: str = None, limit: int = None,
+                                  after_id: str = None) -> List[Dict]:
+        """获取部门信息"""
+        return await self.run(self.db.get_department_info, department_id, limit, after_id)
+
+    async def search_employees(self, search_term: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """搜索员工信息"""
+        return await self.run(self.db.search_employees, search_term, limit, offset)
+
+    def close(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,127 @@
+"""
+数据库查询路径基准测试
+
+对比pandas路径（pd.read_sql + to_dict）与直接行映射路径的单次查询开销，
+以及导入db_handler与导入pandas的冷启动耗时。
+
+数据写入临时目录中私有的SQLite文件，不读取DB_*环境变量和Config.get_db_url()，
+不会连接或改动实际使用的数据库。pandas只用于对比，不在requirements.txt中，需要对比时单独安装。
+
+用法：
+    python bench_db.py --employees 1000 --days 60 --repeat 200
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+
+from config import Config
+from db_handler import HRDatabaseHandler
+
+
+def create_dataset(engine, employees: int, days: int):
+    """生成基准测试用的员工和考勤数据"""
+    start = date.today() - timedelta(days=days)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE {Config.HR_TABLES['attendance']} "
+            "(employee_id TEXT, date TEXT, check_in TEXT, check_out TEXT, status TEXT)"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX idx_bench_attendance ON {Config.HR_TABLES['attendance']} (employee_id, date)"
+        ))
+        rows = [
+            {
+                'employee_id': f'E{e:06d}',
+                'date': (start + timedelta(days=d)).isoformat(),
+                'check_in': f'09:{random.randint(0, 59):02d}',
+                'check_out': f'18:{random.randint(0, 59):02d}',
+                'status': random.choice(['正常', '正常', '正常', '迟到', '早退'])
+            }
+            for e in range(employees) for d in range(days)
+        ]
+        conn.execute(text(
+            f"INSERT INTO {Config.HR_TABLES['attendance']} "
+            "VALUES (:employee_id, :date, :check_in, :check_out, :status)"
+        ), rows)
+    return start
+
+
+def time_per_query(func, repeat: int) -> float:
+    """平均单次调用耗时（毫秒）"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def time_import(statement: str) -> float:
+    """在新进程中测量导入耗时（毫秒）"""
+    code = f"import time; t = time.perf_counter(); {statement}; print((time.perf_counter() - t) * 1000)"
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return float(output.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HR数据库查询路径基准测试')
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='hr_bench_')
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    try:
+        run(engine, args)
+    finally:
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(engine, args):
+    start = create_dataset(engine, args.employees, args.days)
+    params = {
+        'employee_id': 'E000042',
+        'start_date': start.isoformat(),
+        'end_date': date.today().isoformat()
+    }
+    query = f"""
+            SELECT * FROM {Config.HR_TABLES['attendance']}
+            WHERE employee_id = :employee_id
+            AND date BETWEEN :start_date AND :end_date
+        """
+
+    # 与HRDatabaseHandler查询时相同的行映射路径
+    direct = time_per_query(lambda: HRDatabaseHandler._execute(engine, query, params), args.repeat)
+    print(f"直接行映射: {direct:.3f} ms/查询")
+
+    try:
+        import pandas as pd
+        via_pandas = time_per_query(
+            lambda: pd.read_sql(text(query), engine, params=params).to_dict('records'),
+            args.repeat
+        )
+        print(f"pandas路径: {via_pandas:.3f} ms/查询")
+    except ImportError:
+        print("未安装pandas，跳过pandas路径对比")
+
+    print(f"冷启动 import db_handler: {time_import('import db_handler'):.1f} ms")
+    try:
+        print(f"冷启动 import pandas: {time_import('import pandas'):.1f} ms")
+    except subprocess.CalledProcessError:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+数据库初始化与模拟数据生成
+
+创建HR表结构及查询所需索引，并可生成用于压测的模拟数据。
+
+用法：
+    python bootstrap_db.py                               # 仅创建表和索引
+    python bootstrap_db.py --generate --employees 100000 --days 365
+    python bootstrap_db.py --rebuild-rollups             # 修改历史考勤后重算考勤汇总
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import create_engine, event, select
+
+from config import Config
+from rollups import AttendanceRollups
+from schema import attendance, career, create_schema, departments, employees, positions
+from search_index import EmployeeSearchIndex
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢'
+GIVEN_CHARS = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏辉建波宁浩凯婷雪琳晨欣怡子涵宇轩博文'
+DEPARTMENT_NAMES = ['技术部', '产品部', '市场部', '销售部', '财务部', '人力资源部', '行政部', '法务部', '运营部', '客服部']
+TEAM_SUFFIXES = ['一组', '二组', '三组', '四组']
+POSITION_NAMES = ['助理', '专员', '高级专员', '主管', '经理', '高级经理', '总监', '副总裁']
+ATTENDANCE_STATUS = ['正常'] * 90 + ['迟到'] * 5 + ['早退'] * 2 + ['缺勤'] * 2 + ['请假'] * 1
+
+
+def _batched(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(engine, table, rows: Iterator[Dict], batch_size: int) -> int:
+    """分批写入，每批一个事务，内存占用与总行数无关"""
+    total = 0
+    for batch in _batched(rows, batch_size):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+
+def generate_departments() -> List[Dict]:
+    """一级部门及其下属小组"""
+    rows = []
+    for i, name in enumerate(DEPARTMENT_NAMES, start=1):
+        department_id = f'D{i:02d}'
+        rows.append({
+            'department_id': department_id, 'department_name': name, 'parent_id': None,
+            'description': f'{name}负责公司{name[:-1]}相关工作'
+        })
+        for j, suffix in enumerate(TEAM_SUFFIXES, start=1):
+            rows.append({
+                'department_id': f'{department_id}{j:02d}', 'department_name': f'{name}{suffix}',
+                'parent_id': department_id, 'description': f'{name}下属{suffix}'
+            })
+    return rows
+
+
+def generate_positions() -> List[Dict]:
+    return [
+        {'position_id': f'P{i:02d}', 'position_name': name, 'level': i}
+        for i, name in enumerate(POSITION_NAMES, start=1)
+    ]
+
+
+def generate_employees(count: int, team_ids: List[str], rng: random.Random) -> Iterator[Dict]:
+    today = date.today()
+    for n in range(1, count + 1):
+        # 每个小组工号最小的员工作为组内其他人的直属上级
+        team_manager = (n % len(team_ids)) or len(team_ids)
+        name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_CHARS) for _ in range(rng.choice((1, 2))))
+        yield {
+            'employee_id': f'E{n:06d}',
+            'name': name,
+            'email': f'e{n:06d}@example.com',
+            'phone': f'1{rng.randint(3, 9)}{rng.randint(0, 999999999):09d}',
+            'department_id': team_ids[n % len(team_ids)],
+            'position_id': f'P{min(int(rng.expovariate(0.6)) + 1, len(POSITION_NAMES)):02d}',
+            'manager_id': f'E{team_manager:06d}' if n != team_manager else None,
+            'hire_date': today - timedelta(days=rng.randint(30, 3650)),
+            'status': '在职',
+        }
+
+
+def department_managers(department_rows: List[Dict], team_ids: List[str], employee_count: int) -> Dict[str, str]:
+    """部门 -> 主管工号：小组由组内工号最小的员工负责，一级部门由其第一个小组的主管兼任"""
+    managers = {}
+    for i, team_id in enumerate(team_ids):
+        # 与generate_employees一致：工号n分到team_ids[n % len(team_ids)]
+        n = i or len(team_ids)
+        if n <= employee_count:
+            managers[team_id] = f'E{n:06d}'
+    for row in department_rows:
+        if not row['parent_id']:
+            first_team = next((t for t in team_ids if t.startswith(row['department_id'])), None)
+            if first_team in managers:
+                managers[row['department_id']] = managers[first_team]
+    return managers
+
+
+def generate_attendance(employee_count: int, days: int, rng: random.Random) -> Iterator[Dict]:
+    """按日期生成工作日考勤，同一天的记录连续写入"""
+    start = date.today() - timedelta(days=days)
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        for n in range(1, employee_count + 1):
+            status = rng.choice(ATTENDANCE_STATUS)
+            if status in ('缺勤', '请假'):
+                check_in = check_out = None
+                hours = 0.0
+            else:
+                in_minutes = 8 * 60 + 30 + rng.randint(0, 25) + (rng.randint(31, 90) if status == '迟到' else 0)
+                out_minutes = 18 * 60 + rng.randint(0, 120) - (rng.randint(30, 120) if status == '早退' else 0)
+                check_in = f'{in_minutes // 60:02d}:{in_minutes % 60:02d}'
+                check_out = f'{out_minutes // 60:02d}:{out_minutes % 60:02d}'
+                hours = round((out_minutes - in_minutes) / 60, 2)
+            yield {
+                'employee_id': f'E{n:06d}', 'date': day, 'check_in': check_in,
+                'check_out': check_out, 'work_hours': hours, 'status': status,
+            }
+
+
+def generate_career(employee_count: int, team_ids: List[str], rng: random.Random) -> Iterator[Dict]:
+    today = date.today()
+    for n in range(1, employee_count + 1):
+        start = today - timedelta(days=rng.randint(400, 3650))
+        level = 1
+        for _ in range(rng.randint(1, 3)):
+            end = start + timedelta(days=rng.randint(180, 900))
+            yield {
+                'employee_id': f'E{n:06d}', 'department_id': rng.choice(team_ids),
+                'position_id': f'P{level:02d}', 'start_date': start,
+                'end_date': end if end < today else None,
+                'responsibilities': f'负责{POSITION_NAMES[level - 1]}岗位相关工作',
+            }
+            if end >= today:
+                break
+            start, level = end, min(level + 1, len(POSITION_NAMES))
+
+
+def populated_tables(engine) -> List[str]:
+    """模拟数据会写入的表中已有数据的表"""
+    with engine.connect() as conn:
+        return [
+            table.name for table in (departments, positions, employees, career, attendance)
+            if conn.execute(select(table.c[0]).limit(1)).first() is not None
+        ]
+
+
+def generate(engine, employee_count: int, days: int, batch_size: int, seed: int):
+    """生成完整的模拟数据集"""
+    rng = random.Random(seed)
+    started = time.time()
+
+    department_rows = generate_departments()
+    team_ids = [d['department_id'] for d in department_rows if d['parent_id']]
+    _insert(engine, departments, iter(department_rows), batch_size)
+    _insert(engine, positions, iter(generate_positions()), batch_size)
+    print(f"部门 {len(department_rows)} 个，职位 {len(POSITION_NAMES)} 个")
+
+    managers = department_managers(department_rows, team_ids, employee_count)
+    manager_ids = set(managers.values())
+    manager_names = {}
+
+    def remember_managers(rows: Iterator[Dict]) -> Iterator[Dict]:
+        for row in rows:
+            if row['employee_id'] in manager_ids:
+                manager_names[row['employee_id']] = row['name']
+            yield row
+
+    count = _insert(engine, employees, remember_managers(generate_employees(employee_count, team_ids, rng)), batch_size)
+    with engine.begin() as conn:
+        for department_id, manager_id in managers.items():
+            conn.execute(
+                departments.update().where(departments.c.department_id == department_id)
+                .values(manager_id=manager_id, manager_name=manager_names[manager_id])
+            )
+    print(f"员工 {count} 名，部门主管 {len(managers)} 名 ({time.time() - started:.1f}s)")
+
+    count = _insert(engine, career, generate_career(employee_count, team_ids, rng), batch_size)
+    print(f"履历 {count} 条 ({time.time() - started:.1f}s)")
+
+    count = _insert(engine, attendance, generate_attendance(employee_count, days, rng), batch_size)
+    print(f"考勤 {count} 条 ({time.time() - started:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='创建HR表结构及索引，可选生成模拟数据')
+    parser.add_argument('--generate', action='store_true', help='生成模拟数据')
+    parser.add_argument('--employees', type=int, default=1000, help='员工数量')
+    parser.add_argument('--days', type=int, default=90, help='考勤天数（只生成工作日）')
+    parser.add_argument('--batch-size', type=int, default=20000, help='每批写入行数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--rebuild-rollups', action='store_true', help='清空并重新计算考勤汇总表')
+    args = parser.parse_args()
+
+    engine = create_engine(Config.get_db_url(), **Config.get_engine_options(statement_timeout=0))
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def _fast_bulk_load(dbapi_connection, _):
+            # 批量导入时降低同步级别，WAL模式下读写互不阻塞
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.close()
+
+    create_schema(engine)
+    print(f"表结构和索引已就绪: {Config.DB_TYPE}/{Config.DB_NAME}")
+
+    if args.generate:
+        populated = populated_tables(engine)
+        if populated:
+            engine.dispose()
+            parser.error(
+                f"表 {', '.join(populated)} 中已有数据，--generate只能用于空数据库；"
+                "请改用新的DB_NAME或先清空这些表"
+            )
+        generate(engine, args.employees, args.days, args.batch_size, args.seed)
+        if engine.dialect.name in ('sqlite', 'postgresql'):
+            with engine.begin() as conn:
+                conn.exec_driver_sql('ANALYZE')
+
+    rollups = AttendanceRollups(engine, batch_size=args.batch_size)
+    started = time.time()
+    count = rollups.rebuild() if args.rebuild_rollups else rollups.sync(force=True)
+    print(f"考勤汇总已同步 {count} 条记录 ({time.time() - started:.1f}s)")
+
+    if EmployeeSearchIndex(engine).ensure():
+        print("员工搜索索引已就绪")
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import asyncio
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _CallAbandoned(Exception):
+    """执行调用的一方被取消（如超时），等待方应重新执行"""
+
+
+class SingleFlight:
+    """
+    合并相同键的并发调用
+
+    同一个键已有调用在执行时，后来的调用不再重复执行，而是等待并共享其结果或异常。
+    执行方被取消时不取消等待方：其中一个等待方重新执行调用，其余等待方继续等待它的结果。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {'executions': 0, 'shared': 0}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        while future is not None:
+            self.stats['shared'] += 1
+            try:
+                # shield：等待方被取消时不影响正在执行的调用
+                return await asyncio.shield(future)
+            except _CallAbandoned:
+                future = self._calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.stats['executions'] += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # 取消的是执行方自己（如任务超时），等待方收到_CallAbandoned后重新执行，不随之取消
+            future.set_exception(_CallAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待方时避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        return {'in_flight': len(self._calls), **self.stats}
+
+
+class ExpiringKeySet:
+    """
+    有容量上限、按时间过期的键集合，用于识别重复投递的消息
+
+    超过maxsize时淘汰最早加入的键。指定shared（SharedStore）时以共享存储为准，
+    多个worker进程收到同一条重试消息也只会处理一次。
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 600, shared=None, namespace: str = 'seen'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self.namespace = namespace
+        self._expires: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.stats = {'added': 0, 'duplicates': 0}
+
+    def add(self, key: Hashable) -> bool:
+        """加入键，键在有效期内已存在时返回False"""
+        now = time.monotonic()
+        # 按加入顺序排列，队首即最早过期
+        while self._expires and next(iter(self._expires.values())) <= now:
+            self._expires.popitem(last=False)
+        if key in self._expires or (
+            self.shared is not None and not self.shared.add(f'{self.namespace}:{key}', ttl=self.ttl)
+        ):
+            self.stats['duplicates'] += 1
+            return False
+        self._expires[key] = now + self.ttl
+        while len(self._expires) > self.maxsize:
+            self._expires.popitem(last=False)
+        self.stats['added'] += 1
+        return True
+
+    def discard(self, key: Hashable):
+        self._expires.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(f'{self.namespace}:{key}')
+
+    def get_stats(self) -> Dict:
+        return {'size': len(self._expires), 'maxsize': self.maxsize, **self.stats}
+
+
+class TTLCache:
+    """
+    有容量上限的TTL/LRU异步缓存
+
+    - 超过maxsize时淘汰最久未使用的条目
+    - 加载结果为None时按negative_ttl缓存，未知的键不会反复请求远端
+    - 条目存活超过ttl * refresh_ratio后仍返回缓存值，同时在后台重新加载，
+      热点条目不会在请求路径上过期
+    - 加载抛出异常时不缓存，由调用方处理
+    - 同一个键的并发未命中只加载一次
+    - 指定shared（SharedStore）时作为二级缓存，多个worker进程共享加载结果，值需可JSON序列化
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600, negative_ttl: float = 300,
+                 refresh_ratio: float = 0.8, shared=None, namespace: str = 'cache'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ratio = refresh_ratio
+        self.shared = shared
+        self.namespace = namespace
+        # key -> (value, 写入时间, 过期时间)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self._loads = SingleFlight()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'shared_hits': 0, 'misses': 0, 'refreshes': 0, 'evictions': 0}
+
+    def _store(self, key: Hashable, value: Any, age: float = 0):
+        stored_at = time.monotonic() - age
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._entries[key] = (value, stored_at, stored_at + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """返回缓存值，未命中或已过期时调用loader加载"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now < entry[2]:
+            value, stored_at, _ = entry
+            self._entries.move_to_end(key)
+            if value is None:
+                self.stats['negative_hits'] += 1
+            else:
+                self.stats['hits'] += 1
+                if now - stored_at > self.ttl * self.refresh_ratio:
+                    self._refresh_in_background(key, loader)
+            return value
+
+        if self.shared is not None:
+            cached = self.shared.get(f'{self.namespace}:{key}')
+            if cached is not None:
+                # 共享存储中的值按其写入时间计算剩余有效期
+                payload = json.loads(cached)
+                self._store(key, payload['v'], age=max(time.time() - payload['t'], 0))
+                self.stats['shared_hits'] += 1
+                return payload['v']
+
+        self.stats['misses'] += 1
+        return await self._loads.do(key, lambda: self._load(key, loader))
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        self._save(key, value)
+        return value
+
+    def _save(self, key: Hashable, value: Any):
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.set(
+                f'{self.namespace}:{key}',
+                json.dumps({'v': value, 't': time.time()}, ensure_ascii=False, default=str),
+                ttl=self.ttl if value is not None else self.negative_ttl
+            )
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                self._save(key, await loader())
+                self.stats['refreshes'] += 1
+            except Exception:
+                # 刷新失败时保留旧值，到期后由请求路径重新加载
+                logger.warning("后台刷新缓存失败: %s", key, exc_info=True)
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def invalidate(self, key: Hashable = None):
+        """删除指定条目，不指定时清空本进程缓存"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+            if self.shared is not None:
+                self.shared.delete(f'{self.namespace}:{key}')
+
+    def get_stats(self) -> Dict:
+        return {'size': len(self._entries), 'maxsize': self.maxsize, **self.stats}
+
+
+class AccessTokenRefresher:
+    """
+    在访问令牌过期前主动刷新
+
+    fetch为同步函数（钉钉SDK的get_access_token），在线程池中执行，
+    返回的令牌由SDK写入其会话存储，后续请求直接复用，不会在消息处理路径上等待取令牌。
+    """
+
+    def __init__(self, fetch: Callable[[], Any], refresh_margin: float = 300, default_expires_in: float = 7200,
+                 retry_interval: float = 30):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.default_expires_in = default_expires_in
+        self.retry_interval = retry_interval
+        self.expires_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> float:
+        """立即刷新一次，返回令牌有效期（秒）"""
+        result = await asyncio.get_running_loop().run_in_executor(None, self.fetch)
+        if inspect.isawaitable(result):
+            result = await result
+        expires_in = self.default_expires_in
+        if isinstance(result, dict) and result.get('expires_in'):
+            expires_in = float(result['expires_in'])
+        self.expires_at = time.time() + expires_in
+        return expires_in
+
+    async def _run(self):
+        while True:
+            try:
+                expires_in = await self.refresh()
+                delay = max(expires_in - self.refresh_margin, self.retry_interval)
+            except Exception:
+                logger.warning("刷新钉钉访问令牌失败", exc_info=True)
+                delay = self.retry_interval
+            await asyncio.sleep(delay)
+
+    def start(self):
+        """启动后台刷新任务，需在事件循环中调用"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -8,6 +8,13 @@ class Config:
     DINGTALK_APP_KEY = os.getenv('DINGTALK_APP_KEY')
     DINGTALK_APP_SECRET = os.getenv('DINGTALK_APP_SECRET')
     DINGTALK_AGENT_ID = os.getenv('DINGTALK_AGENT_ID')
+
+    # 钉钉用户信息缓存：容量、有效期及不存在用户的缓存时间（秒）
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '2000'))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '3600'))
+    USER_CACHE_NEGATIVE_TTL = float(os.getenv('USER_CACHE_NEGATIVE_TTL', '300'))
+    # 访问令牌在过期前多少秒主动刷新
+    ACCESS_TOKEN_REFRESH_MARGIN = float(os.getenv('ACCESS_TOKEN_REFRESH_MARGIN', '300'))
     
     # Database Configuration
     DB_TYPE = os.getenv('DB_TYPE', 'sqlite')  # or mysql, postgresql
@@ -16,17 +23,122 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'hr_data')
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+
+    # Database Pool Configuration
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # 秒
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # 秒
+    DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))  # 秒
+    # 单条SQL的最长执行时间（秒），超时由数据库中止，0为不限制（SQLite不支持）
+    DB_STATEMENT_TIMEOUT = float(os.getenv('DB_STATEMENT_TIMEOUT', '10'))
+    # 考勤汇总追赶、搜索索引构建等维护任务使用的主库连接数，这些连接不限制语句时长
+    DB_MAINTENANCE_POOL_SIZE = int(os.getenv('DB_MAINTENANCE_POOL_SIZE', '2'))
+    # 同时执行的数据库查询上限，默认与连接池容量一致
+    DB_MAX_CONCURRENCY = int(os.getenv('DB_MAX_CONCURRENCY', str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+    # 只读副本：逗号分隔的 host[:port] 列表，与主库使用相同的库名和账号；查询优先发往健康的副本
+    DB_REPLICA_HOSTS = [h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()]
+    DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', str(DB_POOL_SIZE)))
+    DB_REPLICA_MAX_OVERFLOW = int(os.getenv('DB_REPLICA_MAX_OVERFLOW', str(DB_MAX_OVERFLOW)))
+    DB_REPLICA_POOL_TIMEOUT = int(os.getenv('DB_REPLICA_POOL_TIMEOUT', str(DB_POOL_TIMEOUT)))
+    # 副本健康检查间隔（秒）
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '15'))
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    # 需支持function calling的模型
+    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+
+    # 本地意图识别置信度阈值，达到阈值的查询不调用LLM
+    INTENT_ROUTER_THRESHOLD = float(os.getenv('INTENT_ROUTER_THRESHOLD', '0.8'))
+
+    # 员工名称索引增量刷新间隔（秒）
+    EMPLOYEE_INDEX_REFRESH = float(os.getenv('EMPLOYEE_INDEX_REFRESH', '300'))
+    # 员工名称索引整体重新加载的间隔（秒）
+    EMPLOYEE_INDEX_FULL_RELOAD_INTERVAL = float(os.getenv('EMPLOYEE_INDEX_FULL_RELOAD_INTERVAL', '3600'))
+
+    # 员工搜索索引同步间隔（秒）及每页返回的结果数
+    SEARCH_INDEX_REFRESH = float(os.getenv('SEARCH_INDEX_REFRESH', '300'))
+    SEARCH_INDEX_FULL_RELOAD_INTERVAL = float(os.getenv('SEARCH_INDEX_FULL_RELOAD_INTERVAL', '3600'))
+    # 须与MySQL服务器的ngram_token_size一致，更短的搜索词无法使用全文索引
+    SEARCH_NGRAM_TOKEN_SIZE = int(os.getenv('SEARCH_NGRAM_TOKEN_SIZE', '2'))
+    SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', '20'))
+
+    # 分页回复：每页记录数、单条回复的最大字符数（钉钉消息有长度限制）及翻页状态保留时间（秒）
+    REPLY_PAGE_SIZE = int(os.getenv('REPLY_PAGE_SIZE', '20'))
+    REPLY_MAX_CHARS = int(os.getenv('REPLY_MAX_CHARS', '4000'))
+    REPLY_PAGE_TTL = float(os.getenv('REPLY_PAGE_TTL', '1800'))
+
+    # 部门和岗位参考数据缓存检查变化的间隔（秒）
+    REFERENCE_CHECK_INTERVAL = float(os.getenv('REFERENCE_CHECK_INTERVAL', '30'))
+    # 部门和岗位缓存无条件整表重新加载的间隔（秒），兜底变更探测遗漏的修改
+    REFERENCE_FULL_RELOAD_INTERVAL = float(os.getenv('REFERENCE_FULL_RELOAD_INTERVAL', '3600'))
+    # 内存组织架构（部门树、汇报关系）的增量刷新间隔（秒）
+    ORG_REFRESH_INTERVAL = float(os.getenv('ORG_REFRESH_INTERVAL', '300'))
+    # 内存组织架构整体重新加载员工的间隔（秒），移除已删除的员工并兜底增量刷新遗漏的修改
+    ORG_FULL_RELOAD_INTERVAL = float(os.getenv('ORG_FULL_RELOAD_INTERVAL', '3600'))
+    # 权限模式：org 按组织架构限制查询范围（本人、下属及所管部门），open 不限制
+    PERMISSION_MODE = os.getenv('PERMISSION_MODE', 'org')
+    # 可查询全部数据的部门ID（含其下级部门），逗号分隔，如人力资源部
+    HR_ADMIN_DEPARTMENTS = [d.strip() for d in os.getenv('HR_ADMIN_DEPARTMENTS', '').split(',') if d.strip()]
+
+    # 考勤汇总表同步新考勤记录的最短间隔（秒）
+    ROLLUP_SYNC_INTERVAL = float(os.getenv('ROLLUP_SYNC_INTERVAL', '60'))
+    # 水位越过的考勤记录id在该时间（秒）内仍未提交时视为已回滚，不再重试
+    ROLLUP_GAP_TIMEOUT = float(os.getenv('ROLLUP_GAP_TIMEOUT', '600'))
     
+    # 批量报表导出：文件目录、下载链接的服务地址（如 https://hr.example.com）、默认格式（xlsx需安装openpyxl，否则导出csv）、
+    # 文件保留时间（秒）、服务端游标每批读取的行数及导出进程数
+    EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')
+    EXPORT_BASE_URL = os.getenv('EXPORT_BASE_URL', 'http://localhost:8000')
+    EXPORT_FORMAT = os.getenv('EXPORT_FORMAT', 'xlsx')
+    EXPORT_TTL = float(os.getenv('EXPORT_TTL', '86400'))
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '2000'))
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '1'))
+    # 每个用户的导出占用的最长时间（秒），worker异常退出未释放时到期自动解除
+    EXPORT_LOCK_TTL = float(os.getenv('EXPORT_LOCK_TTL', '3600'))
+
+    # 服务进程：监听地址、worker进程数（生产模式默认等于CPU核数）
+    SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+    SERVER_WORKERS = max(int(os.getenv('SERVER_WORKERS', '1')), 1)
+    # worker进程间共享的本地缓存文件（用户信息、访问令牌、消息去重）
+    SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', 'hr_agent_cache.db')
+    # 就绪检查中数据库连接检查的超时（秒）
+    READY_TIMEOUT = float(os.getenv('READY_TIMEOUT', '2'))
+
+    # 后台消息处理队列：worker数量、队列容量及单条消息处理超时（秒）
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '8'))
+    JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '1000'))
+    JOB_TIMEOUT = float(os.getenv('JOB_TIMEOUT', '120'))
+    # 每个用户最多同时排队的消息数
+    JOB_MAX_PENDING_PER_USER = int(os.getenv('JOB_MAX_PENDING_PER_USER', '3'))
+
+    # 限流：每个用户及全局的令牌补充速率（个/秒）和突发容量
+    USER_RATE_LIMIT = float(os.getenv('USER_RATE_LIMIT', '0.2'))
+    USER_BURST = float(os.getenv('USER_BURST', '5'))
+    GLOBAL_RATE_LIMIT = float(os.getenv('GLOBAL_RATE_LIMIT', '20'))
+    GLOBAL_BURST = float(os.getenv('GLOBAL_BURST', '50'))
+    # 回调消息去重：记录的消息ID数量上限及保留时间（秒）
+    DEDUP_SIZE = int(os.getenv('DEDUP_SIZE', '10000'))
+    DEDUP_TTL = float(os.getenv('DEDUP_TTL', '600'))
+
+    # 链路追踪：完成的链路以JSON Lines追加写入该文件（留空不导出），超过阈值（秒）的请求记录慢请求日志
+    TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '')
+    SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', '5'))
+
     # HR Data Tables
     HR_TABLES = {
         'employees': 'employee_info',
         'attendance': 'attendance_records',
         'career': 'career_history',
         'departments': 'department_info',
-        'positions': 'position_info'
+        'positions': 'position_info',
+        'attendance_summary_employee': 'attendance_summary_employee',
+        'attendance_summary_department': 'attendance_summary_department',
+        'rollup_state': 'rollup_state',
+        'rollup_gaps': 'rollup_gaps'
     }
     
     # AI Agent Configuration
@@ -43,7 +155,60 @@ class Config:
     """
     
     @staticmethod
-    def get_db_url():
+    def get_engine_options(replica: bool = False, statement_timeout: float = None, pool_size: int = None):
+        """
+        数据库引擎连接池参数，replica为True时使用只读副本的连接池配置
+
+        Args:
+            statement_timeout: 语句超时（秒），None使用DB_STATEMENT_TIMEOUT，0为不限制；
+                报表导出和考勤汇总等维护任务会执行全表扫描，应传0
+            pool_size: 固定大小的连接池（不溢出），用于维护任务等专用引擎
+        """
+        options = {
+            'pool_pre_ping': True,
+            'pool_recycle': Config.DB_POOL_RECYCLE,
+        }
+        if statement_timeout is None:
+            statement_timeout = Config.DB_STATEMENT_TIMEOUT
+        timeout_ms = int(statement_timeout * 1000)
+        if Config.DB_TYPE == 'sqlite':
+            # SQLite连接会在线程池中跨线程使用
+            options['connect_args'] = {'check_same_thread': False}
+            return options
+
+        options.update({
+            'pool_size': Config.DB_REPLICA_POOL_SIZE if replica else Config.DB_POOL_SIZE,
+            'max_overflow': Config.DB_REPLICA_MAX_OVERFLOW if replica else Config.DB_MAX_OVERFLOW,
+            'pool_timeout': Config.DB_REPLICA_POOL_TIMEOUT if replica else Config.DB_POOL_TIMEOUT,
+        })
+        if pool_size is not None:
+            options.update({'pool_size': pool_size, 'max_overflow': 0})
+        connect_args = {'connect_timeout': Config.DB_CONNECT_TIMEOUT}
+        if timeout_ms > 0:
+            if Config.DB_TYPE == 'mysql':
+                # max_execution_time只限制SELECT，写入不受影响
+                connect_args['init_command'] = f'SET SESSION max_execution_time={timeout_ms}'
+            elif Config.DB_TYPE == 'postgresql':
+                connect_args['options'] = f'-c statement_timeout={timeout_ms}'
+        options['connect_args'] = connect_args
+        return options
+
+    @staticmethod
+    def get_db_url(host: str = None, port: str = None):
         if Config.DB_TYPE == 'sqlite':
             return f'sqlite:///{Config.DB_NAME}.db'
-        return f'{Config.DB_TYPE}://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME}'
+        return (
+            f'{Config.DB_TYPE}://{Config.DB_USER}:{Config.DB_PASSWORD}'
+            f'@{host or Config.DB_HOST}:{port or Config.DB_PORT}/{Config.DB_NAME}'
+        )
+
+    @staticmethod
+    def get_replica_urls():
+        """只读副本的连接URL列表，SQLite不支持副本"""
+        if Config.DB_TYPE == 'sqlite':
+            return []
+        urls = []
+        for replica in Config.DB_REPLICA_HOSTS:
+            host, _, port = replica.partition(':')
+            urls.append(Config.get_db_url(host, port or None))
+        return urls
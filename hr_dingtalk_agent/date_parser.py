@@ -0,0 +1,255 @@
+import calendar
+import re
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+DateRange = Tuple[date, date]
+
+CN_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5,
+             '六': 6, '七': 7, '八': 8, '九': 9}
+# 阿拉伯数字和中文数字分别匹配，“张三3月”中的“三3”不会被当作一个数
+CN_NUMBER = r'(?:[0-9]+|[零〇一二两三四五六七八九十]+)'
+# 月份只匹配有效的中文月份，“张三二月”“张三十月”中姓名末尾的数字不会并入月份
+CN_MONTH = r'(?:[0-9]+|十[一二]?|[一二三四五六七八九])'
+
+
+def cn_to_int(text: str) -> int:
+    """
+    将阿拉伯数字或一百以内的中文数字转为整数
+
+    无法识别时抛出ValueError，parse_date_range将其视为没有日期。
+    """
+    if text.isdigit():
+        return int(text)
+    try:
+        if '十' in text:
+            tens, _, ones = text.partition('十')
+            if len(tens) > 1 or len(ones) > 1:
+                raise ValueError(text)
+            return (CN_DIGITS[tens] if tens else 1) * 10 + (CN_DIGITS[ones] if ones else 0)
+        value = 0
+        for char in text:
+            value = value * 10 + CN_DIGITS[char]
+        return value
+    except KeyError:
+        raise ValueError(f'无法识别的数字: {text}')
+
+
+def _month_range(year: int, month: int) -> DateRange:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _quarter_range(year: int, quarter: int) -> DateRange:
+    start_month = (quarter - 1) * 3 + 1
+    return date(year, start_month, 1), _month_range(year, start_month + 2)[1]
+
+
+def _week_range(day: date) -> DateRange:
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=6)
+
+
+def _shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def _relative_year(text: str, today: date) -> Optional[int]:
+    """
+    解析 今年/去年/前年/2023年/2023-03 等年份表达
+
+    单独的四位数字（如“工号2019”）不当作年份，须后跟“年”或日期分隔符。
+    """
+    for word, offset in (('前年', -2), ('去年', -1), ('今年', 0), ('本年', 0), ('明年', 1),
+                         ('last year', -1), ('this year', 0)):
+        if word in text:
+            return today.year + offset
+    match = re.search(r'(?<!\d)((?:19|20)\d{2})(?=\s*年|[\-/.]\d)', text)
+    return int(match.group(1)) if match else None
+
+
+# 绝对日期点：2024-03-01、2024/3/1、2024年3月1日、3月1日、1日
+_POINT = re.compile(
+    r'(?:(?P<year>(?:19|20)\d{2})\s*[年\-/.]\s*)?'
+    r'(?:(?P<month>' + CN_MONTH + r')\s*(?:月|[\-/.](?=\d))\s*)?'
+    r'(?:(?P<day>' + CN_NUMBER + r')\s*(?:日|号)?)?'
+)
+_RANGE_SEPARATOR = r'\s*(?:到|至|~|～|—|－|-|to|until|through)\s*'
+
+
+def _parse_point(match: re.Match, today: date, default_year: int = None,
+                 default_month: int = None) -> Optional[Tuple[date, str]]:
+    """解析日期点，返回日期及其精度（day/month）"""
+    year = int(match.group('year')) if match.group('year') else (default_year or today.year)
+    month = cn_to_int(match.group('month')) if match.group('month') else default_month
+    day = cn_to_int(match.group('day')) if match.group('day') else None
+    if month is None or not 1 <= month <= 12:
+        return None
+    if day is None:
+        return date(year, month, 1), 'month'
+    if not 1 <= day <= calendar.monthrange(year, month)[1]:
+        return None
+    return date(year, month, day), 'day'
+
+
+def _parse_explicit_range(text: str, today: date) -> Optional[DateRange]:
+    """解析 3月1日到15日、2024-01-01 至 2024-01-31 等显式区间"""
+    pattern = re.compile(
+        r'(?P<start>(?:(?:19|20)\d{2}\s*[年\-/.]\s*)?' + CN_MONTH + r'\s*(?:月|[\-/.])\s*(?:' + CN_NUMBER + r'\s*(?:日|号)?)?)'
+        + _RANGE_SEPARATOR +
+        r'(?P<end>(?:(?:19|20)\d{2}\s*[年\-/.]\s*)?(?:' + CN_MONTH + r'\s*(?:月|[\-/.])\s*)?' + CN_NUMBER + r'\s*(?:日|号|月)?)'
+    )
+    match = pattern.search(text)
+    if not match:
+        return None
+    start_match = _POINT.fullmatch(match.group('start').strip())
+    if not start_match:
+        return None
+    start = _parse_point(start_match, today, _relative_year(text, today))
+    if not start:
+        return None
+    start_date, start_precision = start
+
+    end_text = match.group('end').strip()
+    if end_text.endswith('月'):
+        end_match = _POINT.fullmatch(end_text)
+        end = _parse_point(end_match, today, start_date.year) if end_match else None
+        if not end:
+            return None
+        return start_date, _month_range(end[0].year, end[0].month)[1]
+
+    end_match = _POINT.fullmatch(end_text)
+    if not end_match:
+        return None
+    end = _parse_point(end_match, today, start_date.year, start_date.month)
+    if end and end[0] < start_date and not end_match.group('year') and end_match.group('month'):
+        # 12月25日到1月5日：结束月份早于开始月份且未写年份时跨到下一年
+        end = _parse_point(end_match, today, start_date.year + 1, start_date.month)
+    if not end:
+        return None
+    end_date, end_precision = end
+    if start_precision == 'month':
+        end_date = _month_range(end_date.year, end_date.month)[1] if end_precision == 'month' else end_date
+    return (start_date, end_date) if start_date <= end_date else None
+
+
+def _parse_relative(text: str, today: date) -> Optional[DateRange]:
+    """解析相对时间表达"""
+    # 最近N天/周/个月/年
+    match = re.search(r'(?:最近|近|过去|前)\s*(' + CN_NUMBER + r')\s*(天|日|周|个?星期|个?礼拜|个月|月|年)', text)
+    if match:
+        count = cn_to_int(match.group(1))
+        unit = match.group(2)
+        if count < 1:
+            return None
+        if unit in ('天', '日'):
+            return today - timedelta(days=count - 1), today
+        if unit.endswith(('周', '星期', '礼拜')):
+            return today - timedelta(weeks=count) + timedelta(days=1), today
+        if unit.endswith('月'):
+            year, month = _shift_month(today.year, today.month, -count)
+            day = min(today.day, calendar.monthrange(year, month)[1])
+            return date(year, month, day) + timedelta(days=1), today
+        return date(today.year - count, today.month, 1), today
+    match = re.search(r'(?:last|past)\s+(\d+)\s+(day|week|month)s?', text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        if count < 1:
+            return None
+        days = {'day': 1, 'week': 7, 'month': 30}[unit] * count
+        return today - timedelta(days=days - 1), today
+
+    for words, offset in ((('前天',), -2), (('昨天', '昨日', 'yesterday'), -1), (('今天', '今日', 'today'), 0)):
+        if any(word in text for word in words):
+            day = today + timedelta(days=offset)
+            return day, day
+
+    for words, offset in ((('上上周', '上上个星期'), -2),
+                          (('上周', '上个星期', '上星期', '上个礼拜', '上礼拜', 'last week'), -1),
+                          (('本周', '这周', '这个星期', '本星期', '这个礼拜', 'this week'), 0)):
+        if any(word in text for word in words):
+            return _week_range(today + timedelta(weeks=offset))
+
+    for words, offset in ((('上上个月', '上上月'), -2),
+                          (('上个月', '上月', 'last month'), -1),
+                          (('本月', '这个月', '当月', 'this month'), 0)):
+        if any(word in text for word in words):
+            return _month_range(*_shift_month(today.year, today.month, offset))
+    return None
+
+
+def _parse_period(text: str, today: date) -> Optional[DateRange]:
+    """解析季度、半年、年份、月份等整段时间"""
+    year = _relative_year(text, today)
+
+    match = re.search(r'第\s*(' + CN_NUMBER + r')\s*季度|(?<![a-z])q([1-4])(?![0-9])', text)
+    if match:
+        quarter = cn_to_int(match.group(1)) if match.group(1) else int(match.group(2))
+        if 1 <= quarter <= 4:
+            return _quarter_range(year or today.year, quarter)
+    match = re.search(r'(本|上|这个|上个)\s*季度', text)
+    if match:
+        quarter = (today.month - 1) // 3 + 1
+        quarter_year = today.year
+        if match.group(1).startswith('上'):
+            quarter -= 1
+            if quarter == 0:
+                quarter, quarter_year = 4, today.year - 1
+        return _quarter_range(quarter_year, quarter)
+
+    if '上半年' in text:
+        return date(year or today.year, 1, 1), date(year or today.year, 6, 30)
+    if '下半年' in text:
+        return date(year or today.year, 7, 1), date(year or today.year, 12, 31)
+
+    match = re.search(r'(?<!\d)((?:19|20)\d{2})[\-/.](\d{1,2})(?![\d\-/.])', text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return _month_range(int(match.group(1)), int(match.group(2)))
+
+    match = re.search(r'(?:((?:19|20)\d{2})\s*[年\-/.]\s*)?(' + CN_MONTH + r')\s*月(?!\s*' + CN_NUMBER + r'\s*(?:日|号))', text)
+    if match:
+        month = cn_to_int(match.group(2))
+        if 1 <= month <= 12:
+            return _month_range(int(match.group(1)) if match.group(1) else (year or today.year), month)
+
+    if year is not None:
+        return date(year, 1, 1), date(year, 12, 31)
+    return None
+
+
+def _parse_single_day(text: str, today: date) -> Optional[DateRange]:
+    """解析单个具体日期"""
+    match = re.search(
+        r'((?:19|20)\d{2})\s*[年\-/.]\s*(\d{1,2})\s*[月\-/.]\s*(\d{1,2})\s*[日号]?'
+        r'|(' + CN_MONTH + r')\s*月\s*(' + CN_NUMBER + r')\s*[日号]',
+        text
+    )
+    if not match:
+        return None
+    # 不存在的日期（如2023-02-29）抛出ValueError，不再退化为按年份或月份解析
+    if match.group(1):
+        day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    else:
+        day = date(_relative_year(text, today) or today.year,
+                   cn_to_int(match.group(4)), cn_to_int(match.group(5)))
+    return day, day
+
+
+def parse_date_range(query: str, today: Optional[date] = None) -> Optional[DateRange]:
+    """
+    从查询中解析日期范围（含首尾两天）
+
+    支持中英文的相对和绝对表达，例如：昨天、上周、本月、最近7天、3月1日到15日、
+    2024-01-01至2024-01-31、去年第三季度、Q3、下半年、last month。
+    未识别到日期或日期无效（如2023-02-29）时返回None。
+    """
+    today = today or date.today()
+    text = query.lower()
+    for parser in (_parse_explicit_range, _parse_relative, _parse_single_day, _parse_period):
+        try:
+            result = parser(text, today)
+        except ValueError:
+            return None
+        if result:
+            return result
+    return None
@@ -1,70 +1,270 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+import hashlib
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
+from functools import lru_cache
 from typing import Dict, List, Optional
-import pandas as pd
 from config import Config
+from db_router import ReplicaRouter
+from org_graph import OrgGraph
+from reference_cache import ReferenceCache
+from rollups import STATUS_COLUMNS, AttendanceRollups, check_in_minutes, summarize
+from search_index import EmployeeSearchIndex, extract_search_terms
+
+
+@lru_cache(maxsize=256)
+def _statement(query: str):
+    """缓存预编译的SQL语句对象，相同SQL复用SQLAlchemy的编译缓存"""
+    return text(query)
+
 
 class HRDatabaseHandler:
     def __init__(self):
-        self.engine = create_engine(Config.get_db_url())
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        # 主库负责写入（搜索索引、考勤汇总），只读查询由router分发到副本
+        self.engine = create_engine(Config.get_db_url(), **Config.get_engine_options())
+        self.router = ReplicaRouter(
+            self.engine,
+            [create_engine(url, **Config.get_engine_options(replica=True)) for url in Config.get_replica_urls()],
+            Config.DB_REPLICA_CHECK_INTERVAL
+        )
+        self.router.start()
+        # 考勤汇总追赶和搜索索引构建会扫描整表，使用不限制语句时长的独立小连接池（SQLite不支持语句超时，直接共用）
+        self.maintenance_engine = self.engine if Config.DB_TYPE == 'sqlite' else create_engine(
+            Config.get_db_url(),
+            **Config.get_engine_options(statement_timeout=0, pool_size=Config.DB_MAINTENANCE_POOL_SIZE)
+        )
+        self.search_index = EmployeeSearchIndex(
+            self.maintenance_engine, Config.SEARCH_INDEX_REFRESH, read_engine=self.router.read_engine,
+            full_reload_interval=Config.SEARCH_INDEX_FULL_RELOAD_INTERVAL
+        )
+        self.rollups = AttendanceRollups(
+            self.maintenance_engine, Config.ROLLUP_SYNC_INTERVAL,
+            read_engine=self.engine, gap_timeout=Config.ROLLUP_GAP_TIMEOUT
+        )
+        self._rollups_available = None
+        self.reference = ReferenceCache(self, Config.REFERENCE_CHECK_INTERVAL, Config.REFERENCE_FULL_RELOAD_INTERVAL)
+        self.org_graph = OrgGraph(self, self.reference, Config.ORG_REFRESH_INTERVAL, Config.ORG_FULL_RELOAD_INTERVAL)
+        self._version_columns: Dict[str, str] = {}
 
-    def get_employee_info(self, employee_id: str = None, name: str = None) -> Dict:
-        """获取员工基本信息"""
-        query = f"""
-            SELECT * FROM {Config.HR_TABLES['employees']}
-            WHERE 1=1
+    def _fetch_all(self, query: str, params: Dict = None) -> List[Dict]:
+        """执行只读查询，将结果行直接映射为字典列表；副本连接失败时改用主库重试一次"""
+        engine = self.router.read_engine()
+        try:
+            return self._execute(engine, query, params)
+        except OperationalError:
+            # 语句超时等错误在副本仍可连接时直接抛出，避免失控查询再占用主库
+            if engine is self.engine or self.router.ping(engine):
+                raise
+            self.router.mark_failed(engine)
+            return self._execute(self.engine, query, params)
+
+    @staticmethod
+    def _execute(engine, query: str, params: Dict = None) -> List[Dict]:
+        with engine.connect() as conn:
+            result = conn.execute(_statement(query), params or {})
+            return [dict(row) for row in result.mappings()]
+
+    @staticmethod
+    def _paginate(query: str, params: Dict, key: str, after, limit: int = None) -> str:
         """
-        params = {}
-        if employee_id:
-            query += " AND employee_id = :employee_id"
-            params['employee_id'] = employee_id
-        if name:
-            query += " AND name LIKE :name"
-            params['name'] = f"%{name}%"
+        追加按key排序的键集分页条件：只取key大于after的记录，最多limit条
 
+        与OFFSET不同，翻到后面的页也只扫描本页所需的索引范围。
+        """
+        if after is not None:
+            query += f" AND {key} > :after"
+            params['after'] = after
+        query += f" ORDER BY {key}"
+        if limit:
+            query += " LIMIT :limit"
+            params['limit'] = limit
+        return query
+
+    def _name_columns(self, alias: str) -> tuple:
+        """
+        部门和职位名称的取法
+
+        参考数据缓存可用时返回空串，查询后由_attach_names在内存中补全；否则返回JOIN所需的列和连接。
+        """
+        if self.reference.records('departments') is not None and self.reference.records('positions') is not None:
+            return '', ''
+        return ", d.department_name, p.position_name", f"""
+            LEFT JOIN {Config.HR_TABLES['departments']} d ON {alias}.department_id = d.department_id
+            LEFT JOIN {Config.HR_TABLES['positions']} p ON {alias}.position_id = p.position_id
+        """
+
+    def _attach_names(self, rows: List[Dict], joins: str) -> List[Dict]:
+        if not joins:
+            self.reference.join(rows)
+        return rows
+
+    def get_employee_info(self, employee_id: str = None, name: str = None,
+                          limit: int = None, after_id: str = None) -> Dict:
+        """获取员工基本信息（含部门和职位名称），按工号排序，可从after_id之后分页读取"""
         try:
-            result = pd.read_sql(query, self.engine, params=params)
-            return result.to_dict('records')
+            names, joins = self._name_columns('e')
+            query = f"""
+                SELECT e.*{names} FROM {Config.HR_TABLES['employees']} e
+                {joins}
+                WHERE 1=1
+            """
+            params = {}
+            if employee_id:
+                query += " AND e.employee_id = :employee_id"
+                params['employee_id'] = employee_id
+            if name:
+                query += " AND e.name LIKE :name"
+                params['name'] = f"%{name}%"
+            query = self._paginate(query, params, 'e.employee_id', after_id, limit)
+            return self._attach_names(self._fetch_all(query, params), joins)
         except Exception as e:
             return {'error': f'获取员工信息失败: {str(e)}'}
 
-    def get_attendance_records(self, employee_id: str, start_date: str, end_date: str) -> List[Dict]:
-        """获取考勤记录"""
+    def get_employees_by_name(self, name: str) -> List[Dict]:
+        """姓名完全相同的员工（含部门和职位名称），按工号排序"""
+        try:
+            names, joins = self._name_columns('e')
+            query = f"""
+                SELECT e.*{names} FROM {Config.HR_TABLES['employees']} e
+                {joins}
+                WHERE e.name = :name
+                ORDER BY e.employee_id
+            """
+            return self._attach_names(self._fetch_all(query, {'name': name}), joins)
+        except Exception as e:
+            return {'error': f'获取员工信息失败: {str(e)}'}
+
+    def get_attendance_records(self, employee_id: str, start_date: str, end_date: str,
+                               limit: int = None, after_date: str = None) -> List[Dict]:
+        """获取考勤记录，按日期排序，可从after_date之后分页读取"""
         query = f"""
             SELECT * FROM {Config.HR_TABLES['attendance']}
             WHERE employee_id = :employee_id
             AND date BETWEEN :start_date AND :end_date
         """
+        params = {
+            'employee_id': employee_id,
+            'start_date': start_date,
+            'end_date': end_date
+        }
+        # 每名员工每天一条考勤记录，日期即可作为分页键
+        query = self._paginate(query, params, 'date', after_date, limit)
         try:
-            result = pd.read_sql(query, self.engine, params={
-                'employee_id': employee_id,
-                'start_date': start_date,
-                'end_date': end_date
-            })
-            return result.to_dict('records')
+            return self._fetch_all(query, params)
         except Exception as e:
             return {'error': f'获取考勤记录失败: {str(e)}'}
 
-    def get_career_history(self, employee_id: str) -> List[Dict]:
-        """获取职业发展历程"""
+    def get_attendance_summary(self, start_date: str, end_date: str, employee_id: str = None,
+                               department_id: str = None) -> Dict:
+        """
+        获取考勤统计（各状态天数、平均签到时间、总工时）
+
+        整月或整周区间直接读取汇总表，其余区间按状态聚合考勤记录。
+        指定部门时包含其全部下级部门。
+        """
+        try:
+            department_ids = self.get_sub_department_ids(department_id) if department_id else None
+            if self._rollups_ready():
+                summary = self.rollups.get_summary(start_date, end_date, employee_id, department_ids)
+                if summary is not None:
+                    return summary
+            return self._aggregate_attendance(start_date, end_date, employee_id, department_ids)
+        except Exception as e:
+            return {'error': f'获取考勤统计失败: {str(e)}'}
+
+    def _rollups_ready(self) -> bool:
+        """考勤汇总表是否可用（依赖考勤表的自增id水位）"""
+        if self._rollups_available is None:
+            self._rollups_available = (
+                self.has_column('attendance', 'id')
+                and self.has_column('attendance_summary_employee', 'employee_id')
+                and self.has_column('rollup_gaps', 'record_id')
+            )
+        return self._rollups_available
+
+    def sync_attendance_rollups(self) -> int:
+        """立即将新考勤记录同步到汇总表，汇总表不可用时返回0"""
+        return self.rollups.sync(force=True) if self._rollups_ready() else 0
+
+    def start_background_sync(self):
+        """启动考勤汇总和员工搜索索引的后台同步线程，查询时不再同步"""
+        self.rollups.start(self._rollups_ready)
+        self.search_index.start()
+
+    def _aggregate_attendance(self, start_date: str, end_date: str, employee_id: str = None,
+                              department_ids: List[str] = None) -> Dict:
+        """
+        直接按状态聚合区间内的考勤记录
+
+        同时按签到时间分组（至多每分钟一组），平均签到时间与汇总表使用相同的解析方式计算。
+        """
         query = f"""
-            SELECT ch.*, d.department_name, p.position_name
-            FROM {Config.HR_TABLES['career']} ch
-            LEFT JOIN {Config.HR_TABLES['departments']} d ON ch.department_id = d.department_id
-            LEFT JOIN {Config.HR_TABLES['positions']} p ON ch.position_id = p.position_id
-            WHERE ch.employee_id = :employee_id
-            ORDER BY ch.start_date DESC
+            SELECT a.status, a.check_in, COUNT(*) AS days, SUM(a.work_hours) AS hours
+            FROM {Config.HR_TABLES['attendance']} a
         """
+        params = {'start_date': start_date, 'end_date': end_date}
+        if department_ids:
+            placeholders = ', '.join(f':d{i}' for i in range(len(department_ids)))
+            query += f"""
+            JOIN {Config.HR_TABLES['employees']} e ON a.employee_id = e.employee_id
+            WHERE e.department_id IN ({placeholders})
+            """
+            params.update({f'd{i}': v for i, v in enumerate(department_ids)})
+        else:
+            query += " WHERE 1=1"
+        if employee_id:
+            query += " AND a.employee_id = :employee_id"
+            params['employee_id'] = employee_id
+        query += " AND a.date BETWEEN :start_date AND :end_date GROUP BY a.status, a.check_in"
+
+        totals = {'total_days': 0, 'total_hours': 0.0, 'check_in_minutes': 0, 'check_in_count': 0}
+        for row in self._fetch_all(query, params):
+            column = STATUS_COLUMNS.get(row['status'], 'other_days')
+            totals[column] = totals.get(column, 0) + row['days']
+            totals['total_days'] += row['days']
+            totals['total_hours'] += float(row['hours'] or 0)
+            minutes = check_in_minutes(row['check_in'])
+            if minutes is not None:
+                totals['check_in_minutes'] += minutes * row['days']
+                totals['check_in_count'] += row['days']
+        return summarize(totals)
+
+    def get_sub_department_ids(self, department_id: str) -> List[str]:
+        """返回部门及其全部下级部门的ID（读取内存组织架构中预先计算的闭包）"""
+        self.org_graph.refresh()
+        return self.org_graph.sub_departments(department_id)
+
+    def get_career_history(self, employee_id: str) -> List[Dict]:
+        """获取职业发展历程"""
         try:
-            result = pd.read_sql(query, self.engine, params={'employee_id': employee_id})
-            return result.to_dict('records')
+            names, joins = self._name_columns('ch')
+            query = f"""
+                SELECT ch.*{names}
+                FROM {Config.HR_TABLES['career']} ch
+                {joins}
+                WHERE ch.employee_id = :employee_id
+                ORDER BY ch.start_date DESC
+            """
+            return self._attach_names(self._fetch_all(query, {'employee_id': employee_id}), joins)
         except Exception as e:
             return {'error': f'获取职业发展历程失败: {str(e)}'}
 
-    def get_department_info(self, department_id: str = None) -> List[Dict]:
-        """获取部门信息"""
+    def get_department_info(self, department_id: str = None, limit: int = None,
+                            after_id: str = None) -> List[Dict]:
+        """获取部门信息，按部门ID排序，可从after_id之后分页读取；优先读取参考数据缓存"""
+        try:
+            if department_id:
+                departments = self.reference.records('departments')
+                if departments is not None:
+                    department = departments.get(str(department_id))
+                    return [dict(department)] if department else []
+            else:
+                page = self.reference.page('departments', limit, after_id)
+                if page is not None:
+                    return page
+        except Exception as e:
+            return {'error': f'获取部门信息失败: {str(e)}'}
+
         query = f"""
             SELECT * FROM {Config.HR_TABLES['departments']}
             WHERE 1=1
@@ -73,30 +273,190 @@ class HRDatabaseHandler:
         if department_id:
             query += " AND department_id = :department_id"
             params['department_id'] = department_id
+        query = self._paginate(query, params, 'department_id', after_id, limit)
 
         try:
-            result = pd.read_sql(query, self.engine, params=params)
-            return result.to_dict('records')
+            return self._fetch_all(query, params)
         except Exception as e:
             return {'error': f'获取部门信息失败: {str(e)}'}
 
-    def search_employees(self, search_term: str) -> List[Dict]:
-        """搜索员工信息"""
+    def ping(self) -> bool:
+        """检查数据库连接是否可用"""
+        with self.engine.connect() as conn:
+            conn.execute(_statement("SELECT 1"))
+        return True
+
+    def ensure_search_index(self) -> bool:
+        """
+        创建并构建员工搜索索引，在启动前的准备步骤和预热时调用
+
+        请求中不执行；失败时由后台同步线程重试，其间搜索使用LIKE查询。
+        """
+        if not self.search_index.available:
+            self.search_index.ensure()
+        return self.search_index.available
+
+    def search_employees(self, search_term: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """
+        搜索员工信息，优先使用全文索引并按相关度排序
+
+        相关度排序没有稳定的分页键，翻页使用offset跳过前面的结果。
+        """
+        terms = extract_search_terms(search_term) or [search_term.strip()]
+        try:
+            ranked_ids = self.search_index.search(terms, limit, offset)
+            if ranked_ids is None:
+                return self._search_employees_like(terms, limit, offset)
+            if not ranked_ids:
+                return []
+
+            placeholders = ', '.join(f':id{i}' for i in range(len(ranked_ids)))
+            names, joins = self._name_columns('e')
+            query = f"""
+                SELECT e.*{names}
+                FROM {Config.HR_TABLES['employees']} e
+                {joins}
+                WHERE e.employee_id IN ({placeholders})
+            """
+            rows = self._attach_names(self._fetch_all(query, {f'id{i}': v for i, v in enumerate(ranked_ids)}), joins)
+            rank = {employee_id: i for i, employee_id in enumerate(ranked_ids)}
+            exact = {t.lower() for t in terms}
+            # 姓名或工号完全匹配的排在最前，其余按索引相关度
+            rows.sort(key=lambda r: (
+                str(r.get('name', '')).lower() not in exact and str(r.get('employee_id', '')).lower() not in exact,
+                rank.get(str(r.get('employee_id')), len(rank))
+            ))
+            return rows
+        except Exception as e:
+            return {'error': f'搜索员工信息失败: {str(e)}'}
+
+    def _search_employees_like(self, terms: List[str], limit: int, offset: int = 0) -> List[Dict]:
+        """
+        全文索引不可用或搜索词过短时使用LIKE搜索，按工号排序
+
+        短于索引最短词长的搜索词（如“姓王”中的“王”）按前缀匹配，可以使用姓名、邮箱和工号上的普通索引。
+        """
+        clauses = []
+        params = {'limit': limit, 'offset': offset}
+        for i, term in enumerate(terms):
+            params[f'term{i}'] = f'{term}%' if len(term) < self.search_index.min_term_length else f'%{term}%'
+            clauses.append(
+                f"e.name LIKE :term{i} OR e.employee_id LIKE :term{i} OR e.email LIKE :term{i}"
+            )
+        names, joins = self._name_columns('e')
         query = f"""
-            SELECT e.*, d.department_name, p.position_name
+            SELECT e.*{names}
             FROM {Config.HR_TABLES['employees']} e
-            LEFT JOIN {Config.HR_TABLES['departments']} d ON e.department_id = d.department_id
-            LEFT JOIN {Config.HR_TABLES['positions']} p ON e.position_id = p.position_id
-            WHERE e.name LIKE :search_term
-            OR e.employee_id LIKE :search_term
-            OR e.email LIKE :search_term
+            {joins}
+            WHERE {' OR '.join(clauses)}
+            ORDER BY e.employee_id
+            LIMIT :limit OFFSET :offset
         """
+        return self._attach_names(self._fetch_all(query, params), joins)
+
+    def has_column(self, table_key: str, column: str) -> bool:
+        """检查HR表中是否存在指定列"""
         try:
-            result = pd.read_sql(query, self.engine, params={'search_term': f'%{search_term}%'})
-            return result.to_dict('records')
+            columns = inspect(self.engine).get_columns(Config.HR_TABLES[table_key])
+            return any(c['name'] == column for c in columns)
+        except Exception:
+            return False
+
+    def get_employee_directory(self, updated_since: str = None) -> List[Dict]:
+        """获取员工目录（工号、姓名、邮箱），可只取某时间及之后更新的记录"""
+        columns = "employee_id, name, email"
+        track_updates = self.has_column('employees', 'updated_at')
+        if track_updates:
+            columns += ", updated_at"
+        query = f"SELECT {columns} FROM {Config.HR_TABLES['employees']} WHERE 1=1"
+        params = {}
+        if updated_since and track_updates:
+            query += " AND updated_at >= :updated_since"
+            params['updated_since'] = updated_since
+
+        try:
+            return self._fetch_all(query, params)
         except Exception as e:
-            return {'error': f'搜索员工信息失败: {str(e)}'}
+            return {'error': f'获取员工目录失败: {str(e)}'}
+
+    def _checksum_sql(self, columns: List[str]) -> Optional[str]:
+        """各行指定列拼接后的哈希之和，与行的顺序无关；数据库没有可用的哈希函数时返回None"""
+        dialect = self.engine.dialect.name
+        if dialect == 'mysql':
+            values = ', '.join(f"COALESCE(CAST({c} AS CHAR), '~')" for c in columns)
+            return f"COALESCE(SUM(CRC32(CONCAT_WS('|', {values}))), 0)"
+        if dialect == 'postgresql':
+            values = ', '.join(f"COALESCE(CAST({c} AS TEXT), '~')" for c in columns)
+            return f"COALESCE(SUM(('x' || SUBSTR(MD5(CONCAT_WS('|', {values})), 1, 8))::bit(32)::int), 0)"
+        return None
+
+    def get_table_version(self, table_key: str, columns: List[str]) -> Optional[str]:
+        """
+        表的变更探测值：行数及关键列的校验和，用于判断小表是否需要重新加载
+
+        不依赖updated_at，改名、调整上级部门或主管都会使校验和变化。MySQL和PostgreSQL
+        在数据库中聚合哈希；SQLite没有哈希函数，读取关键列后在本地计算（仅用于小表）。
+        查询失败时返回None
+        """
+        cached = self._version_columns.get(table_key)
+        if cached is None:
+            cached = [c for c in columns if self.has_column(table_key, c)]
+            self._version_columns[table_key] = cached
+        table = Config.HR_TABLES[table_key]
+        checksum = self._checksum_sql(cached)
+        try:
+            if checksum is not None:
+                row = self._fetch_all(f"SELECT COUNT(*) AS row_count, {checksum} AS checksum FROM {table}")[0]
+                return f"{row['row_count']}:{row['checksum']}"
+            rows = self._fetch_all(f"SELECT {', '.join(cached)} FROM {table}")
+        except Exception:
+            return None
+        digest = hashlib.md5()
+        for line in sorted('|'.join('~' if row[c] is None else str(row[c]) for c in cached) for row in rows):
+            digest.update(line.encode('utf-8'))
+            digest.update(b'\n')
+        return f"{len(rows)}:{digest.hexdigest()}"
+
+    def get_reference_rows(self, table_key: str) -> List[Dict]:
+        """整表读取参考数据（部门、岗位）"""
+        try:
+            return self._fetch_all(f"SELECT * FROM {Config.HR_TABLES[table_key]}")
+        except Exception as e:
+            return {'error': f'获取参考数据失败: {str(e)}'}
+
+    def count_rows(self, table_key: str) -> Optional[int]:
+        """表的总行数，查询失败时返回None"""
+        try:
+            return self._fetch_all(f"SELECT COUNT(*) AS row_count FROM {Config.HR_TABLES[table_key]}")[0]['row_count']
+        except Exception:
+            return None
+
+    def get_org_employees(self, updated_since: str = None) -> List[Dict]:
+        """
+        获取员工的部门、岗位和汇报关系，可只取某时间之后更新的记录
+
+        包含updated_at等于updated_since的记录：同一时间戳的修改可能在上次读取之后才提交
+        """
+        columns = "employee_id, name, email, department_id, position_id, manager_id, status"
+        track_updates = self.has_column('employees', 'updated_at')
+        if track_updates:
+            columns += ", updated_at"
+        query = f"SELECT {columns} FROM {Config.HR_TABLES['employees']} WHERE 1=1"
+        params = {}
+        if updated_since and track_updates:
+            query += " AND updated_at >= :updated_since"
+            params['updated_since'] = updated_since
+
+        try:
+            return self._fetch_all(query, params)
+        except Exception as e:
+            return {'error': f'获取组织架构失败: {str(e)}'}
 
     def close(self):
         """关闭数据库连接"""
-        self.session.close()
+        self.router.close()
+        self.rollups.close()
+        self.search_index.close()
+        if self.maintenance_engine is not self.engine:
+            self.maintenance_engine.dispose()
+        self.engine.dispose()
@@ -0,0 +1,88 @@
+import itertools
+import logging
+import threading
+from typing import Dict, List
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """
+    读请求在健康的只读副本之间轮询，写请求和没有可用副本时使用主库
+
+    后台线程按check_interval检查各副本，查询中途连接失败的副本会立即摘除，
+    恢复后由下一次检查重新加入。
+    """
+
+    def __init__(self, primary, replicas: List, check_interval: float = 15):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.check_interval = check_interval
+        self._healthy: Dict[int, bool] = {id(engine): True for engine in self.replicas}
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'replica_reads': 0, 'primary_reads': 0, 'failovers': 0}
+
+    def start(self):
+        """启动后台健康检查线程（没有副本时不启动）"""
+        if not self.replicas or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='hr-db-replica-check', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check()
+            if self._stop.wait(self.check_interval):
+                return
+
+    @staticmethod
+    def ping(engine) -> bool:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    def check(self):
+        """检查所有副本并更新健康状态"""
+        for engine in self.replicas:
+            healthy = self.ping(engine)
+            with self._lock:
+                if healthy != self._healthy[id(engine)]:
+                    logger.warning("只读副本 %s %s", engine.url.host, "恢复" if healthy else "不可用")
+                self._healthy[id(engine)] = healthy
+
+    def read_engine(self):
+        """下一个健康的副本，没有时返回主库"""
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                engine = next(self._cycle)
+                if self._healthy[id(engine)]:
+                    self.stats['replica_reads'] += 1
+                    return engine
+            self.stats['primary_reads'] += 1
+            return self.primary
+
+    def mark_failed(self, engine):
+        """查询时连接失败的副本立即摘除，等待下次健康检查恢复"""
+        with self._lock:
+            if self._healthy.get(id(engine)):
+                self._healthy[id(engine)] = False
+                self.stats['failovers'] += 1
+                logger.warning("只读副本 %s 查询失败，暂时改用主库", engine.url.host)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            healthy = sum(self._healthy.values())
+        return {'replicas': len(self.replicas), 'healthy_replicas': healthy, **self.stats}
+
+    def close(self):
+        self._stop.set()
+        for engine in self.replicas:
+            engine.dispose()
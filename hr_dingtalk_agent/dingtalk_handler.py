@@ -1,16 +1,76 @@
+import json
+import logging
+import re
 from typing import Dict, Optional
 from dingtalk import AppKeyClient
 from config import Config
 from ai_agent import HRAIAgent
+from cache import AccessTokenRefresher, SingleFlight, TTLCache
+from exporter import ReportExporter
+from reply_pages import is_next_page
+from shared_store import SharedStore
+from tracing import current_request_id, span
+
+try:
+    from dingtalk.storage.kvstorage import KvStorage
+except ImportError:  # 旧版SDK没有键值存储适配，退回SDK默认的进程内存储
+    KvStorage = None
+
+logger = logging.getLogger(__name__)
+
+# 钉钉接口返回的"用户不存在"错误码
+USER_NOT_FOUND_ERRCODE = 60121
+
+_QUERY_NOISE = re.compile(r'[\s，。！？、,.!?~～]+')
+
+
+def normalize_query(content: str) -> str:
+    """归一化查询文本（去掉空白和标点、转小写），用于合并相同的并发查询"""
+    return _QUERY_NOISE.sub('', content).lower()
 
 class DingTalkHandler:
-    def __init__(self):
+    def __init__(self, shared_store=None):
+        """
+        Args:
+            shared_store: 可选的SharedStore，多个worker进程通过它共享访问令牌和用户信息缓存
+        """
+        client_options = {}
+        if shared_store is not None and KvStorage is not None:
+            client_options['storage'] = KvStorage(shared_store, prefix='dingtalk')
         self.client = AppKeyClient(
             app_key=Config.DINGTALK_APP_KEY,
-            app_secret=Config.DINGTALK_APP_SECRET
+            app_secret=Config.DINGTALK_APP_SECRET,
+            **client_options
         )
         self.agent_id = Config.DINGTALK_AGENT_ID
         self.ai_agent = HRAIAgent()
+        self.user_cache = TTLCache(
+            maxsize=Config.USER_CACHE_SIZE,
+            ttl=Config.USER_CACHE_TTL,
+            negative_ttl=Config.USER_CACHE_NEGATIVE_TTL,
+            shared=shared_store,
+            namespace='user'
+        )
+        self.token_refresher = AccessTokenRefresher(
+            self.client.get_access_token,
+            refresh_margin=Config.ACCESS_TOKEN_REFRESH_MARGIN
+        )
+        # 同时在处理中的相同查询只执行一次
+        self.inflight_queries = SingleFlight()
+        # 各用户最近一次分页查询的翻页状态，多worker部署时保存在共享存储中
+        self.page_store = shared_store if shared_store is not None else SharedStore(':memory:')
+        self.exporter = ReportExporter(
+            workers=Config.EXPORT_WORKERS, shared=self.page_store, lock_ttl=Config.EXPORT_LOCK_TTL
+        )
+
+    def start(self):
+        """启动后台任务（访问令牌主动刷新、考勤汇总同步），需在事件循环中调用"""
+        self.token_refresher.start()
+        self.ai_agent.start()
+
+    async def warm_up(self):
+        """预热数据库连接池和查询索引"""
+        await self.ai_agent.warm_up()
 
     async def handle_message(self, message: Dict) -> Dict:
         """处理来自钉钉的消息"""
@@ -19,11 +79,12 @@ class DingTalkHandler:
             sender_id = message.get('senderStaffId')
             
             # 获取发送者信息
-            sender_info = await self.get_user_info(sender_id)
+            with span('get_user_info'):
+                sender_info = await self.get_user_info(sender_id)
             
             if msg_type == 'text':
                 content = message.get('text', {}).get('content', '')
-                return await self.process_text_message(content, sender_info)
+                return await self.process_text_message(content, sender_info, sender_id)
             else:
                 return {
                     "msgtype": "text",
@@ -32,18 +93,22 @@ class DingTalkHandler:
                     }
                 }
         except Exception as e:
+            logger.exception("消息处理出错，请求ID %s", current_request_id())
             return {
                 "msgtype": "text",
                 "text": {
-                    "content": f"消息处理出错: {str(e)}"
+                    "content": f"消息处理出错: {str(e)}（请求ID: {current_request_id()}）"
                 }
             }
 
-    async def process_text_message(self, content: str, sender_info: Dict) -> Dict:
-        """处理文本消息"""
+    async def process_text_message(self, content: str, sender_info: Dict, sender_id: str = None) -> Dict:
+        """处理文本消息，回复“下一页”时继续该用户上一次查询的结果"""
         try:
             # 检查用户权限
-            if not await self.check_user_permission(sender_info):
+            with span('check_permission'):
+                allowed = await self.check_user_permission(sender_info)
+                viewer = self._viewer_for(sender_info)
+            if not allowed:
                 return {
                     "msgtype": "text",
                     "text": {
@@ -51,43 +116,128 @@ class DingTalkHandler:
                     }
                 }
 
-            # 使用AI Agent处理查询
-            response = self.ai_agent.process_query(content)
+            normalized = normalize_query(content)
+            if is_next_page(normalized):
+                with span('process_query', page=True):
+                    response = await self._next_page(sender_id)
+            else:
+                # 使用AI Agent处理查询，相同查询正在处理时共享其结果；
+                # 限制权限时结果因发送者而异，只合并同一发送者的相同查询
+                key = normalized if viewer is None else f'{viewer}:{normalized}'
+                with span('process_query'):
+                    response = await self.inflight_queries.do(
+                        key,
+                        lambda: self.ai_agent.process_query(content, viewer)
+                    )
+            # 合并的查询共享同一个响应对象，翻页状态按发送者分别保存，不修改响应本身
+            self._save_page_state(sender_id, response.get('next'))
+            if response.get('export'):
+                response = self._start_export(sender_id, response)
             
             # 转换为钉钉消息格式
             return self.format_dingtalk_message(response)
             
         except Exception as e:
+            logger.exception("查询处理出错，请求ID %s", current_request_id())
             return {
                 "msgtype": "text",
                 "text": {
-                    "content": f"查询处理出错: {str(e)}"
+                    "content": f"查询处理出错: {str(e)}（请求ID: {current_request_id()}）"
                 }
             }
 
+    async def _next_page(self, sender_id: str) -> Dict:
+        state = self.page_store.get(f'page:{sender_id}') if sender_id else None
+        if state is None:
+            return {"type": "text", "content": "没有可以继续查看的结果，请重新查询"}
+        return await self.ai_agent.next_page(json.loads(state))
+
+    def _save_page_state(self, sender_id: str, state: Optional[Dict]):
+        """保存下一页的查询状态；没有下一页时清除，避免“下一页”接上更早的查询"""
+        if not sender_id:
+            return
+        key = f'page:{sender_id}'
+        if state:
+            self.page_store.set(key, json.dumps(state, ensure_ascii=False, default=str), ttl=Config.REPLY_PAGE_TTL)
+        else:
+            self.page_store.delete(key)
+
+    def _start_export(self, sender_id: str, response: Dict) -> Dict:
+        """提交后台报表导出，完成后主动推送下载链接"""
+        if not sender_id:
+            return {"type": "text", "content": "无法确定发送者，不能推送报表"}
+        if not self.exporter.start(sender_id, response['export'], self._deliver_export):
+            return {"type": "text", "content": "您的上一份报表仍在生成中，请完成后再试"}
+        return response
+
+    async def _deliver_export(self, user_id: str, result: Optional[Dict], error: Optional[Exception]):
+        if error is not None:
+            message = {"msgtype": "text", "text": {"content": f"报表生成失败: {str(error)}"}}
+        elif not result['rows']:
+            message = {"msgtype": "text", "text": {"content": "报表中没有符合条件的数据"}}
+        else:
+            link = f"{Config.EXPORT_BASE_URL.rstrip('/')}/exports/{result['filename']}"
+            hours = Config.EXPORT_TTL / 3600
+            message = {
+                "msgtype": "markdown",
+                "markdown": {
+                    "title": "报表已生成",
+                    "text": f"#### 报表已生成\n\n共{result['rows']}行，[点击下载]({link})\n\n> 链接{hours:g}小时内有效"
+                }
+            }
+        await self.send_message(user_id, message)
+
     async def get_user_info(self, user_id: str) -> Dict:
-        """获取钉钉用户信息"""
+        """获取钉钉用户信息，结果按USER_CACHE_TTL缓存"""
         try:
-            response = await self.client.user.get(user_id)
-            return {
-                'userid': response.get('userid'),
-                'name': response.get('name'),
-                'department': response.get('department'),
-                'position': response.get('position'),
-                'email': response.get('email')
-            }
+            user_info = await self.user_cache.get(user_id, lambda: self._fetch_user_info(user_id))
+            if user_info is None:
+                return {'error': f'获取用户信息失败: 用户{user_id}不存在'}
+            return user_info
         except Exception as e:
             return {'error': f'获取用户信息失败: {str(e)}'}
 
-    async def check_user_permission(self, user_info: Dict) -> bool:
-        """检查用户权限"""
+    async def _fetch_user_info(self, user_id: str) -> Optional[Dict]:
+        """从钉钉接口获取用户信息，用户不存在时返回None"""
         try:
-            # 这里可以实现具体的权限检查逻辑
-            # 例如检查用户是否属于特定部门，是否有特定角色等
+            response = await self.client.user.get(user_id)
+        except Exception as e:
+            if getattr(e, 'errcode', None) == USER_NOT_FOUND_ERRCODE:
+                return None
+            raise
+        if not response or not response.get('userid'):
+            return None
+        return {
+            'userid': response.get('userid'),
+            'name': response.get('name'),
+            'department': response.get('department'),
+            'position': response.get('position'),
+            'email': response.get('email')
+        }
+
+    async def check_user_permission(self, user_info: Dict) -> bool:
+        """
+        检查用户权限
+
+        PERMISSION_MODE为org时，发送者须能在内存组织架构中对应到在职员工（钉钉userid与工号相同或邮箱相同），
+        具体能查询哪些员工和部门由HRAIAgent按组织架构判断。
+        """
+        if Config.PERMISSION_MODE != 'org':
             return True
+        try:
+            if not user_info or 'error' in user_info:
+                return False
+            await self.ai_agent.adb.run(self.ai_agent.org.refresh)
+            return self.ai_agent.org.resolve_user(user_info) is not None
         except Exception:
             return False
 
+    def _viewer_for(self, user_info: Dict) -> Optional[str]:
+        """发送者对应的工号，不限制权限时为None"""
+        if Config.PERMISSION_MODE != 'org' or not user_info or 'error' in user_info:
+            return None
+        return self.ai_agent.org.resolve_user(user_info)
+
     def format_dingtalk_message(self, response: Dict) -> Dict:
         """将AI响应格式化为钉钉消息格式"""
         if response['type'] == 'text':
@@ -127,5 +277,7 @@ class DingTalkHandler:
             return False
 
     def close(self):
-        """关闭AI Agent连接"""
+        """停止后台任务并关闭AI Agent连接"""
+        self.token_refresher.stop()
+        self.exporter.close()
         self.ai_agent.close()
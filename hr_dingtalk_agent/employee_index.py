@@ -0,0 +1,182 @@
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from aho_corasick import AhoCorasick
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # pypinyin为可选依赖，缺失时不支持拼音匹配
+    lazy_pinyin = None
+
+
+class EmployeeMention(NamedTuple):
+    text: str
+    start: int
+    end: int
+    field: str
+    candidates: List[Dict]
+
+
+def _pinyin_keys(name: str) -> Dict[str, str]:
+    """生成姓名的全拼和首字母"""
+    if lazy_pinyin is None or not name:
+        return {}
+    syllables = lazy_pinyin(name)
+    keys = {'pinyin': ''.join(syllables).lower()}
+    if len(syllables) > 1:
+        keys['initials'] = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER)).lower()
+    return keys
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and (char.isalnum() or char in '_.@-')
+
+
+class EmployeeIndex:
+    """
+    员工姓名/工号/邮箱/拼音的内存索引
+
+    所有名称构建在一个Aho-Corasick自动机中，单次扫描即可找出查询中提到的所有员工。
+    刷新时只拉取updated_at之后变化的记录，有变化时在新的自动机中重建后与员工表一起整体替换，
+    匹配时取一次快照，不会读到刷新到一半的索引。表的行数与已加载的员工数不一致（有员工被删除）
+    或距上次整体加载超过full_reload_interval时整体重新加载。
+    """
+
+    # 同一位置多种匹配时的优先级
+    FIELD_PRIORITY = {'employee_id': 5, 'email': 4, 'name': 3, 'pinyin': 2, 'initials': 1}
+
+    def __init__(self, db, refresh_interval: float = 300, full_reload_interval: float = 3600):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self._refresh_lock = threading.Lock()
+        # (工号 -> 员工, 自动机)，刷新时整体替换
+        self._state = ({}, AhoCorasick())
+        self._watermark: Optional[str] = None
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+
+    def _keys_for(self, employee: Dict) -> Dict[str, str]:
+        """员工记录对应的所有可匹配名称"""
+        keys = {}
+        if employee.get('employee_id'):
+            keys['employee_id'] = str(employee['employee_id']).lower()
+        if employee.get('email'):
+            keys['email'] = str(employee['email']).lower()
+        if employee.get('name'):
+            keys['name'] = str(employee['name']).lower()
+            keys.update(_pinyin_keys(str(employee['name'])))
+        return keys
+
+    @staticmethod
+    def _build(employees: Dict[str, Dict]) -> AhoCorasick:
+        automaton = AhoCorasick()
+        for employee_id, employee in employees.items():
+            for field, key in employee['_keys'].items():
+                automaton.add(key, (employee_id, field))
+                if field == 'email' and '@' in key:
+                    automaton.add(key.split('@')[0], (employee_id, 'email'))
+        automaton.build()
+        return automaton
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        刷新索引，force时整体重新加载
+
+        Returns:
+            int: 本次加入或更新的员工数
+        """
+        with self._refresh_lock:
+            now = time.time()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+            full_reload = force or now - self._last_full_reload >= self.full_reload_interval
+            changed = self._load(full_reload)
+            if changed is None:
+                return 0
+            if not full_reload:
+                count = self.db.count_rows('employees')
+                if count is not None and count != len(self._state[0]):
+                    changed = self._load(True) or changed
+            return changed
+
+    def _load(self, full_reload: bool) -> Optional[int]:
+        """读取员工目录并替换索引，查询失败时返回None"""
+        # 水位取>=，同一时间戳晚提交的记录不会遗漏，重复读到的记录不算变化
+        rows = self.db.get_employee_directory(None if full_reload else self._watermark)
+        if isinstance(rows, dict):
+            return None
+        employees = {} if full_reload else dict(self._state[0])
+        changed = 0
+        for row in rows:
+            if row.get('employee_id') is None:
+                continue
+            employee = dict(row)
+            employee['_keys'] = self._keys_for(employee)
+            employee_id = str(employee['employee_id'])
+            previous = employees.get(employee_id)
+            if previous is None or previous['_keys'] != employee['_keys']:
+                changed += 1
+            employees[employee_id] = employee
+        if full_reload or changed:
+            # 新自动机构建完成后再替换，匹配中的查询继续使用旧快照
+            self._state = (employees, self._build(employees))
+        if full_reload:
+            self._last_full_reload = time.time()
+            self._watermark = None
+        for row in rows:
+            if row.get('updated_at') is not None:
+                updated_at = str(row['updated_at'])
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+        return changed
+
+    def find_mentions(self, query: str) -> List[EmployeeMention]:
+        """
+        找出查询中提到的所有员工，重叠的匹配保留最长的
+
+        重名时一个匹配对应多个候选员工。只读取当前快照，不刷新索引（会在事件循环中等待刷新锁和数据库），
+        调用方应先在数据库线程中调用refresh。
+        """
+        employees, automaton = self._state
+        text = query.lower()
+        matches: Dict[tuple, Dict] = {}
+        for start, end, (employee_id, field) in automaton.iter_matches(text):
+            employee = employees.get(employee_id)
+            matched = text[start:end]
+            # 英文/数字名称需在词边界上
+            if matched.isascii() and (
+                (start > 0 and _is_word_char(text[start - 1]))
+                or (end < len(text) and _is_word_char(text[end]))
+            ):
+                continue
+            span = matches.setdefault((start, end), {'field': field, 'candidates': {}})
+            if self.FIELD_PRIORITY[field] > self.FIELD_PRIORITY[span['field']]:
+                span['field'] = field
+            span['candidates'][employee_id] = employee
+
+        mentions = []
+        covered_until = -1
+        for (start, end), span in sorted(matches.items(), key=lambda item: (item[0][0], -item[0][1])):
+            if start < covered_until:
+                continue
+            covered_until = end
+            candidates = [
+                {k: v for k, v in employee.items() if not k.startswith('_')}
+                for employee in span['candidates'].values()
+            ]
+            mentions.append(EmployeeMention(query[start:end], start, end, span['field'], candidates))
+        return mentions
+
+    def resolve(self, query: str) -> List[Dict]:
+        """返回查询中提到的员工候选列表"""
+        seen = {}
+        for mention in self.find_mentions(query):
+            for candidate in mention.candidates:
+                seen.setdefault(str(candidate['employee_id']), candidate)
+        return list(seen.values())
+
+    def __len__(self) -> int:
+        return len(self._state[0])
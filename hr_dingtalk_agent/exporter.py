@@ -0,0 +1,255 @@
+import asyncio
+import csv
+import logging
+import multiprocessing
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import Config
+from shared_store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+# 报表类型：标题、列（表头, 字段名）
+EXPORT_LAYOUTS = {
+    'attendance': ('部门考勤', [
+        ('日期', 'date'), ('工号', 'employee_id'), ('姓名', 'name'), ('部门', 'department_name'),
+        ('签到时间', 'check_in'), ('签退时间', 'check_out'), ('状态', 'status'),
+    ]),
+    'employees': ('部门员工', [
+        ('工号', 'employee_id'), ('姓名', 'name'), ('部门', 'department_name'),
+        ('职位', 'position_name'), ('邮箱', 'email'), ('入职日期', 'hire_date'),
+    ]),
+}
+
+
+def _export_engine():
+    """
+    导出进程自己的数据库引擎，有只读副本时使用第一个副本，避免大查询占用主库
+
+    导出的查询会读取整个部门的数据，不受DB_STATEMENT_TIMEOUT限制。
+    """
+    from sqlalchemy import create_engine
+
+    urls = Config.get_replica_urls()
+    return create_engine(
+        urls[0] if urls else Config.get_db_url(),
+        **Config.get_engine_options(replica=bool(urls), statement_timeout=0, pool_size=1)
+    )
+
+
+def _sub_department_ids(conn, department_id: str) -> List[str]:
+    from sqlalchemy import text
+
+    children = {}
+    for row in conn.execute(text(f"SELECT department_id, parent_id FROM {Config.HR_TABLES['departments']}")):
+        children.setdefault(row[1], []).append(row[0])
+    result, pending = [], [department_id]
+    while pending:
+        current = pending.pop()
+        if current in result:
+            continue
+        result.append(current)
+        pending.extend(children.get(current, []))
+    return result
+
+
+def _report_query(job: Dict, department_ids: List[str]) -> Tuple[str, Dict]:
+    placeholders = ', '.join(f':d{i}' for i in range(len(department_ids)))
+    params = {f'd{i}': v for i, v in enumerate(department_ids)}
+    if job['kind'] == 'attendance':
+        params.update({'start_date': job['start_date'], 'end_date': job['end_date']})
+        query = f"""
+            SELECT a.date, a.employee_id, e.name, d.department_name, a.check_in, a.check_out, a.status
+            FROM {Config.HR_TABLES['attendance']} a
+            JOIN {Config.HR_TABLES['employees']} e ON a.employee_id = e.employee_id
+            LEFT JOIN {Config.HR_TABLES['departments']} d ON e.department_id = d.department_id
+            WHERE e.department_id IN ({placeholders})
+            AND a.date BETWEEN :start_date AND :end_date
+            ORDER BY a.date, a.employee_id
+        """
+    else:
+        query = f"""
+            SELECT e.employee_id, e.name, d.department_name, p.position_name, e.email, e.hire_date
+            FROM {Config.HR_TABLES['employees']} e
+            LEFT JOIN {Config.HR_TABLES['departments']} d ON e.department_id = d.department_id
+            LEFT JOIN {Config.HR_TABLES['positions']} p ON e.position_id = p.position_id
+            WHERE e.department_id IN ({placeholders})
+            ORDER BY e.department_id, e.employee_id
+        """
+    return query, params
+
+
+def stream_rows(conn, query: str, params: Dict, batch_size: int) -> Iterator[Dict]:
+    """
+    使用服务端游标逐批读取结果
+
+    stream_results使PostgreSQL使用命名游标、MySQL使用非缓冲游标，
+    内存中只保留当前一批记录，与结果总行数无关。
+    """
+    from sqlalchemy import text
+
+    result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(text(query), params)
+    try:
+        while True:
+            rows = result.mappings().fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield row
+    finally:
+        result.close()
+
+
+def write_csv(path: str, columns: Sequence[Tuple[str, str]], rows: Iterator[Dict]) -> int:
+    """逐行写入CSV（带BOM，Excel可直接打开中文），返回行数"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow([header for header, _ in columns])
+        for row in rows:
+            writer.writerow(['' if row[field] is None else row[field] for _, field in columns])
+            count += 1
+    return count
+
+
+def write_xlsx(path: str, title: str, columns: Sequence[Tuple[str, str]], rows: Iterator[Dict]) -> int:
+    """以只写模式逐行写入XLSX，内存占用不随行数增长，返回行数"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([header for header, _ in columns])
+    count = 0
+    for row in rows:
+        sheet.append([row[field] for _, field in columns])
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def run_export(job: Dict) -> Dict:
+    """
+    在导出进程中执行：查询部门（含下级部门）数据并写入文件
+
+    先写入临时文件，完成后再改名，下载链接不会读到写了一半的文件。
+    Returns:
+        {'filename', 'rows', 'format'}
+    """
+    title, columns = EXPORT_LAYOUTS[job['kind']]
+    fmt = job['format']
+    if fmt == 'xlsx':
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:  # openpyxl为可选依赖，缺失时导出CSV
+            fmt = 'csv'
+
+    os.makedirs(Config.EXPORT_DIR, exist_ok=True)
+    filename = f"{job['kind']}_{job['department_id']}_{secrets.token_urlsafe(12)}.{fmt}"
+    path = os.path.join(Config.EXPORT_DIR, filename)
+    partial = path + '.part'
+
+    engine = _export_engine()
+    try:
+        with engine.connect() as conn:
+            department_ids = _sub_department_ids(conn, job['department_id'])
+            query, params = _report_query(job, department_ids)
+            rows = stream_rows(conn, query, params, Config.EXPORT_BATCH_SIZE)
+            if fmt == 'xlsx':
+                count = write_xlsx(partial, title, columns, rows)
+            else:
+                count = write_csv(partial, columns, rows)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        engine.dispose()
+    return {'filename': filename, 'rows': count, 'format': fmt}
+
+
+def purge_exports(directory: str, ttl: float) -> int:
+    """删除超过有效期的导出文件，返回删除数量"""
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    cutoff = time.time() - ttl
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+class ReportExporter:
+    """
+    在独立进程中生成批量报表
+
+    大报表的查询和文件写入不占用事件循环和数据库查询线程池，交互查询不受影响。
+    进程使用spawn方式启动，不继承主进程的数据库连接和后台线程。
+    每个用户同时只能有一份报表在生成：生成前在shared（SharedStore）中占用该用户的键，
+    多个worker进程共用同一存储时限制对所有进程生效；进程异常退出未释放的键lock_ttl秒后过期。
+    """
+
+    def __init__(self, workers: int = 1, shared=None, lock_ttl: float = 3600):
+        self.workers = workers
+        self.shared = shared if shared is not None else SharedStore(':memory:')
+        self.lock_ttl = lock_ttl
+        self._executor = None
+        # 本进程中正在生成的用户，仅用于统计
+        self._running = set()
+        self._tasks = set()
+        self.stats = {'started': 0, 'completed': 0, 'failed': 0, 'rows': 0}
+
+    def start(self, user_id: str, job: Dict,
+              on_done: Callable[[str, Optional[Dict], Optional[Exception]], Awaitable]) -> bool:
+        """
+        在后台生成报表，完成或失败后调用on_done(user_id, result, error)
+
+        该用户已有报表在生成时返回False。需在事件循环中调用。
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        if not self.shared.add(f'export:{user_id}', ttl=self.lock_ttl):
+            return False
+        self._running.add(user_id)
+        self.stats['started'] += 1
+        task = asyncio.get_running_loop().create_task(self._run(user_id, job, on_done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, user_id: str, job: Dict, on_done):
+        loop = asyncio.get_running_loop()
+        result, error = None, None
+        try:
+            await loop.run_in_executor(None, purge_exports, Config.EXPORT_DIR, Config.EXPORT_TTL)
+            result = await loop.run_in_executor(self._executor, run_export, job)
+            self.stats['completed'] += 1
+            self.stats['rows'] += result['rows']
+        except Exception as e:
+            logger.exception("生成报表失败: %s", job)
+            self.stats['failed'] += 1
+            error = e
+        finally:
+            self._running.discard(user_id)
+            self.shared.delete(f'export:{user_id}')
+        await on_done(user_id, result, error)
+
+    def get_stats(self) -> Dict:
+        return {'running': len(self._running), **self.stats}
+
+    def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,156 @@
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from aho_corasick import AhoCorasick
+
+# 意图关键词及权重：强特征词权重高，"查询"等泛化词权重低
+INTENT_KEYWORDS = {
+    "个人信息": {"个人信息": 2.0, "基本信息": 2.0, "联系方式": 1.5, "邮箱": 1.5, "工号": 1.0, "资料": 1.0, "信息": 0.5, "个人": 0.5, "基本": 0.5},
+    "考勤": {"考勤": 2.0, "出勤": 2.0, "打卡": 2.0, "签到": 1.5, "签退": 1.5, "迟到": 1.5, "早退": 1.5, "缺勤": 1.5, "请假": 1.0},
+    "考勤统计": {"统计": 2.0, "汇总": 2.0, "几次": 2.0, "几天": 2.0, "多少次": 2.0, "多少天": 2.0, "次数": 2.0, "平均": 2.0, "出勤率": 2.0, "总工时": 2.0},
+    "履历": {"履历": 2.0, "职业发展": 2.0, "工作经历": 2.0, "任职": 1.5, "晋升": 1.5, "调岗": 1.5, "经历": 1.0, "职业": 0.5, "发展": 0.5},
+    "部门": {"部门": 1.5, "团队": 1.0, "主管": 1.0, "组织架构": 2.0, "部门列表": 2.0, "多少人": 1.5, "人数": 1.5},
+    "下属": {"下属": 2.0, "手下": 2.0, "汇报给": 2.0, "直属": 1.5, "下级员工": 2.0, "带的人": 1.5},
+    "导出": {"导出": 2.0, "报表": 2.0, "下载": 1.5, "excel": 2.0, "xlsx": 2.0, "csv": 2.0, "花名册": 2.0},
+    "搜索": {"搜索": 2.0, "查找": 1.5, "找一下": 1.5, "有哪些人": 1.5, "叫什么": 1.0, "查询": 0.3},
+}
+
+# 用于训练字符n-gram模型的种子样本
+TRAINING_EXAMPLES = {
+    "个人信息": [
+        "查询张三的个人信息", "看一下李四的基本信息", "王五的邮箱是多少", "工号10023是谁",
+        "告诉我赵六的联系方式", "张三在哪个部门什么职位", "查一下员工资料", "我想看看他的个人资料",
+    ],
+    "考勤": [
+        "查一下张三的考勤", "李四上个月的出勤情况", "王五最近有没有迟到", "看看我这周的打卡记录",
+        "赵六昨天签到了吗", "查询张三最近一个月的考勤记录", "看看王五上周的签退时间", "李四今天打卡了吗",
+    ],
+    "考勤统计": [
+        "他本月缺勤几天", "统计一下早退记录", "张三上个月迟到了几次", "技术部本月的考勤汇总",
+        "李四今年请假多少天", "王五上周平均几点签到", "销售部上个月出勤率", "统计赵六本月总工时",
+        "统计一下张三这周的出勤", "全公司本月迟到次数", "汇总产品部上周的考勤", "他这个月迟到几次",
+    ],
+    "履历": [
+        "查看张三的职业发展历程", "李四的工作经历", "王五以前在哪些部门任职", "赵六的履历",
+        "他什么时候晋升的", "张三调岗记录", "看一下他的职业发展", "员工的任职经历",
+    ],
+    "部门": [
+        "查询技术部的信息", "公司有哪些部门", "市场部主管是谁", "部门列表",
+        "看一下组织架构", "销售团队的介绍", "财务部门负责人", "各部门的描述",
+        "技术部一共多少人", "产品部包括下级部门有多少人",
+    ],
+    "下属": [
+        "张三的下属有哪些", "李四手下有多少人", "哪些人汇报给王五", "我的直属下属",
+        "看一下赵六带的人", "张三下面的所有员工", "列出我的下属", "李四团队的下级员工",
+    ],
+    "导出": [
+        "导出技术部上个月的考勤", "把销售部的员工名单导出成excel", "下载产品部本月考勤报表", "导出财务部花名册",
+        "生成市场部上季度考勤报表", "导出技术部员工csv", "把研发中心今年的考勤导出来", "下载人事部员工报表",
+    ],
+    "搜索": [
+        "搜索姓王的员工", "查找邮箱包含sales的人", "找一下叫小明的同事", "技术部有哪些人",
+        "搜索工号1002开头的员工", "帮我查找张姓员工", "找找有没有叫李华的", "搜索员工陈",
+    ],
+    "未知": [
+        "你好", "谢谢", "今天天气怎么样", "讲个笑话", "你是谁", "帮我写一首诗", "明天开会吗", "午饭吃什么",
+    ],
+}
+
+
+class IntentPrediction(NamedTuple):
+    intent: str
+    confidence: float
+    scores: Dict[str, float]
+
+
+def _char_ngrams(text: str, sizes: Tuple[int, ...] = (1, 2, 3)) -> List[str]:
+    """提取字符n-gram特征"""
+    text = text.lower()
+    return [text[i:i + n] for n in sizes for i in range(len(text) - n + 1)]
+
+
+class CharNGramNaiveBayes:
+    """基于字符n-gram的多项式朴素贝叶斯分类器"""
+
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self.class_counts: Counter = Counter()
+        self.feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.feature_totals: Counter = Counter()
+        self.vocabulary = set()
+
+    def fit(self, examples: Dict[str, Iterable[str]]) -> "CharNGramNaiveBayes":
+        """训练模型，examples为 意图 -> 样本列表"""
+        for label, texts in examples.items():
+            for text in texts:
+                features = _char_ngrams(text)
+                self.class_counts[label] += 1
+                self.feature_counts[label].update(features)
+                self.feature_totals[label] += len(features)
+                self.vocabulary.update(features)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """返回各意图的后验概率"""
+        features = [f for f in _char_ngrams(text) if f in self.vocabulary]
+        total_docs = sum(self.class_counts.values())
+        vocab_size = len(self.vocabulary)
+        log_probs = {}
+        for label, count in self.class_counts.items():
+            denominator = self.feature_totals[label] + self.alpha * vocab_size
+            log_prob = math.log(count / total_docs)
+            for feature in features:
+                log_prob += math.log((self.feature_counts[label][feature] + self.alpha) / denominator)
+            log_probs[label] = log_prob
+
+        max_log = max(log_probs.values())
+        exp = {label: math.exp(value - max_log) for label, value in log_probs.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+
+class IntentRouter:
+    """
+    本地意图识别：关键词自动机与字符n-gram模型结合，
+    置信度足够时直接路由到数据库查询，无需调用LLM
+    """
+
+    def __init__(self, keywords: Dict[str, Dict[str, float]] = None, examples: Dict[str, List[str]] = None):
+        self.automaton = AhoCorasick()
+        for intent, weighted in (keywords or INTENT_KEYWORDS).items():
+            for keyword, weight in weighted.items():
+                self.automaton.add(keyword, (intent, weight))
+        self.automaton.build()
+        self.model = CharNGramNaiveBayes().fit(examples or TRAINING_EXAMPLES)
+
+    def keyword_scores(self, query: str) -> Dict[str, float]:
+        """关键词命中得分（同一关键词只计一次）"""
+        scores: Dict[str, float] = defaultdict(float)
+        seen = set()
+        for start, end, (intent, weight) in self.automaton.iter_matches(query):
+            if (start, end) not in seen:
+                seen.add((start, end))
+                scores[intent] += weight
+        return dict(scores)
+
+    def classify(self, query: str) -> IntentPrediction:
+        """返回最可能的意图及其置信度（0-1）"""
+        model_probs = self.model.predict_proba(query)
+        keyword_scores = self.keyword_scores(query)
+
+        if keyword_scores:
+            total = sum(keyword_scores.values())
+            keyword_probs = {intent: score / total for intent, score in keyword_scores.items()}
+            # 关键词命中总分越高，越信任关键词
+            keyword_weight = min(total / 2.0, 1.0) * 0.6
+        else:
+            keyword_probs = {}
+            keyword_weight = 0.0
+
+        combined = {
+            intent: (1 - keyword_weight) * prob + keyword_weight * keyword_probs.get(intent, 0.0)
+            for intent, prob in model_probs.items()
+        }
+        intent = max(combined, key=combined.get)
+        return IntentPrediction(intent, combined[intent], combined)
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Hashable, List, Optional
+
+import tracing
+from tracing import Trace
+
+logger = logging.getLogger(__name__)
+
+
+class FairQueue:
+    """
+    按发送者加权轮询的异步队列
+
+    每个发送者一个FIFO子队列，worker按轮询顺序从各发送者取任务，每轮至多取其权重个，
+    单个用户连续发送大量消息时只会排在自己的子队列里，不会挤占其他用户。
+    """
+
+    def __init__(self, maxsize: int = 1000, max_per_key: int = 0, weights: Dict[Hashable, int] = None):
+        self.maxsize = maxsize
+        self.max_per_key = max_per_key
+        self.weights = weights or {}
+        self._queues: Dict[Hashable, deque] = {}
+        # 有待处理任务的发送者，队首为当前轮到的发送者
+        self._rotation: deque = deque()
+        self._served = 0
+        self._size = 0
+        self._unfinished = 0
+        self._available = asyncio.Semaphore(0)
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def key_count(self) -> int:
+        """有待处理任务的发送者数量"""
+        return len(self._queues)
+
+    def pending(self, key: Hashable) -> int:
+        queue = self._queues.get(key)
+        return len(queue) if queue else 0
+
+    def put_nowait(self, key: Hashable, item: Any):
+        """入队，总容量或该发送者的待处理数已满时抛出asyncio.QueueFull"""
+        if self.maxsize and self._size >= self.maxsize:
+            raise asyncio.QueueFull
+        if self.max_per_key and self.pending(key) >= self.max_per_key:
+            raise asyncio.QueueFull
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._rotation.append(key)
+        queue.append(item)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._available.release()
+
+    async def get(self) -> Any:
+        await self._available.acquire()
+        key = self._rotation[0]
+        queue = self._queues[key]
+        item = queue.popleft()
+        self._size -= 1
+        self._served += 1
+        if not queue:
+            del self._queues[key]
+            self._rotation.popleft()
+            self._served = 0
+        elif self._served >= self.weights.get(key, 1):
+            self._rotation.rotate(-1)
+            self._served = 0
+        return item
+
+    def task_done(self):
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+
+class MessageJobQueue:
+    """
+    钉钉消息的后台处理队列
+
+    回调接口只负责验签和入队，立即返回；固定数量的异步worker从队列取出消息，
+    调用DingTalkHandler.handle_message生成回复，再通过send_message主动推送给用户。
+    worker按发送者轮询取任务，LLM和数据库的处理能力在用户之间公平分配。
+    队列总容量和每个用户的待处理数都有上限，满时由调用方直接回复繁忙提示。
+    """
+
+    def __init__(self, handler, workers: int = 8, maxsize: int = 1000, max_pending_per_user: int = 0,
+                 job_timeout: float = 120, latency_window: int = 1000, slow_threshold: float = None):
+        self.handler = handler
+        self.slow_threshold = slow_threshold
+        self.worker_count = workers
+        self.job_timeout = job_timeout
+        self.maxsize = maxsize
+        self.max_pending_per_user = max_pending_per_user
+        # 队列在start中创建，绑定到服务实际运行的事件循环
+        self._queue: Optional[FairQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self._busy = 0
+        # 最近若干个任务的排队等待和处理耗时（秒）
+        self._wait_times = deque(maxlen=latency_window)
+        self._run_times = deque(maxlen=latency_window)
+        self.stats = {'enqueued': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'timed_out': 0, 'send_failed': 0}
+
+    def start(self):
+        """启动worker，需在事件循环中调用"""
+        if self._workers:
+            return
+        self._stopping = False
+        if self._queue is None:
+            self._queue = FairQueue(self.maxsize, self.max_pending_per_user)
+        for i in range(self.worker_count):
+            self._workers.append(asyncio.create_task(self._worker(), name=f'hr-job-{i}'))
+
+    def submit(self, message: Dict, trace: Trace = None) -> bool:
+        """入队一条消息，trace为回调接口中创建的链路；队列未启动或已满时返回False"""
+        if self._queue is None:
+            self.stats['rejected'] += 1
+            return False
+        try:
+            self._queue.put_nowait(
+                message.get('senderStaffId'),
+                (time.monotonic(), message, trace or Trace(message.get('msgId')))
+            )
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            enqueued_at, message, trace = await self._queue.get()
+            started = time.monotonic()
+            self._wait_times.append(started - enqueued_at)
+            trace.spans.append({
+                'stage': 'queue_wait',
+                'offset_ms': round(max(trace.elapsed() - (started - enqueued_at), 0) * 1000, 2),
+                'duration_ms': round((started - enqueued_at) * 1000, 2)
+            })
+            self._busy += 1
+            token = tracing.activate(trace)
+            try:
+                await asyncio.wait_for(self._process(message), timeout=self.job_timeout)
+                self.stats['completed'] += 1
+            except asyncio.TimeoutError:
+                self.stats['timed_out'] += 1
+                tracing.annotate(outcome='timeout')
+                logger.warning("消息处理超时: %s", trace.request_id)
+            except asyncio.CancelledError:
+                if self._cancel_requested():
+                    raise
+                # 处理中等待的其他任务被取消而抛出的CancelledError，只算本条消息失败，worker继续运行
+                self.stats['failed'] += 1
+                tracing.annotate(outcome='cancelled')
+                logger.warning("消息处理被取消: %s", trace.request_id)
+            except Exception:
+                self.stats['failed'] += 1
+                tracing.annotate(outcome='error')
+                logger.exception("消息处理失败: %s", trace.request_id)
+            finally:
+                tracing.finish(trace, self.slow_threshold)
+                tracing.deactivate(token)
+                self._busy -= 1
+                self._run_times.append(time.monotonic() - started)
+                self._queue.task_done()
+
+    def _cancel_requested(self) -> bool:
+        """worker任务本身是否被取消（停止服务时）"""
+        if self._stopping:
+            return True
+        cancelling = getattr(asyncio.current_task(), 'cancelling', None)
+        return bool(cancelling and cancelling())
+
+    async def _process(self, message: Dict):
+        response = await self.handler.handle_message(message)
+        with tracing.span('send_message'):
+            sent = await self.handler.send_message(message.get('senderStaffId'), response)
+        if not sent:
+            self.stats['send_failed'] += 1
+
+    async def stop(self, timeout: float = 10):
+        """等待队列中的任务处理完（至多timeout秒）后停止worker"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("停止时仍有 %d 条消息未处理", self._queue.qsize())
+        self._stopping = True
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @staticmethod
+    def _percentiles(samples) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {'p50': None, 'p95': None, 'max': None}
+        ordered = sorted(samples)
+        return {
+            'p50': round(ordered[len(ordered) // 2], 3),
+            'p95': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+            'max': round(ordered[-1], 3),
+        }
+
+    def get_stats(self) -> Dict:
+        """队列深度、worker状态、计数及最近任务的耗时分布（秒）"""
+        return {
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'queue_capacity': self.maxsize,
+            'queued_senders': self._queue.key_count() if self._queue else 0,
+            'workers': sum(not task.done() for task in self._workers),
+            'busy_workers': self._busy,
+            **self.stats,
+            'wait_seconds': self._percentiles(self._wait_times),
+            'run_seconds': self._percentiles(self._run_times),
+        }
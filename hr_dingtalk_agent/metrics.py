@@ -0,0 +1,136 @@
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# 默认延迟分桶（秒），覆盖毫秒级本地处理到数十秒的LLM调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: Dict[str, str] = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数..., 总和, 总数]
+        self._values: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, {"le": repr(float(bound))})} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, {"le": "+Inf"})} {state[-1]}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {state[-2]}')
+                lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {state[-1]}')
+        return lines
+
+
+class Registry:
+    """
+    Prometheus文本格式的指标注册表
+
+    指标保存在本进程内。多worker进程部署时每个进程单独计数，
+    /metrics返回的是处理该次抓取的进程的数据。
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, description: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, description, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect: Callable[[], Dict[str, float]]):
+        """注册抓取时才计算的数值（如缓存命中计数），collect返回 指标名 -> 数值"""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for name, value in sorted(values.items()):
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'hr_request_duration_seconds', '从收到回调到回复发出的总耗时', ['intent']
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    'hr_stage_duration_seconds', '各处理阶段耗时', ['stage']
+)
+STAGE_ERRORS = REGISTRY.counter(
+    'hr_stage_errors_total', '各处理阶段的异常次数', ['stage']
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'hr_db_query_duration_seconds', '数据库查询耗时（含线程池排队）', ['query']
+)
+LLM_TOKENS = REGISTRY.counter(
+    'hr_llm_tokens_total', 'OpenAI调用消耗的token数', ['model', 'kind']
+)
+INTENT_SOURCE = REGISTRY.counter(
+    'hr_intent_resolved_total', '意图识别来源（本地或LLM）', ['intent', 'source']
+)
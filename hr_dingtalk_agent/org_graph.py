@@ -0,0 +1,304 @@
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+# 不计入组织架构的员工状态
+INACTIVE_STATUSES = {'离职'}
+
+
+class OrgGraph:
+    """
+    组织架构的内存图
+
+    由department_info、employee_info和position_info构建，预先计算每个部门的祖先链和全部下级部门（闭包），
+    “某部门含下级部门的所有人”“某主管下属的所有人”等查询只访问结果本身，不需要递归SQL。
+
+    员工按updated_at水位增量刷新；表的行数与已知员工数不一致（有员工被删除）或距上次整体加载超过
+    full_reload_interval时整体重新加载，已删除或不再出现的员工随之移除。
+    部门和岗位取自ReferenceCache，部门数据版本变化时重算闭包。
+    """
+
+    def __init__(self, db, reference, refresh_interval: float = 300, full_reload_interval: float = 3600):
+        self.db = db
+        self.reference = reference
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        # 刷新时的数据库查询只持有_refresh_lock，_lock仅在更新内存结构时短暂持有，不阻塞读取
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._watermark: Optional[str] = None
+        # 表中出现过的全部工号（含离职），与表的行数比较以发现删除
+        self._row_ids: Set[str] = set()
+        self._departments_version: Optional[str] = None
+
+        self._departments: Dict[str, Dict] = {}
+        self._positions: Dict[str, Dict] = {}
+        self._children: Dict[str, List[str]] = {}
+        # 部门 -> 祖先部门（由近及远，不含自身）
+        self._ancestors: Dict[str, List[str]] = {}
+        # 部门 -> 自身及全部下级部门
+        self._descendants: Dict[str, Set[str]] = {}
+        # 员工担任主管的部门
+        self._managed: Dict[str, Set[str]] = {}
+
+        self._employees: Dict[str, Dict] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._reports: Dict[str, Set[str]] = {}
+        self._by_email: Dict[str, str] = {}
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        刷新组织架构，未到刷新间隔时直接返回
+
+        Returns:
+            bool: 本次是否有数据变化
+        """
+        with self._refresh_lock:
+            now = time.time()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return False
+            self._last_refresh = now
+            changed = self._refresh_reference()
+            if force or now - self._last_full_reload >= self.full_reload_interval:
+                return self._reload_employees() or changed
+
+            rows = self.db.get_org_employees(self._watermark)
+            if isinstance(rows, dict):
+                return changed
+            with self._lock:
+                for row in rows:
+                    self._update_employee(row)
+                    self._row_ids.add(str(row['employee_id']))
+                self._advance_watermark(rows)
+            count = self.db.count_rows('employees')
+            if count is not None and count != len(self._row_ids):
+                return self._reload_employees() or changed
+            return changed or bool(rows)
+
+    def _advance_watermark(self, rows: List[Dict]):
+        for row in rows:
+            if row.get('updated_at') is not None:
+                updated_at = str(row['updated_at'])
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+
+    def _reload_employees(self) -> bool:
+        """整体重新加载员工，表中已删除的员工随之移除"""
+        rows = self.db.get_org_employees()
+        if isinstance(rows, dict):
+            return False
+        self._last_full_reload = time.time()
+        with self._lock:
+            self._employees, self._members, self._reports, self._by_email = {}, {}, {}, {}
+            for row in rows:
+                self._update_employee(row)
+            self._row_ids = {str(row['employee_id']) for row in rows}
+            self._watermark = None
+            self._advance_watermark(rows)
+        return True
+
+    def _refresh_reference(self) -> bool:
+        """从参考数据缓存取部门和岗位，部门数据有变化时重算闭包"""
+        self.reference.refresh()
+        positions = self.reference.records('positions')
+        if positions is not None:
+            with self._lock:
+                self._positions = positions
+        version = self.reference.version('departments')
+        departments = self.reference.records('departments')
+        if departments is None or version == self._departments_version:
+            return False
+        self._load_departments(departments)
+        self._departments_version = version
+        return True
+
+    def _load_departments(self, departments: Dict[str, Dict]):
+        children: Dict[str, List[str]] = {}
+        managed: Dict[str, Set[str]] = {}
+        for department_id, row in departments.items():
+            parent_id = row.get('parent_id')
+            if parent_id is not None and str(parent_id) in departments:
+                children.setdefault(str(parent_id), []).append(department_id)
+            if row.get('manager_id'):
+                managed.setdefault(str(row['manager_id']), set()).add(department_id)
+
+        ancestors = {}
+        for department_id in departments:
+            chain, seen = [], {department_id}
+            parent_id = departments[department_id].get('parent_id')
+            # 数据中的环在重复出现时截断
+            while parent_id is not None and str(parent_id) in departments and str(parent_id) not in seen:
+                parent_id = str(parent_id)
+                chain.append(parent_id)
+                seen.add(parent_id)
+                parent_id = departments[parent_id].get('parent_id')
+            ancestors[department_id] = chain
+
+        descendants = {department_id: {department_id} for department_id in departments}
+        for department_id, chain in ancestors.items():
+            for ancestor in chain:
+                descendants[ancestor].add(department_id)
+
+        with self._lock:
+            self._departments = departments
+            self._children = children
+            self._ancestors = ancestors
+            self._descendants = descendants
+            self._managed = managed
+
+    def _update_employee(self, row: Dict):
+        employee_id = str(row['employee_id'])
+        previous = self._employees.pop(employee_id, None)
+        if previous is not None:
+            self._members.get(previous.get('department_id'), set()).discard(employee_id)
+            self._reports.get(previous.get('manager_id'), set()).discard(employee_id)
+            if previous.get('email'):
+                self._by_email.pop(str(previous['email']).lower(), None)
+        if row.get('status') in INACTIVE_STATUSES:
+            return
+
+        employee = {
+            'employee_id': employee_id,
+            'name': row.get('name'),
+            'email': row.get('email'),
+            'department_id': str(row['department_id']) if row.get('department_id') is not None else None,
+            'position_id': str(row['position_id']) if row.get('position_id') is not None else None,
+            'manager_id': str(row['manager_id']) if row.get('manager_id') else None,
+        }
+        self._employees[employee_id] = employee
+        self._members.setdefault(employee['department_id'], set()).add(employee_id)
+        if employee['manager_id']:
+            self._reports.setdefault(employee['manager_id'], set()).add(employee_id)
+        if employee['email']:
+            self._by_email[str(employee['email']).lower()] = employee_id
+
+    def sub_departments(self, department_id: str) -> List[str]:
+        """部门及其全部下级部门的ID"""
+        with self._lock:
+            return list(self._descendants.get(str(department_id), {str(department_id)}))
+
+    def ancestors(self, department_id: str) -> List[str]:
+        """上级部门链，由近及远"""
+        with self._lock:
+            return list(self._ancestors.get(str(department_id), []))
+
+    def children(self, department_id: str) -> List[str]:
+        with self._lock:
+            return list(self._children.get(str(department_id), []))
+
+    def headcount(self, department_id: str, recursive: bool = True) -> int:
+        with self._lock:
+            departments = self._descendants.get(str(department_id), ()) if recursive else (str(department_id),)
+            return sum(len(self._members.get(department, ())) for department in departments)
+
+    def subordinates(self, employee_id: str) -> List[str]:
+        """
+        主管下属的所有在职员工（按工号排序，不含本人）
+
+        包括直接和间接汇报的员工，以及其担任主管的部门（含下级部门）的成员。
+        """
+        employee_id = str(employee_id)
+        with self._lock:
+            result: Set[str] = set()
+            pending = [employee_id]
+            for department in self._managed.get(employee_id, ()):
+                for sub_department in self._descendants.get(department, ()):
+                    for member in self._members.get(sub_department, ()):
+                        if member not in result:
+                            result.add(member)
+                            pending.append(member)
+            # 沿汇报关系展开，部门成员中的下级主管也会继续展开
+            while pending:
+                for report in self._reports.get(pending.pop(), ()):
+                    if report not in result:
+                        result.add(report)
+                        pending.append(report)
+            result.discard(employee_id)
+            return sorted(result)
+
+    def page(self, employee_ids: List[str], limit: int, after_id: str = None) -> List[Dict]:
+        """从已排序的工号列表中取after_id之后的limit名员工记录"""
+        start = bisect.bisect_right(employee_ids, after_id) if after_id is not None else 0
+        employees = (self.get_employee(e) for e in employee_ids[start:start + limit])
+        return [employee for employee in employees if employee is not None]
+
+    def get_employee(self, employee_id: str) -> Optional[Dict]:
+        """员工记录，附带部门和职位名称"""
+        with self._lock:
+            employee = self._employees.get(str(employee_id))
+            if employee is None:
+                return None
+            department = self._departments.get(employee['department_id']) or {}
+            position = self._positions.get(employee['position_id']) or {}
+            return {
+                **employee,
+                'department_name': department.get('department_name'),
+                'position_name': position.get('position_name'),
+            }
+
+    def get_department(self, department_id: str) -> Optional[Dict]:
+        with self._lock:
+            department = self._departments.get(str(department_id))
+            return dict(department) if department is not None else None
+
+    def resolve_user(self, user_info: Dict) -> Optional[str]:
+        """将钉钉用户对应到在职员工：userid与工号相同，或邮箱相同"""
+        with self._lock:
+            userid = user_info.get('userid')
+            if userid is not None and str(userid) in self._employees:
+                return str(userid)
+            email = user_info.get('email')
+            if email:
+                return self._by_email.get(str(email).lower())
+            return None
+
+    def _in_any(self, department_id: Optional[str], departments: Iterable[str]) -> bool:
+        """部门自身或其任一上级部门是否在departments中"""
+        if department_id is None:
+            return False
+        departments = set(departments)
+        if not departments:
+            return False
+        return department_id in departments or any(a in departments for a in self._ancestors.get(department_id, ()))
+
+    def is_admin(self, viewer_id: str, admin_departments: Iterable[str]) -> bool:
+        """是否属于有权查看全部数据的部门（含其下级部门）"""
+        with self._lock:
+            employee = self._employees.get(str(viewer_id))
+            return employee is not None and self._in_any(employee['department_id'], admin_departments)
+
+    def can_view_employee(self, viewer_id: str, employee_id: str) -> bool:
+        """本人、汇报链上的上级及所在部门（含上级部门）的主管可以查看"""
+        viewer_id, employee_id = str(viewer_id), str(employee_id)
+        if viewer_id == employee_id:
+            return True
+        with self._lock:
+            employee = self._employees.get(employee_id)
+            if employee is None:
+                return False
+            if self._in_any(employee['department_id'], self._managed.get(viewer_id, ())):
+                return True
+            manager_id, seen = employee['manager_id'], set()
+            while manager_id and manager_id not in seen:
+                if manager_id == viewer_id:
+                    return True
+                seen.add(manager_id)
+                manager = self._employees.get(manager_id)
+                manager_id = manager['manager_id'] if manager else None
+            return False
+
+    def can_view_department(self, viewer_id: str, department_id: str) -> bool:
+        """部门自身或其上级部门的主管可以查看"""
+        with self._lock:
+            return self._in_any(str(department_id), self._managed.get(str(viewer_id), ()))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'departments': len(self._departments),
+                'positions': len(self._positions),
+                'employees': len(self._employees),
+            }
@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """令牌桶：以rate个/秒的速度补充令牌，最多积累capacity个"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def refund(self, tokens: float = 1):
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """距离可获取tokens个令牌还需等待的秒数"""
+        return max(0.0, (tokens - self.tokens) / self.rate) if self.rate > 0 else float('inf')
+
+
+class RateLimiter:
+    """
+    按用户和全局两级令牌桶限流
+
+    每个用户一个令牌桶，限制单个用户的请求速率；全局令牌桶限制整体进入LLM和数据库的请求速率。
+    用户桶按LRU保留至多max_users个，被淘汰的用户下次请求时以满桶重新开始，
+    与长时间空闲后桶自然补满的效果相同。
+    """
+
+    USER_LIMITED = 'user'
+    GLOBAL_LIMITED = 'global'
+
+    def __init__(self, user_rate: float, user_burst: float, global_rate: float, global_burst: float,
+                 max_users: int = 10000):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._user_buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self.stats = {'allowed': 0, 'user_limited': 0, 'global_limited': 0}
+
+    def _user_bucket(self, user_id: Hashable) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self._user_buckets[user_id] = bucket
+            while len(self._user_buckets) > self.max_users:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_id)
+        return bucket
+
+    def check(self, user_id: Hashable) -> Optional[str]:
+        """
+        尝试为一次请求获取令牌
+
+        Returns:
+            None表示放行；被限流时返回USER_LIMITED或GLOBAL_LIMITED
+        """
+        user_bucket = self._user_bucket(user_id)
+        if not user_bucket.try_acquire():
+            self.stats['user_limited'] += 1
+            return self.USER_LIMITED
+        if not self.global_bucket.try_acquire():
+            # 被全局限流的请求不占用该用户的额度
+            user_bucket.refund()
+            self.stats['global_limited'] += 1
+            return self.GLOBAL_LIMITED
+        self.stats['allowed'] += 1
+        return None
+
+    def get_stats(self) -> Dict:
+        return {
+            'tracked_users': len(self._user_buckets),
+            'global_tokens': round(self.global_bucket.tokens, 2),
+            **self.stats,
+        }
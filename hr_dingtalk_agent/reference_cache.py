@@ -0,0 +1,121 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional
+
+# 缓存的参考数据表及其主键
+REFERENCE_TABLES = {'departments': 'department_id', 'positions': 'position_id'}
+# 变更探测计算校验和的关键列（表中不存在的列会跳过）
+CHECKSUM_COLUMNS = {
+    'departments': ['department_id', 'department_name', 'parent_id', 'manager_id', 'manager_name'],
+    'positions': ['position_id', 'position_name', 'level'],
+}
+
+
+class ReferenceCache:
+    """
+    部门和岗位表的进程内缓存
+
+    这两张表很少变化，每隔check_interval秒用一次行数和关键列校验和的探测查询检查是否变化，
+    变化时整表重新加载；另外每隔full_reload_interval秒无条件重新加载一次，兜底探测遗漏的变化。
+    员工、履历等查询只读本表数据，部门和职位名称在内存中补全，不再JOIN。
+    缓存尚未加载成功时访问方法返回None，调用方应退回SQL查询。
+    """
+
+    def __init__(self, db, check_interval: float = 30, full_reload_interval: float = 3600):
+        self.db = db
+        self.check_interval = check_interval
+        self.full_reload_interval = full_reload_interval
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._last_full_reload = time.time()
+        # 表 -> (版本, 主键 -> 记录, 按主键排序的键列表)
+        self._tables: Dict[str, tuple] = {}
+        self.stats = {'probes': 0, 'reloads': 0, 'full_reloads': 0}
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        到检查间隔时探测各表是否变化，变化的表重新加载
+
+        Returns:
+            bool: 是否有表重新加载
+        """
+        if not force and time.time() - self._last_check < self.check_interval:
+            return False
+        with self._lock:
+            if not force and time.time() - self._last_check < self.check_interval:
+                return False
+            self._last_check = time.time()
+            full_reload = self._last_check - self._last_full_reload >= self.full_reload_interval
+            if full_reload:
+                self._last_full_reload = self._last_check
+                self.stats['full_reloads'] += 1
+            reloaded = False
+            for table_key, key in REFERENCE_TABLES.items():
+                version = self.db.get_table_version(table_key, CHECKSUM_COLUMNS[table_key])
+                self.stats['probes'] += 1
+                previous = self._tables.get(table_key)
+                unchanged = previous is not None and previous[0].split('#')[0] == version
+                if version is None or (unchanged and not full_reload):
+                    continue
+                rows = self.db.get_reference_rows(table_key)
+                if isinstance(rows, dict):
+                    continue
+                records = {str(row[key]): row for row in rows}
+                if unchanged:
+                    if previous[1] == records:
+                        continue
+                    # 探测值未变但数据已变（兜底重新加载发现），换一个版本号使依赖方（如组织架构）重建
+                    version = f"{version}#{self.stats['reloads']}"
+                # 整体替换，读取方不需要加锁
+                self._tables[table_key] = (version, records, sorted(records))
+                self.stats['reloads'] += 1
+                reloaded = True
+            return reloaded
+
+    def version(self, table_key: str) -> Optional[str]:
+        """已加载数据的版本，表变化后重新加载时随之变化"""
+        self.refresh()
+        table = self._tables.get(table_key)
+        return table[0] if table else None
+
+    def records(self, table_key: str) -> Optional[Dict[str, Dict]]:
+        """主键 -> 记录"""
+        self.refresh()
+        table = self._tables.get(table_key)
+        return table[1] if table else None
+
+    def page(self, table_key: str, limit: int = None, after: str = None) -> Optional[List[Dict]]:
+        """按主键排序，取after之后的至多limit条记录"""
+        self.refresh()
+        table = self._tables.get(table_key)
+        if table is None:
+            return None
+        _, records, keys = table
+        start = bisect.bisect_right(keys, str(after)) if after is not None else 0
+        end = start + limit if limit else len(keys)
+        return [dict(records[k]) for k in keys[start:end]]
+
+    def join(self, rows: List[Dict]) -> Optional[List[Dict]]:
+        """
+        为记录补全department_name和position_name
+
+        缓存未加载时返回None，调用方应改用JOIN查询。
+        """
+        departments = self.records('departments')
+        positions = self.records('positions')
+        if departments is None or positions is None:
+            return None
+        for row in rows:
+            department = departments.get(str(row.get('department_id')))
+            position = positions.get(str(row.get('position_id')))
+            row['department_name'] = department.get('department_name') if department else None
+            row['position_name'] = position.get('position_name') if position else None
+        return rows
+
+    def get_stats(self) -> Dict:
+        return {
+            'departments': len(self._tables.get('departments', (None, {}))[1]),
+            'positions': len(self._tables.get('positions', (None, {}))[1]),
+            **self.stats,
+        }
@@ -0,0 +1,55 @@
+from typing import Dict, List, Sequence, Tuple
+
+# 用户回复这些内容时继续显示上一次查询的下一页（与normalize_query归一化后的文本比较）
+NEXT_PAGE_COMMANDS = {'下一页', '下页', '继续', '更多', 'next'}
+
+NEXT_PAGE_HINT = '> 回复“下一页”查看更多'
+
+# 单元格内容过长时截断，避免一条记录占满整页
+MAX_CELL_CHARS = 100
+
+
+def is_next_page(normalized_query: str) -> bool:
+    return normalized_query in NEXT_PAGE_COMMANDS
+
+
+def format_cell(value) -> str:
+    """转换为markdown表格单元格：空值显示N/A，转义竖线并去掉换行"""
+    if value is None or value == '':
+        return 'N/A'
+    text = str(value).replace('|', '\\|').replace('\r', ' ').replace('\n', ' ')
+    if len(text) > MAX_CELL_CHARS:
+        text = text[:MAX_CELL_CHARS - 1] + '…'
+    return text
+
+
+def render_table(title: str, columns: Sequence[Tuple[str, str]], rows: List[Dict],
+                 max_chars: int) -> Tuple[str, int]:
+    """
+    将记录渲染为markdown表格
+
+    各行先收集到列表再一次拼接；累计长度超过max_chars时停止（至少保留一行），
+    返回渲染结果和实际渲染的行数，剩余的行由下一页继续显示。
+
+    Args:
+        title: 表格上方的标题
+        columns: (表头, 字段名) 列表
+        rows: 查询结果
+        max_chars: 回复的最大字符数
+    """
+    lines = [
+        f'#### {title}',
+        '',
+        '| ' + ' | '.join(header for header, _ in columns) + ' |',
+        '|' + ' --- |' * len(columns),
+    ]
+    length = sum(len(line) + 1 for line in lines)
+    shown = 0
+    for row in rows:
+        line = '| ' + ' | '.join(format_cell(row.get(field)) for _, field in columns) + ' |'
+        if shown and length + len(line) + 1 > max_chars:
+            break
+        lines.append(line)
+        length += len(line) + 1
+        shown += 1
+    return '\n'.join(lines), shown
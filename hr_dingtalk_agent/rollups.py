@@ -0,0 +1,340 @@
+import calendar
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 考勤状态与汇总列的对应关系，未列出的状态计入other_days
+STATUS_COLUMNS = {
+    '正常': 'normal_days',
+    '迟到': 'late_days',
+    '早退': 'early_leave_days',
+    '缺勤': 'absent_days',
+    '请假': 'leave_days',
+}
+COUNTER_COLUMNS = [
+    'total_days', 'normal_days', 'late_days', 'early_leave_days', 'absent_days',
+    'leave_days', 'other_days', 'check_in_minutes', 'check_in_count', 'total_hours',
+]
+STATE_NAME = 'attendance_summary'
+# 没有部门（或员工记录已不存在）的考勤计入的部门键，使全公司统计包含这些记录
+NO_DEPARTMENT = ''
+# 单个id空洞超过该长度时不再逐条记录（如自增id跳号），只记日志
+MAX_GAP_SIZE = 10000
+
+
+def _to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def check_in_minutes(value) -> Optional[int]:
+    """将签到时间转为当天的分钟数"""
+    if value is None or value == '':
+        return None
+    if hasattr(value, 'hour'):
+        return value.hour * 60 + value.minute
+    try:
+        hours, minutes = str(value).split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+
+def period_keys(day: date) -> List[Tuple[str, date]]:
+    """一条考勤记录所属的周和月"""
+    return [('week', day - timedelta(days=day.weekday())), ('month', day.replace(day=1))]
+
+
+def _record_delta(record: Dict) -> Counter:
+    delta = Counter(total_days=1)
+    delta[STATUS_COLUMNS.get(record.get('status'), 'other_days')] += 1
+    minutes = check_in_minutes(record.get('check_in'))
+    if minutes is not None:
+        delta['check_in_minutes'] += minutes
+        delta['check_in_count'] += 1
+    delta['total_hours'] += float(record.get('work_hours') or 0)
+    return delta
+
+
+class AttendanceRollups:
+    """
+    按周、按月的员工及部门考勤汇总
+
+    新考勤记录按自增id水位增量累加到汇总表，水位与汇总在同一事务中更新，
+    因此每条记录只会计入一次。并发写入时较小的id可能晚于较大的id提交，
+    水位越过的未见id记入rollup_gaps，之后每次同步重试，超过gap_timeout仍不存在的视为回滚丢弃。
+    同步由后台线程（start）或启动前的准备步骤执行，查询汇总时不做同步。
+    修改历史考勤后需调用rebuild重新计算。
+    engine用于同步写入（不应限制语句时长），read_engine用于读取汇总，默认与engine相同。
+    """
+
+    def __init__(self, engine, sync_interval: float = 60, batch_size: int = 10000, read_engine=None,
+                 gap_timeout: float = 600):
+        self.engine = engine
+        self.read_engine = read_engine or engine
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, ready: Callable[[], bool] = None):
+        """启动后台同步线程，每sync_interval秒同步一次；ready返回False时跳过本次同步"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(ready,), name='hr-rollup-sync', daemon=True)
+        self._thread.start()
+
+    def _run(self, ready):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                if ready is None or ready():
+                    self.sync(force=True)
+            except Exception:
+                logger.exception("考勤汇总同步失败")
+
+    def close(self):
+        self._stop.set()
+
+    def _apply_deltas(self, conn, table: str, key_column: str, deltas: Dict[tuple, Counter]):
+        """累加到汇总表：先UPDATE，行不存在时INSERT"""
+        assignments = ', '.join(f"{c} = {c} + :{c}" for c in COUNTER_COLUMNS)
+        update = text(
+            f"UPDATE {table} SET {assignments} "
+            f"WHERE {key_column} = :key AND period_type = :period_type AND period_start = :period_start"
+        )
+        insert = text(
+            f"INSERT INTO {table} ({key_column}, period_type, period_start, {', '.join(COUNTER_COLUMNS)}) "
+            f"VALUES (:key, :period_type, :period_start, {', '.join(':' + c for c in COUNTER_COLUMNS)})"
+        )
+        for (key, period_type, period_start), delta in deltas.items():
+            params = {c: delta.get(c, 0) for c in COUNTER_COLUMNS}
+            params.update({'key': key, 'period_type': period_type, 'period_start': period_start})
+            if conn.execute(update, params).rowcount == 0:
+                conn.execute(insert, params)
+
+    def _departments_of(self, conn, employee_ids: Iterable[str]) -> Dict[str, str]:
+        employee_ids = list(employee_ids)
+        departments = {}
+        for i in range(0, len(employee_ids), 500):
+            chunk = employee_ids[i:i + 500]
+            placeholders = ', '.join(f':e{j}' for j in range(len(chunk)))
+            rows = conn.execute(text(
+                f"SELECT employee_id, department_id FROM {Config.HR_TABLES['employees']} "
+                f"WHERE employee_id IN ({placeholders})"
+            ), {f'e{j}': v for j, v in enumerate(chunk)})
+            departments.update({str(r[0]): r[1] for r in rows})
+        return departments
+
+    def apply(self, conn, records: List[Dict]):
+        """将一批新考勤记录累加到员工和部门汇总"""
+        departments = self._departments_of(conn, {str(r['employee_id']) for r in records})
+        employee_deltas: Dict[tuple, Counter] = defaultdict(Counter)
+        department_deltas: Dict[tuple, Counter] = defaultdict(Counter)
+        for record in records:
+            delta = _record_delta(record)
+            employee_id = str(record['employee_id'])
+            department_id = departments.get(employee_id)
+            if department_id is None:
+                department_id = NO_DEPARTMENT
+            for period_type, period_start in period_keys(_to_date(record['date'])):
+                employee_deltas[(employee_id, period_type, period_start)].update(delta)
+                department_deltas[(department_id, period_type, period_start)].update(delta)
+
+        self._apply_deltas(conn, Config.HR_TABLES['attendance_summary_employee'], 'employee_id', employee_deltas)
+        self._apply_deltas(conn, Config.HR_TABLES['attendance_summary_department'], 'department_id', department_deltas)
+
+    def _ensure_state(self):
+        """插入水位行；多个进程同时插入时，主键冲突的一方直接使用已插入的行"""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    f"INSERT INTO {Config.HR_TABLES['rollup_state']} (name, last_id) VALUES (:name, 0)"
+                ), {'name': STATE_NAME})
+        except IntegrityError:
+            pass
+
+    def _fetch_records(self, conn, condition: str, params: Dict, limit: int = None) -> List[Dict]:
+        query = (
+            f"SELECT id, employee_id, date, check_in, work_hours, status "
+            f"FROM {Config.HR_TABLES['attendance']} WHERE {condition} ORDER BY id"
+        )
+        if limit is not None:
+            query += " LIMIT :limit"
+            params = {**params, 'limit': limit}
+        return [dict(r) for r in conn.execute(text(query), params).mappings()]
+
+    def _retry_gaps(self, conn) -> int:
+        """累加此前被水位越过、现已提交的记录，并清理过期的空洞"""
+        gaps_table = Config.HR_TABLES['rollup_gaps']
+        gap_ids = [r[0] for r in conn.execute(text(
+            f"SELECT record_id FROM {gaps_table} WHERE name = :name"
+        ), {'name': STATE_NAME})]
+        found = []
+        for i in range(0, len(gap_ids), 500):
+            chunk = gap_ids[i:i + 500]
+            placeholders = ', '.join(f':g{j}' for j in range(len(chunk)))
+            found.extend(self._fetch_records(
+                conn, f"id IN ({placeholders})", {f'g{j}': v for j, v in enumerate(chunk)}
+            ))
+        if found:
+            self.apply(conn, found)
+            conn.execute(text(
+                f"DELETE FROM {gaps_table} WHERE name = :name AND record_id = :record_id"
+            ), [{'name': STATE_NAME, 'record_id': r['id']} for r in found])
+        conn.execute(text(
+            f"DELETE FROM {gaps_table} WHERE name = :name AND first_seen < :cutoff"
+        ), {'name': STATE_NAME, 'cutoff': time.time() - self.gap_timeout})
+        return len(found)
+
+    def _record_gaps(self, conn, last_id: int, records: List[Dict]):
+        """记录本批记录之间及水位之后未出现的id"""
+        gaps, expected = [], last_id + 1
+        for record in records:
+            if record['id'] - expected > MAX_GAP_SIZE:
+                logger.warning("考勤记录id从%s跳到%s，不记录该空洞", expected, record['id'])
+            else:
+                gaps.extend(range(expected, record['id']))
+            expected = record['id'] + 1
+        if gaps:
+            now = time.time()
+            conn.execute(text(
+                f"INSERT INTO {Config.HR_TABLES['rollup_gaps']} (name, record_id, first_seen) "
+                f"VALUES (:name, :record_id, :first_seen)"
+            ), [{'name': STATE_NAME, 'record_id': g, 'first_seen': now} for g in gaps])
+
+    def _sync_batch(self, conn, retry_gaps: bool) -> Optional[Tuple[int, bool]]:
+        """
+        在一个事务中同步一批记录
+
+        Returns:
+            水位行不存在时返回None，否则返回(累加的记录数, 是否还有新记录)
+        """
+        state = Config.HR_TABLES['rollup_state']
+        # 先写状态行以取得写锁，避免多个进程重复累加同一批记录
+        touched = conn.execute(text(
+            f"UPDATE {state} SET updated_at = CURRENT_TIMESTAMP WHERE name = :name"
+        ), {'name': STATE_NAME}).rowcount
+        if not touched:
+            return None
+        last_id = conn.execute(text(
+            f"SELECT last_id FROM {state} WHERE name = :name"
+        ), {'name': STATE_NAME}).scalar()
+
+        applied = self._retry_gaps(conn) if retry_gaps else 0
+        records = self._fetch_records(conn, "id > :last_id", {'last_id': last_id}, self.batch_size)
+        if records:
+            self.apply(conn, records)
+            self._record_gaps(conn, last_id, records)
+            conn.execute(text(
+                f"UPDATE {state} SET last_id = :last_id WHERE name = :name"
+            ), {'last_id': records[-1]['id'], 'name': STATE_NAME})
+        return applied + len(records), bool(records)
+
+    def sync(self, force: bool = False) -> int:
+        """
+        将水位之后新增的考勤记录及此前晚提交的记录累加到汇总表
+
+        Returns:
+            int: 本次处理的记录数
+        """
+        with self._lock:
+            if not force and time.time() - self._last_sync < self.sync_interval:
+                return 0
+            self._last_sync = time.time()
+            processed, retry_gaps = 0, True
+            while True:
+                with self.engine.begin() as conn:
+                    batch = self._sync_batch(conn, retry_gaps)
+                if batch is None:
+                    self._ensure_state()
+                    continue
+                count, more = batch
+                processed += count
+                retry_gaps = False
+                if not more:
+                    return processed
+
+    def rebuild(self) -> int:
+        """清空汇总并从全部考勤记录重新计算"""
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {Config.HR_TABLES['attendance_summary_employee']}"))
+            conn.execute(text(f"DELETE FROM {Config.HR_TABLES['attendance_summary_department']}"))
+            conn.execute(text(
+                f"DELETE FROM {Config.HR_TABLES['rollup_gaps']} WHERE name = :name"
+            ), {'name': STATE_NAME})
+            conn.execute(text(
+                f"UPDATE {Config.HR_TABLES['rollup_state']} SET last_id = 0 WHERE name = :name"
+            ), {'name': STATE_NAME})
+        return self.sync(force=True)
+
+    @staticmethod
+    def aligned_period(start: date, end: date) -> Optional[str]:
+        """区间恰好由整月或整周组成时返回对应粒度"""
+        if start.day == 1 and end.day == calendar.monthrange(end.year, end.month)[1]:
+            return 'month'
+        if start.weekday() == 0 and end.weekday() == 6:
+            return 'week'
+        return None
+
+    def get_summary(self, start_date: str, end_date: str, employee_id: str = None,
+                    department_ids: List[str] = None) -> Optional[Dict]:
+        """
+        从汇总表读取区间统计
+
+        区间不是整月或整周时返回None，调用方应改为直接聚合考勤记录
+        """
+        start, end = _to_date(start_date), _to_date(end_date)
+        period_type = self.aligned_period(start, end)
+        if period_type is None:
+            return None
+
+        last_period_start = end.replace(day=1) if period_type == 'month' else end - timedelta(days=6)
+        params = {'period_type': period_type, 'start': start, 'last': last_period_start}
+        if employee_id:
+            table, condition = Config.HR_TABLES['attendance_summary_employee'], "employee_id = :employee_id"
+            params['employee_id'] = employee_id
+        else:
+            table = Config.HR_TABLES['attendance_summary_department']
+            condition = "1=1"
+            if department_ids:
+                placeholders = ', '.join(f':d{i}' for i in range(len(department_ids)))
+                condition = f"department_id IN ({placeholders})"
+                params.update({f'd{i}': v for i, v in enumerate(department_ids)})
+
+        sums = ', '.join(f"COALESCE(SUM({c}), 0) AS {c}" for c in COUNTER_COLUMNS)
+        with self.read_engine.connect() as conn:
+            row = conn.execute(text(
+                f"SELECT {sums} FROM {table} WHERE period_type = :period_type "
+                f"AND period_start BETWEEN :start AND :last AND {condition}"
+            ), params).mappings().first()
+        return summarize(dict(row))
+
+
+def summarize(totals: Dict) -> Dict:
+    """由累加值计算平均签到时间等派生指标"""
+    summary = {c: totals.get(c) or 0 for c in COUNTER_COLUMNS}
+    count = summary.pop('check_in_count')
+    minutes = summary.pop('check_in_minutes')
+    if count:
+        average = round(minutes / count)
+        summary['average_check_in'] = f'{average // 60:02d}:{average % 60:02d}'
+    else:
+        summary['average_check_in'] = None
+    summary['total_hours'] = round(float(summary['total_hours']), 1)
+    return summary
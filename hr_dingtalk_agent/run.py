@@ -1,12 +1,43 @@
+import argparse
 import uvicorn
 import os
 from dotenv import load_dotenv
 
+def prepare_server():
+    """
+    启动worker进程前执行一次的准备工作
+
+    建立员工搜索索引、同步考勤汇总并清理共享缓存中的过期数据，
+    避免多个worker进程启动时同时执行这些耗时操作
+    """
+    from db_handler import HRDatabaseHandler
+    from shared_store import SharedStore
+    from config import Config
+
+    db = HRDatabaseHandler()
+    try:
+        db.ping()
+        db.ensure_search_index()
+        db.sync_attendance_rollups()
+    finally:
+        db.close()
+    store = SharedStore(Config.SHARED_CACHE_PATH)
+    store.purge_expired()
+    store.close()
+
 def main():
     """
     应用程序入口点
     加载环境变量并启动FastAPI服务器
+
+    默认以开发模式启动（单进程、代码修改自动重载）；
+    --prod以生产模式启动：启动前完成预热，按CPU核数启动多个worker进程
     """
+    parser = argparse.ArgumentParser(description='启动HR DingTalk AI Agent')
+    parser.add_argument('--prod', action='store_true', help='生产模式：多worker进程，不自动重载')
+    parser.add_argument('--workers', type=int, help='worker进程数，默认为SERVER_WORKERS或CPU核数')
+    args = parser.parse_args()
+
     # 加载环境变量
     load_dotenv()
     
@@ -24,15 +55,36 @@ def main():
         for var in missing_vars:
             print(f"- {var}")
         return
-    
-    # 启动FastAPI应用
-    print("正在启动HR DingTalk AI Agent...")
+
+    host = os.getenv('SERVER_HOST', '0.0.0.0')
+    port = int(os.getenv('SERVER_PORT', '8000'))
+
+    if not args.prod:
+        # 启动FastAPI应用
+        print("正在启动HR DingTalk AI Agent（开发模式）...")
+        uvicorn.run(
+            "app:app",
+            host=host,
+            port=port,
+            reload=True,
+            log_level="info"
+        )
+        return
+
+    workers = args.workers or int(os.getenv('SERVER_WORKERS', '0')) or os.cpu_count() or 1
+    # worker进程从环境变量读取进程数，用于均分限流配额
+    os.environ['SERVER_WORKERS'] = str(workers)
+
+    print("正在预热...")
+    prepare_server()
+    print(f"正在启动HR DingTalk AI Agent（生产模式，{workers}个worker进程）...")
     uvicorn.run(
         "app:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+        host=host,
+        port=port,
+        workers=workers,
+        log_level="info",
+        access_log=False
     )
 
 if __name__ == "__main__":
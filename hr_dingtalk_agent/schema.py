@@ -0,0 +1,187 @@
+from sqlalchemy import (
+    Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table, Text, func
+)
+
+from config import Config
+
+metadata = MetaData()
+
+employees = Table(
+    Config.HR_TABLES['employees'], metadata,
+    Column('employee_id', String(32), primary_key=True),
+    Column('name', String(64), nullable=False),
+    Column('email', String(128)),
+    Column('phone', String(32)),
+    Column('department_id', String(32)),
+    Column('position_id', String(32)),
+    Column('manager_id', String(32)),
+    Column('hire_date', Date),
+    Column('status', String(16), default='在职'),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp()),
+    Index('idx_employee_name', 'name'),
+    Index('idx_employee_email', 'email'),
+    Index('idx_employee_department', 'department_id'),
+    Index('idx_employee_manager', 'manager_id'),
+    Index('idx_employee_updated_at', 'updated_at'),
+)
+
+attendance = Table(
+    Config.HR_TABLES['attendance'], metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('employee_id', String(32), nullable=False),
+    Column('date', Date, nullable=False),
+    Column('check_in', String(8)),
+    Column('check_out', String(8)),
+    Column('work_hours', Float),
+    Column('status', String(16)),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp()),
+    # 按员工和日期范围查询考勤
+    Index('idx_attendance_employee_date', 'employee_id', 'date', unique=True),
+    Index('idx_attendance_date', 'date'),
+)
+
+career = Table(
+    Config.HR_TABLES['career'], metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('employee_id', String(32), nullable=False),
+    Column('department_id', String(32)),
+    Column('position_id', String(32)),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date),
+    Column('responsibilities', Text),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp()),
+    # 按员工查询履历并按开始日期排序
+    Index('idx_career_employee_start', 'employee_id', 'start_date'),
+    Index('idx_career_department', 'department_id'),
+)
+
+departments = Table(
+    Config.HR_TABLES['departments'], metadata,
+    Column('department_id', String(32), primary_key=True),
+    Column('department_name', String(64), nullable=False),
+    Column('parent_id', String(32)),
+    Column('manager_id', String(32)),
+    Column('manager_name', String(64)),
+    Column('description', Text),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp()),
+    Index('idx_department_name', 'department_name'),
+    Index('idx_department_parent', 'parent_id'),
+)
+
+positions = Table(
+    Config.HR_TABLES['positions'], metadata,
+    Column('position_id', String(32), primary_key=True),
+    Column('position_name', String(64), nullable=False),
+    Column('level', Integer),
+    Column('description', Text),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp()),
+)
+
+
+def _summary_columns():
+    """考勤汇总表的公共统计列"""
+    return [
+        Column('period_type', String(8), primary_key=True),  # week / month
+        Column('period_start', Date, primary_key=True),
+        Column('total_days', Integer, nullable=False, default=0),
+        Column('normal_days', Integer, nullable=False, default=0),
+        Column('late_days', Integer, nullable=False, default=0),
+        Column('early_leave_days', Integer, nullable=False, default=0),
+        Column('absent_days', Integer, nullable=False, default=0),
+        Column('leave_days', Integer, nullable=False, default=0),
+        Column('other_days', Integer, nullable=False, default=0),
+        Column('check_in_minutes', Integer, nullable=False, default=0),
+        Column('check_in_count', Integer, nullable=False, default=0),
+        Column('total_hours', Float, nullable=False, default=0),
+    ]
+
+
+attendance_summary_employee = Table(
+    Config.HR_TABLES['attendance_summary_employee'], metadata,
+    Column('employee_id', String(32), primary_key=True),
+    *_summary_columns(),
+    Index('idx_summary_employee_period', 'period_type', 'period_start'),
+)
+
+attendance_summary_department = Table(
+    Config.HR_TABLES['attendance_summary_department'], metadata,
+    Column('department_id', String(32), primary_key=True),
+    *_summary_columns(),
+)
+
+rollup_state = Table(
+    Config.HR_TABLES['rollup_state'], metadata,
+    Column('name', String(64), primary_key=True),
+    Column('last_id', Integer, nullable=False, default=0),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp()),
+)
+
+# 考勤汇总水位越过但尚未提交的考勤记录id，之后的同步会重试
+rollup_gaps = Table(
+    Config.HR_TABLES['rollup_gaps'], metadata,
+    Column('name', String(64), primary_key=True),
+    Column('record_id', Integer, primary_key=True, autoincrement=False),
+    Column('first_seen', Float, nullable=False),
+)
+
+
+def _updated_at_statements(dialect: str, table: str) -> list:
+    """
+    使任意UPDATE语句都刷新updated_at的DDL（可重复执行）
+
+    onupdate只对经SQLAlchemy执行的UPDATE生效，HR系统直接改表时也需要刷新，
+    变更探测和增量刷新都依赖这一列。UPDATE语句自己设置了updated_at时保留其值。
+    """
+    if dialect == 'mysql':
+        return [
+            f"ALTER TABLE {table} MODIFY updated_at DATETIME "
+            f"DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+        ]
+    if dialect == 'postgresql':
+        return [
+            f"DROP TRIGGER IF EXISTS trg_{table}_updated_at ON {table}",
+            f"CREATE TRIGGER trg_{table}_updated_at BEFORE UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION hr_touch_updated_at()",
+        ]
+    if dialect == 'sqlite':
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_updated_at AFTER UPDATE ON {table} "
+            f"FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at BEGIN "
+            f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE rowid = NEW.rowid; END"
+        ]
+    return []
+
+
+_PG_TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION hr_touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+        NEW.updated_at := CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def create_updated_at_triggers(engine):
+    """为所有含updated_at的表安装更新时间的自动刷新"""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == 'postgresql':
+            conn.exec_driver_sql(_PG_TOUCH_FUNCTION)
+        for table in metadata.sorted_tables:
+            if 'updated_at' not in table.c:
+                continue
+            for statement in _updated_at_statements(dialect, table.name):
+                conn.exec_driver_sql(statement)
+
+
+def create_schema(engine):
+    """创建所有HR表及索引（已存在的表和索引会跳过）"""
+    metadata.create_all(engine, checkfirst=True)
+    # 已存在的表不会由create_all补建索引，逐个检查
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    create_updated_at_triggers(engine)
@@ -0,0 +1,299 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from config import Config
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # pypinyin为可选依赖，缺失时不索引拼音
+    lazy_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'employee_search'
+
+# pg_trgm的GIN索引只能用于至少三个字的搜索词
+PG_TRIGRAM_MIN_LENGTH = 3
+
+# 搜索查询中需要去掉的指令词和虚词，长词在前
+SEARCH_STOP_WORDS = sorted([
+    '帮我', '请', '搜索', '搜一下', '查找', '查一下', '查询', '找一下', '找找', '找', '一下',
+    '有没有', '有哪些', '哪些', '员工', '同事', '的人', '人员', '姓名', '名字', '叫做', '叫',
+    '姓', '包含', '邮箱', '工号', '信息', '的', '是谁', '谁', '吗', '呢', '和', '或者', '所有',
+], key=len, reverse=True)
+
+_TOKEN_CHARS = re.compile(r'[^0-9a-z一-鿿]+')
+
+
+def _normalize(value: str) -> str:
+    """小写并只保留字母、数字和汉字"""
+    return _TOKEN_CHARS.sub('', str(value or '').lower())
+
+
+def ngram_tokens(value: str, max_n: int = 3) -> List[str]:
+    """生成1~max_n长度的所有子串，作为全文索引的词元"""
+    value = _normalize(value)
+    grams = {value[i:i + n] for n in range(1, max_n + 1) for i in range(len(value) - n + 1)}
+    return sorted(grams)
+
+
+def _pinyin_values(name: str) -> str:
+    if lazy_pinyin is None or not name:
+        return ''
+    full = ''.join(lazy_pinyin(name))
+    initials = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER))
+    return f"{full} {initials}"
+
+
+def extract_search_terms(query: str) -> List[str]:
+    """
+    从自然语言查询中提取搜索词
+
+    例如 "帮我搜索一下姓王的员工" -> ["王"]，"查找邮箱包含sales的人" -> ["sales"]
+    """
+    text_value = query.lower()
+    for word in SEARCH_STOP_WORDS:
+        text_value = text_value.replace(word, ' ')
+    terms = [t for t in re.split(r'[\s,，。、；;:：？?！!"“”\'（）()]+', text_value) if t]
+    return list(dict.fromkeys(terms))
+
+
+def _match_expression(terms: List[str]) -> Optional[str]:
+    """将搜索词转为FTS5查询：短词直接匹配词元，长词要求包含其全部三元组"""
+    groups = []
+    for term in terms:
+        term = _normalize(term)
+        if not term:
+            continue
+        if len(term) <= 3:
+            grams = [term]
+        else:
+            grams = sorted({term[i:i + 3] for i in range(len(term) - 2)})
+        groups.append('(' + ' AND '.join(f'"{g}"' for g in grams) + ')')
+    return ' OR '.join(groups) if groups else None
+
+
+class EmployeeSearchIndex:
+    """
+    员工全文检索索引
+
+    SQLite使用FTS5虚拟表，索引工号、姓名、邮箱和拼音的1~3元子串。
+    FTS5自带的trigram分词器无法匹配少于三个字的词，而中文姓名多为两个字，
+    因此在Python中预先切分n-gram词元。结果按bm25排序。
+    MySQL使用ngram全文索引，PostgreSQL使用pg_trgm的GIN索引，按相关度排序，
+    查询通过read_engine发往只读副本。短于min_term_length的搜索词无法使用这两种索引，
+    search返回None，由调用方按前缀LIKE查询。
+
+    索引在启动前的准备步骤中由ensure创建，不在请求中执行DDL或全量构建；
+    后台线程（start）重试失败的创建并同步SQLite索引。
+    """
+
+    def __init__(self, engine, refresh_interval: float = 300, read_engine=None,
+                 full_reload_interval: float = 3600):
+        self.engine = engine
+        self.read_engine = read_engine or (lambda: engine)
+        self.dialect = engine.dialect.name
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self._lock = threading.Lock()
+        self._watermark: Optional[str] = None
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.available = False
+
+    @property
+    def min_term_length(self) -> int:
+        """索引可以匹配的最短搜索词"""
+        if self.dialect == 'mysql':
+            return Config.SEARCH_NGRAM_TOKEN_SIZE
+        if self.dialect == 'postgresql':
+            return PG_TRIGRAM_MIN_LENGTH
+        return 1
+
+    def start(self):
+        """启动后台线程：每refresh_interval秒重试创建失败的索引，并同步SQLite索引"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='hr-search-index', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                if not self.available:
+                    self.ensure()
+                else:
+                    self.refresh(force=True)
+            except Exception:
+                logger.exception("员工搜索索引同步失败")
+
+    def close(self):
+        self._stop.set()
+
+    def ensure(self) -> bool:
+        """创建索引结构并完成首次全量构建"""
+        employees = Config.HR_TABLES['employees']
+        try:
+            with self.engine.begin() as conn:
+                if self.dialect == 'sqlite':
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                        "employee_id UNINDEXED, id_grams, name_grams, email_grams, pinyin_grams, "
+                        "tokenize='unicode61')"
+                    ))
+                elif self.dialect == 'mysql':
+                    existing = conn.execute(text(
+                        f"SHOW INDEX FROM {employees} WHERE Key_name = 'ft_employee_search'"
+                    )).fetchall()
+                    if not existing:
+                        conn.execute(text(
+                            f"ALTER TABLE {employees} ADD FULLTEXT INDEX ft_employee_search "
+                            "(name, employee_id, email) WITH PARSER ngram"
+                        ))
+                elif self.dialect == 'postgresql':
+                    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                    for column in ('name', 'employee_id', 'email'):
+                        conn.execute(text(
+                            f"CREATE INDEX IF NOT EXISTS idx_{employees}_{column}_trgm "
+                            f"ON {employees} USING gin ({column} gin_trgm_ops)"
+                        ))
+                else:
+                    return False
+            if self.dialect == 'sqlite':
+                self.refresh(force=True, full_reload=True)
+            self.available = True
+        except Exception:
+            logger.exception("创建员工搜索索引失败，将在后台重试")
+            self.available = False
+        return self.available
+
+    def _has_updated_at(self, conn) -> bool:
+        columns = conn.execute(text(
+            f"SELECT * FROM {Config.HR_TABLES['employees']} WHERE 1=0"
+        )).keys()
+        return 'updated_at' in columns
+
+    def _counts_match(self, conn) -> bool:
+        """索引中的员工数与员工表一致（没有被删除的员工残留）"""
+        indexed = conn.execute(text(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")).scalar()
+        total = conn.execute(text(f"SELECT COUNT(*) FROM {Config.HR_TABLES['employees']}")).scalar()
+        return indexed == total
+
+    def refresh(self, force: bool = False, full_reload: bool = False) -> int:
+        """
+        同步SQLite索引
+
+        表中有updated_at时只同步该时间及之后变化的员工；索引与员工表的行数不一致（有员工被删除）
+        或距上次全量构建超过full_reload_interval时清空后全量构建。
+        """
+        if self.dialect != 'sqlite':
+            return 0
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+            with self.engine.begin() as conn:
+                incremental = self._has_updated_at(conn)
+                columns = "employee_id, name, email" + (", updated_at" if incremental else "")
+                query = f"SELECT {columns} FROM {Config.HR_TABLES['employees']}"
+                params = {}
+                full_reload = (
+                    full_reload or not incremental or not self._watermark
+                    or now - self._last_full_reload >= self.full_reload_interval
+                    or not self._counts_match(conn)
+                )
+                if full_reload:
+                    conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+                    self._watermark = None
+                    self._last_full_reload = now
+                else:
+                    query += " WHERE updated_at >= :since"
+                    params['since'] = self._watermark
+
+                rows = [dict(row) for row in conn.execute(text(query), params).mappings()]
+                if params and rows:
+                    conn.execute(
+                        text(f"DELETE FROM {SEARCH_TABLE} WHERE employee_id = :employee_id"),
+                        [{'employee_id': str(row['employee_id'])} for row in rows]
+                    )
+                if rows:
+                    conn.execute(text(
+                        f"INSERT INTO {SEARCH_TABLE} "
+                        "(employee_id, id_grams, name_grams, email_grams, pinyin_grams) "
+                        "VALUES (:employee_id, :id_grams, :name_grams, :email_grams, :pinyin_grams)"
+                    ), [self._document(row) for row in rows])
+                for row in rows:
+                    if incremental and row.get('updated_at') is not None:
+                        updated_at = str(row['updated_at'])
+                        if self._watermark is None or updated_at > self._watermark:
+                            self._watermark = updated_at
+            return len(rows)
+
+    @staticmethod
+    def _document(row: Dict) -> Dict:
+        email = str(row.get('email') or '')
+        pinyin = _pinyin_values(row.get('name'))
+        return {
+            'employee_id': str(row['employee_id']),
+            'id_grams': ' '.join(ngram_tokens(row['employee_id'])),
+            'name_grams': ' '.join(ngram_tokens(row.get('name'))),
+            'email_grams': ' '.join(ngram_tokens(email.split('@')[0])),
+            'pinyin_grams': ' '.join(
+                gram for part in pinyin.split() for gram in ngram_tokens(part)
+            ),
+        }
+
+    def search(self, terms: List[str], limit: int = 20, offset: int = 0) -> Optional[List[str]]:
+        """
+        返回按相关度排序的员工工号列表，跳过前offset条
+
+        索引不可用时返回None，调用方应退回LIKE查询
+        """
+        if not self.available or not terms:
+            return None
+        if any(len(term) < self.min_term_length for term in terms):
+            return None
+        if self.dialect == 'sqlite':
+            expression = _match_expression(terms)
+            if not expression:
+                return []
+            query = (
+                f"SELECT employee_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :expression "
+                f"ORDER BY bm25({SEARCH_TABLE}, 0, 10.0, 8.0, 3.0, 4.0) LIMIT :limit OFFSET :offset"
+            )
+            params = {'expression': expression, 'limit': limit, 'offset': offset}
+        elif self.dialect == 'mysql':
+            query = (
+                f"SELECT employee_id FROM {Config.HR_TABLES['employees']} "
+                "WHERE MATCH(name, employee_id, email) AGAINST (:expression IN BOOLEAN MODE) "
+                "ORDER BY MATCH(name, employee_id, email) AGAINST (:expression IN BOOLEAN MODE) DESC "
+                "LIMIT :limit OFFSET :offset"
+            )
+            params = {'expression': ' '.join(f'"{t}"' for t in terms), 'limit': limit, 'offset': offset}
+        else:
+            clauses = []
+            params = {'limit': limit, 'offset': offset}
+            for i, term in enumerate(terms):
+                params[f't{i}'] = term
+                params[f'p{i}'] = f'%{term}%'
+                clauses.append(f"name ILIKE :p{i} OR employee_id ILIKE :p{i} OR email ILIKE :p{i}")
+            score = ' + '.join(
+                f"greatest(similarity(name, :t{i}), similarity(employee_id, :t{i}), similarity(email, :t{i}))"
+                for i in range(len(terms))
+            )
+            query = (
+                f"SELECT employee_id FROM {Config.HR_TABLES['employees']} "
+                f"WHERE {' OR '.join(clauses)} ORDER BY {score} DESC, employee_id LIMIT :limit OFFSET :offset"
+            )
+
+        engine = self.engine if self.dialect == 'sqlite' else self.read_engine()
+        with engine.connect() as conn:
+            return [str(row[0]) for row in conn.execute(text(query), params)]
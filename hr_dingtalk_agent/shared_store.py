@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class SharedStore:
+    """
+    基于本地SQLite文件的键值存储，供同一台机器上的多个worker进程共享缓存
+
+    使用WAL模式，读写互不阻塞。接口与Redis的get/set/delete相近（set的过期时间为秒），
+    也可作为钉钉SDK会话存储的后端，使各进程共用同一个访问令牌。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS kv ('
+            'key TEXT PRIMARY KEY, value TEXT, expires_at REAL)'
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+                (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float = None, ex: float = None):
+        """写入键值，ttl（或Redis风格的ex）为过期秒数，不指定则不过期"""
+        ttl = ttl if ttl is not None else ex
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, expires_at)
+            )
+
+    def add(self, key: str, value: str = '', ttl: float = None) -> bool:
+        """键不存在或已过期时写入并返回True，否则返回False；各进程间原子"""
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at '
+                'WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?',
+                (key, value, expires_at, now)
+            )
+            return cursor.rowcount > 0
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM kv WHERE key = ?', (key,))
+
+    def purge_expired(self) -> int:
+        """删除已过期的键，返回删除数量"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
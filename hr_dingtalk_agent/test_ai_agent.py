@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+
+from bootstrap_db import generate
+from config import Config
+from schema import create_schema
+
+
+@pytest.fixture(scope='module')
+def agent(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('hr') / 'hr')
+    patch = pytest.MonkeyPatch()
+    patch.setattr(Config, 'DB_TYPE', 'sqlite')
+    patch.setattr(Config, 'DB_NAME', path)
+    patch.setattr(Config, 'DB_REPLICA_HOSTS', [], raising=False)
+    patch.setattr(Config, 'HR_ADMIN_DEPARTMENTS', [])
+    # 固定走本地意图识别，不调用LLM
+    patch.setattr(Config, 'INTENT_ROUTER_THRESHOLD', 0.0)
+    engine = create_engine(Config.get_db_url())
+    create_schema(engine)
+    generate(engine, 2000, 1, 20000, 42)
+    engine.dispose()
+
+    from ai_agent import HRAIAgent
+    agent = HRAIAgent()
+    asyncio.run(agent.warm_up())
+    yield agent
+    agent.close()
+    patch.undo()
+
+
+def ask(agent, query, viewer):
+    return asyncio.run(agent.process_query(query, viewer))
+
+
+@pytest.mark.parametrize('query', ['冯芳的履历', '冯芳的考勤统计', '冯芳的考勤'])
+def test_same_name_candidates_respect_permissions(agent, query):
+    # E000099不是冯芳（E000003、E001849）的上级，也不应看到名字包含“冯芳”的冯芳晨
+    response = ask(agent, query, 'E000099')
+    assert response['content'] == '抱歉，您只能查询本人、下属及所管理部门的数据'
+    assert 'next' not in response
+
+
+def test_same_name_candidates_only_exact_names(agent):
+    response = ask(agent, '冯芳的履历', None)
+    assert 'E000003' in response['content'] and 'E001849' in response['content']
+    assert '冯芳晨' not in response['content']
+    assert 'next' not in response
+
+
+def test_single_visible_candidate_is_resolved(agent):
+    # 冯芳E001849的上级只能看到这一位冯芳，直接按其工号查询
+    viewer = agent.org.get_employee('E001849')['manager_id']
+    assert not agent.org.can_view_employee(viewer, 'E000003')
+    response = ask(agent, '冯芳的履历', viewer)
+    assert response['content'].startswith('职业发展历程')
@@ -0,0 +1,61 @@
+import calendar
+from datetime import date
+
+import pytest
+
+from date_parser import cn_to_int, parse_date_range
+
+TODAY = date(2024, 6, 15)
+
+
+def _month(month):
+    return date(2024, month, 1), date(2024, month, calendar.monthrange(2024, month)[1])
+
+
+@pytest.mark.parametrize('query', ['张三3月的考勤', '王五3月的考勤'])
+def test_name_followed_by_arabic_month(query):
+    assert parse_date_range(query, TODAY) == (date(2024, 3, 1), date(2024, 3, 31))
+
+
+@pytest.mark.parametrize('query, month', [
+    ('张三二月的考勤', 2), ('王五三月的考勤', 3), ('张三十月的考勤', 10), ('李四五月考勤', 5), ('张三十二月的考勤', 12),
+])
+def test_name_followed_by_chinese_month(query, month):
+    assert parse_date_range(query, TODAY) == _month(month)
+
+
+def test_name_followed_by_chinese_explicit_range():
+    assert parse_date_range('查张三三月一日到十五日的考勤', TODAY) == (date(2024, 3, 1), date(2024, 3, 15))
+
+
+def test_name_followed_by_explicit_range():
+    assert parse_date_range('李四3月1日到15日的考勤', TODAY) == (date(2024, 3, 1), date(2024, 3, 15))
+
+
+def test_range_crossing_year_end():
+    assert parse_date_range('12月25日到1月5日的考勤', TODAY) == (date(2024, 12, 25), date(2025, 1, 5))
+
+
+def test_invalid_date_is_not_widened_to_year():
+    assert parse_date_range('2023-02-29的考勤', TODAY) is None
+
+
+def test_zero_day_window():
+    assert parse_date_range('最近0天的考勤', TODAY) is None
+
+
+def test_employee_number_is_not_a_year():
+    assert parse_date_range('工号2019的考勤', TODAY) is None
+
+
+def test_year_still_recognized():
+    assert parse_date_range('2023年的考勤', TODAY) == (date(2023, 1, 1), date(2023, 12, 31))
+    assert parse_date_range('2023-03的考勤', TODAY) == (date(2023, 3, 1), date(2023, 3, 31))
+
+
+def test_cn_to_int():
+    assert cn_to_int('15') == 15
+    assert cn_to_int('十五') == 15
+    assert cn_to_int('二十') == 20
+    with pytest.raises(ValueError):
+        cn_to_int('三3')
@@ -0,0 +1,84 @@
+import asyncio
+
+from cache import SingleFlight
+from job_queue import MessageJobQueue
+
+
+class SlowFirstHandler:
+    """合并相同查询的处理器，第一次执行超过任务超时，之后立即返回"""
+
+    def __init__(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+        self.sent = []
+
+    async def handle_message(self, message):
+        return await self.flight.do('同一个查询', self._answer)
+
+    async def _answer(self):
+        self.calls += 1
+        if self.calls == 1:
+            await asyncio.sleep(1)
+        return {'content': 'ok'}
+
+    async def send_message(self, user_id, response):
+        self.sent.append((user_id, response))
+        return True
+
+
+def test_single_flight_follower_reruns_when_leader_cancelled():
+    async def scenario():
+        handler = SlowFirstHandler()
+        leader = asyncio.ensure_future(handler.handle_message({}))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(handler.handle_message({}))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        assert await asyncio.wait_for(follower, 1) == {'content': 'ok'}
+        assert handler.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_worker_survives_coalesced_job_timeout():
+    async def scenario():
+        handler = SlowFirstHandler()
+        queue = MessageJobQueue(handler, workers=2, job_timeout=0.3)
+        queue.start()
+        queue.submit({'senderStaffId': 'E000001', 'msgId': 'm1'})
+        # 第二条消息合并到第一条的执行中，第一条超时取消后由它重新执行
+        await asyncio.sleep(0.1)
+        queue.submit({'senderStaffId': 'E000002', 'msgId': 'm2'})
+        await asyncio.wait_for(queue._queue.join(), 2)
+
+        stats = queue.get_stats()
+        assert stats['workers'] == 2
+        assert stats['timed_out'] == 1 and stats['completed'] == 1
+        assert [user_id for user_id, _ in handler.sent] == ['E000002']
+        await queue.stop()
+        assert queue.get_stats()['workers'] == 0
+
+    asyncio.run(scenario())
+
+
+class CancelledHandler:
+    async def handle_message(self, message):
+        raise asyncio.CancelledError
+
+    async def send_message(self, user_id, response):
+        return True
+
+
+def test_worker_survives_stray_cancelled_error():
+    async def scenario():
+        queue = MessageJobQueue(CancelledHandler(), workers=1, job_timeout=1)
+        queue.start()
+        queue.submit({'senderStaffId': 'E000001', 'msgId': 'm1'})
+        await asyncio.wait_for(queue._queue.join(), 1)
+        await asyncio.sleep(0)
+
+        stats = queue.get_stats()
+        assert stats['workers'] == 1 and stats['failed'] == 1
+        await queue.stop()
+
+    asyncio.run(scenario())
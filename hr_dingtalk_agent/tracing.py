@@ -0,0 +1,134 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from metrics import REQUEST_SECONDS, STAGE_ERRORS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('hr_trace', default=None)
+
+
+class Trace:
+    """
+    一条消息的处理链路
+
+    从回调接口创建，随任务进入后台队列，各阶段的span按request_id关联。
+    通过contextvars在协程之间传递；在线程池中执行的数据库查询需复制上下文（见AsyncHRDatabase.run）。
+    """
+
+    def __init__(self, request_id: str = None, **attributes):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.attributes: Dict = dict(attributes)
+        self.spans: List[Dict] = []
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict:
+        return {
+            'request_id': self.request_id,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 2) if self.duration is not None else None,
+            'attributes': self.attributes,
+            'spans': self.spans,
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+def activate(trace: Optional[Trace]):
+    """将trace设为当前上下文的链路，返回用于恢复的token"""
+    return _current_trace.set(trace)
+
+
+def deactivate(token):
+    _current_trace.reset(token)
+
+
+def annotate(**attributes):
+    """给当前链路添加属性（如意图、识别来源）"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    记录一个处理阶段的耗时
+
+    无论是否处于链路中都会计入阶段耗时直方图；处于链路中时同时记录到链路的span列表，
+    异常会记录到span并继续抛出。
+    """
+    trace = _current_trace.get()
+    record = {'stage': stage, **attributes}
+    started = time.perf_counter()
+    if trace is not None:
+        record['offset_ms'] = round(trace.elapsed() * 1000, 2)
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = f'{type(e).__name__}: {e}'
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        record['duration_ms'] = round(duration * 1000, 2)
+        STAGE_SECONDS.observe(duration, stage=stage)
+        if trace is not None:
+            trace.spans.append(record)
+
+
+class TraceExporter:
+    """将完成的链路以JSON Lines格式追加写入本地文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+_exporter: Optional[TraceExporter] = None
+
+
+def configure_export(path: Optional[str]):
+    """设置链路导出文件，path为空时不导出"""
+    global _exporter
+    _exporter = TraceExporter(path) if path else None
+
+
+def finish(trace: Trace, slow_threshold: float = None):
+    """结束链路：记录总耗时直方图，导出链路，超过slow_threshold秒时记录慢请求日志"""
+    trace.duration = trace.elapsed()
+    REQUEST_SECONDS.observe(trace.duration, intent=trace.attributes.get('intent', 'none'))
+    if _exporter is not None:
+        try:
+            _exporter.export(trace)
+        except OSError:
+            logger.warning("导出链路失败", exc_info=True)
+    if slow_threshold is not None and trace.duration > slow_threshold:
+        logger.warning(
+            "慢请求 %s 耗时 %.0fms: %s", trace.request_id, trace.duration * 1000,
+            ', '.join(f"{s['stage']}={s['duration_ms']}ms" for s in trace.spans)
+        )
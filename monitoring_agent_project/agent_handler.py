@@ -1,21 +1,28 @@
 import time
 import json
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 import asyncio
 from datetime import datetime
 import os
+import signal
 
 from logger import get_logger
 from scrapers import create_scrapers
+from proxy_pool import ProxyPool
 from analysis import SentimentAnalyzer
+from result_store import ResultWriter, is_result_file, iter_items, iter_records, read_summary
 
 logger = get_logger()
 
 class MonitoringAgent:
     def __init__(self, config_path: str = "config.json"):
         """Initialize the monitoring agent with configuration"""
+        self.config_path = config_path
         self.config = self._load_config(config_path)
-        self.scrapers = create_scrapers(self.config)
+        self._config_mtime = self._get_config_mtime()
+        self._reload_event: Optional[asyncio.Event] = None
+        self.proxy_pool = ProxyPool(self.config)
+        self.scrapers = create_scrapers(self.config, self.proxy_pool)
         self.analyzer = SentimentAnalyzer(self.config)
         self.last_results = None
         self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
@@ -32,6 +39,91 @@ class MonitoringAgent:
             logger.error(f"Error loading configuration: {str(e)}")
             raise
 
+    def _get_config_mtime(self) -> Optional[float]:
+        """Return the config file modification time, or None if unavailable"""
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    def reload_config(self) -> bool:
+        """
+        Re-read the configuration file and apply it to the running agent
+
+        Scrapers and the analyzer are updated in place so HTTP sessions,
+        deferred analysis items and ``last_results`` survive the reload.
+        Sources added to or removed from ``websites`` are rebuilt. An invalid
+        file is logged and ignored, leaving the current configuration active.
+
+        Returns:
+            bool: True if a new configuration was applied
+        """
+        self._config_mtime = self._get_config_mtime()
+        try:
+            new_config = self._load_config(self.config_path)
+            # Same checks as at startup; imported here because monitor_agent imports this module
+            from monitor_agent import validate_config
+            if not validate_config(new_config):
+                raise ValueError("Invalid configuration")
+        except Exception as e:
+            logger.error(f"Config reload rejected, keeping current settings: {str(e)}")
+            return False
+
+        if new_config == self.config:
+            return False
+
+        changed = sorted(
+            key for key in set(self.config) | set(new_config)
+            if self.config.get(key) != new_config.get(key)
+        )
+
+        self.proxy_pool.configure(new_config)
+        fresh_scrapers = None
+        for source in new_config['websites']:
+            if source in self.scrapers:
+                self.scrapers[source].apply_config(new_config)
+            else:
+                if fresh_scrapers is None:
+                    fresh_scrapers = create_scrapers(new_config, self.proxy_pool)
+                if source in fresh_scrapers:
+                    self.scrapers[source] = fresh_scrapers[source]
+        for source in list(self.scrapers):
+            if source not in new_config['websites']:
+                del self.scrapers[source]
+
+        self.analyzer.apply_config(new_config)
+        self.config = new_config
+        logger.info(f"Configuration reloaded, changed: {', '.join(changed)}")
+        return True
+
+    def request_reload(self):
+        """Ask the run loop to reload the configuration (e.g. on SIGHUP)"""
+        if self._reload_event is not None:
+            self._reload_event.set()
+
+    async def _wait_for_next_cycle(self, cycle_start: float):
+        """
+        Sleep until the next cycle is due, applying config changes as they
+        arrive. A changed ``pollingInterval`` reschedules the pending cycle.
+        """
+        watch_interval = self.config.get('configWatchInterval', 5)
+        while True:
+            next_cycle = cycle_start + self.config['pollingInterval'] * 60
+            remaining = next_cycle - time.time()
+            if remaining <= 0:
+                return
+
+            try:
+                await asyncio.wait_for(
+                    self._reload_event.wait(),
+                    timeout=min(remaining, watch_interval)
+                )
+                self._reload_event.clear()
+                self.reload_config()
+            except asyncio.TimeoutError:
+                if self._get_config_mtime() != self._config_mtime:
+                    self.reload_config()
+
     async def _scrape_website(self, source: str, scraper, keyword: str) -> List[Dict]:
         """Scrape a single website asynchronously"""
         try:
@@ -40,6 +132,8 @@ class MonitoringAgent:
                 None, scraper.search, keyword
             )
             logger.info(f"Found {len(results)} results from {source}")
+            for result in results:
+                result['keyword'] = keyword
             return results
         except Exception as e:
             logger.error(f"Error scraping {source}: {str(e)}")
@@ -65,11 +159,16 @@ class MonitoringAgent:
 
         return all_results
 
-    def analyze_data(self, results: List[Dict]) -> Dict:
+    def analyze_data(
+        self,
+        results: List[Dict],
+        deadline: Optional[float] = None,
+        on_result: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
         """Analyze gathered data"""
         try:
-            # Perform sentiment analysis on all results
-            analyzed_results = self.analyzer.analyze_batch(results)
+            # Perform sentiment analysis, most important items first
+            analyzed_results = self.analyzer.analyze_batch(results, deadline, on_result)
             
             # Get aggregate metrics
             aggregate_metrics = self.analyzer.get_aggregate_sentiment(analyzed_results)
@@ -87,6 +186,8 @@ class MonitoringAgent:
                 'results': analyzed_results,
                 'aggregate_metrics': aggregate_metrics,
                 'trend_analysis': trend_analysis,
+                'load_shedding': self.analyzer.last_shedding,
+                'proxy_stats': self.proxy_pool.get_stats(),
                 'timestamp': time.time()
             }
         except Exception as e:
@@ -96,32 +197,51 @@ class MonitoringAgent:
                 'timestamp': time.time()
             }
 
+    def _open_result_writer(self, timestamp: float) -> ResultWriter:
+        """Create a streaming writer for one cycle's results"""
+        filename = f"results_{datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S')}.ndjson"
+        return ResultWriter(
+            os.path.join(self.data_dir, filename),
+            compression=self.config.get('resultsCompression')
+        )
+
+    @staticmethod
+    def _summary(analysis_results: Dict) -> Dict:
+        """Everything except the per-item results"""
+        return {k: v for k, v in analysis_results.items() if k != 'results'}
+
     def save_results(self, analysis_results: Dict):
-        """Save analysis results to file"""
+        """Save already computed analysis results to an NDJSON file"""
         try:
-            timestamp = datetime.fromtimestamp(analysis_results['timestamp'])
-            filename = f"results_{timestamp.strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(self.data_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(analysis_results, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"Results saved to {filepath}")
-            
+            with self._open_result_writer(analysis_results['timestamp']) as writer:
+                for item in analysis_results.get('results', []):
+                    writer.write_item(item)
+                writer.write_summary(self._summary(analysis_results))
+
+            logger.info(f"Results saved to {writer.filepath}")
+
             # Keep only the last 100 result files
             self._cleanup_old_results()
         except Exception as e:
             logger.error(f"Error saving results: {str(e)}")
 
+    def get_proxy_stats(self) -> Dict:
+        """Per-proxy, per-host latency, error rate and ejection state"""
+        return self.proxy_pool.get_stats()
+
+    def _list_result_files(self) -> List[str]:
+        """Result file paths, oldest first"""
+        return sorted(
+            os.path.join(self.data_dir, f)
+            for f in os.listdir(self.data_dir)
+            if is_result_file(f)
+        )
+
     def _cleanup_old_results(self, keep_last: int = 100):
         """Clean up old result files, keeping only the specified number of most recent files"""
         try:
-            files = sorted([
-                os.path.join(self.data_dir, f)
-                for f in os.listdir(self.data_dir)
-                if f.startswith('results_') and f.endswith('.json')
-            ])
-            
+            files = self._list_result_files()
+
             if len(files) > keep_last:
                 for file in files[:-keep_last]:
                     os.remove(file)
@@ -129,27 +249,50 @@ class MonitoringAgent:
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
 
+    def _latest_result_file(self) -> Optional[str]:
+        """Path of the most recent result file, if any"""
+        files = self._list_result_files()
+        return files[-1] if files else None
+
     def get_latest_results(self) -> Optional[Dict]:
-        """Get the most recent analysis results"""
+        """Get the most recent analysis results, fully loaded into memory"""
         try:
-            files = sorted([
-                f for f in os.listdir(self.data_dir)
-                if f.startswith('results_') and f.endswith('.json')
-            ])
-            
-            if not files:
+            latest_file = self._latest_result_file()
+            if not latest_file:
                 return None
-            
-            latest_file = os.path.join(self.data_dir, files[-1])
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+
+            results = []
+            summary = {}
+            for record in iter_records(latest_file):
+                if record.get('_type') == 'summary':
+                    summary = {k: v for k, v in record.items() if k != '_type'}
+                else:
+                    results.append(record)
+            return {'results': results, **summary}
         except Exception as e:
             logger.error(f"Error reading latest results: {str(e)}")
             return None
 
+    def iter_latest_results(self) -> Iterator[Dict]:
+        """Lazily iterate the analyzed items of the most recent results"""
+        latest_file = self._latest_result_file()
+        if latest_file:
+            yield from iter_items(latest_file)
+
+    def get_latest_summary(self) -> Optional[Dict]:
+        """Get aggregate metrics and trends of the most recent results without loading items"""
+        try:
+            latest_file = self._latest_result_file()
+            return read_summary(latest_file) if latest_file else None
+        except Exception as e:
+            logger.error(f"Error reading latest summary: {str(e)}")
+            return None
+
     async def monitor_cycle(self):
         """Run one complete monitoring cycle"""
         try:
+            cycle_start = time.time()
+
             # Gather data from all sources
             results = await self.gather_data()
             
@@ -157,11 +300,29 @@ class MonitoringAgent:
                 logger.warning("No results gathered in this cycle")
                 return
             
-            # Analyze gathered data
-            analysis_results = self.analyze_data(results)
-            
-            # Save results
-            self.save_results(analysis_results)
+            # Analyze gathered data within the cycle's time budget, streaming
+            # each item to disk as soon as it is analyzed
+            writer = None
+            try:
+                writer = self._open_result_writer(cycle_start)
+            except OSError as e:
+                logger.error(f"Error opening results file: {str(e)}")
+
+            analysis_results = self.analyze_data(
+                results,
+                self._analysis_deadline(cycle_start),
+                writer.write_item if writer else None
+            )
+
+            if writer:
+                try:
+                    writer.write_summary(self._summary(analysis_results))
+                    writer.close()
+                    logger.info(f"Results saved to {writer.filepath}")
+                    self._cleanup_old_results()
+                except Exception as e:
+                    writer.abort()
+                    logger.error(f"Error saving results: {str(e)}")
             
             # Check for alerts
             if analysis_results.get('trend_analysis', {}).get('alerts'):
@@ -175,24 +336,58 @@ class MonitoringAgent:
             logger.error(f"Error in monitoring cycle: {str(e)}")
             return None
 
+    def _analysis_deadline(self, cycle_start: float) -> float:
+        """Latest time analysis may run so results land within the polling interval"""
+        budget = self.config.get('analysisBudget', {})
+        max_seconds = budget.get(
+            'maxSeconds',
+            self.config['pollingInterval'] * 60 * budget.get('intervalFraction', 0.8)
+        )
+        return cycle_start + max_seconds
+
     async def run(self):
         """Run the monitoring agent continuously"""
         logger.info("Starting monitoring agent")
+        self._reload_event = asyncio.Event()
+        try:
+            asyncio.get_event_loop().add_signal_handler(signal.SIGHUP, self.request_reload)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # SIGHUP is not available on every platform; file watching still works
+            pass
+
         while True:
             try:
+                cycle_start = time.time()
                 await self.monitor_cycle()
-                # Wait for the configured interval
-                await asyncio.sleep(self.config['pollingInterval'] * 60)
+                # Wait for the configured interval, picking up config edits
+                await self._wait_for_next_cycle(cycle_start)
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {str(e)}")
                 # Wait a short time before retrying
                 await asyncio.sleep(60)
 
-    def start(self):
-        """Start the monitoring agent"""
+    def start(self, mode: str = 'standalone', worker_id: Optional[str] = None):
+        """
+        Start the monitoring agent
+
+        Args:
+            mode (str): ``standalone`` runs whole cycles in this process;
+                ``coordinator`` publishes cycles to the shared lease store and
+                ``worker`` processes leased units from it
+            worker_id (str): Optional worker name, defaults to host:pid
+        """
+        if mode == 'coordinator':
+            from distributed import MonitoringCoordinator
+            main = MonitoringCoordinator(self).run()
+        elif mode == 'worker':
+            from distributed import MonitoringWorker
+            main = MonitoringWorker(self, worker_id).run()
+        else:
+            main = self.run()
+
+        loop = asyncio.get_event_loop()
         try:
-            loop = asyncio.get_event_loop()
-            loop.run_until_complete(self.run())
+            loop.run_until_complete(main)
         except KeyboardInterrupt:
             logger.info("Monitoring agent stopped by user")
         except Exception as e:
@@ -1,7 +1,8 @@
 import openai
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Optional
 import json
 from logger import get_logger
+from prioritizer import AnalysisPrioritizer, AnalysisQueue
 import time
 
 logger = get_logger()
@@ -9,10 +10,20 @@ logger = get_logger()
 class SentimentAnalyzer:
     def __init__(self, config: dict):
         """Initialize the sentiment analyzer with OpenAI configuration"""
+        self.retry_delay = 1  # Initial delay in seconds
+        self.quota_exhausted = False
+        self.deferred: List[Dict] = []
+        self.last_shedding: Dict = {}
+        self.apply_config(config)
+
+    def apply_config(self, config: dict):
+        """Apply new settings, keeping deferred items and shedding state"""
         self.api_key = config['openai_api_key']
         openai.api_key = self.api_key
         self.retries = config.get('retries', 3)
-        self.retry_delay = 1  # Initial delay in seconds
+        self.prioritizer = AnalysisPrioritizer(config)
+        # Maximum OpenAI calls per cycle (None means unlimited)
+        self.max_calls = config.get('analysisBudget', {}).get('maxCalls')
 
     def _call_openai_api(self, text: str) -> Dict:
         """
@@ -47,6 +58,7 @@ class SentimentAnalyzer:
                     time.sleep(sleep_time)
                 else:
                     logger.error("Rate limit error, max retries exceeded")
+                    self.quota_exhausted = True
                     raise
 
             except openai.error.APIError as e:
@@ -100,22 +112,101 @@ class SentimentAnalyzer:
             }
             return content
 
-    def analyze_batch(self, contents: List[Dict]) -> List[Dict]:
+    def analyze_batch(
+        self,
+        contents: List[Dict],
+        deadline: Optional[float] = None,
+        on_result: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict]:
         """
-        Analyze sentiment for a batch of content
-        
+        Analyze sentiment for a batch of content in priority order
+
+        Items are scored by source weight, local negativity pre-score, keyword
+        importance and freshness. When the deadline passes, the per-cycle call
+        budget is spent or the OpenAI quota is exhausted, the remaining
+        lowest-priority items are deferred to the next cycle (or dropped when
+        too old) and the outcome is recorded in ``last_shedding``.
+
         Args:
             contents (List[Dict]): List of content items to analyze
-            
+            deadline (float): Optional epoch time by which analysis must stop
+            on_result (Callable): Optional callback invoked with each item as
+                soon as it is analyzed, e.g. to stream it to disk
+
         Returns:
-            List[Dict]: Analyzed content items
+            List[Dict]: Analyzed content items, highest priority first
         """
+        queue = AnalysisQueue(self.prioritizer)
+        queue.extend(self._with_deferred(contents))
+        self.deferred = []
+        self.quota_exhausted = False
+
         analyzed_contents = []
-        for content in contents:
+        calls = 0
+        stop_reason = None
+        while queue:
+            if deadline is not None and time.time() >= deadline:
+                stop_reason = 'deadline'
+                break
+            if self.max_calls is not None and calls >= self.max_calls:
+                stop_reason = 'call_budget'
+                break
+
+            content = queue.pop()
             analyzed_content = self.analyze_content(content)
+            calls += 1
+
+            if self.quota_exhausted:
+                # The item was not really analyzed; give it back to the queue
+                analyzed_content.pop('sentiment_analysis', None)
+                queue.push(analyzed_content)
+                stop_reason = 'quota'
+                break
             analyzed_contents.append(analyzed_content)
+            if on_result is not None:
+                on_result(analyzed_content)
+
+        self._shed(queue.drain(), stop_reason, len(analyzed_contents))
         return analyzed_contents
 
+    def _with_deferred(self, contents: List[Dict]) -> List[Dict]:
+        """
+        Deferred items followed by new ones, without repeating a URL
+
+        A story scraped again while still deferred keeps its deferred copy,
+        so it is analyzed once and keeps its original timestamp.
+        """
+        seen = set()
+        merged = []
+        for content in self.deferred + contents:
+            url = content.get('url')
+            if url:
+                if url in seen:
+                    continue
+                seen.add(url)
+            merged.append(content)
+        return merged
+
+    def _shed(self, remaining: List[Dict], reason: Optional[str], analyzed: int):
+        """Defer or drop items left over when a cycle runs out of budget"""
+        now = time.time()
+        dropped = [c for c in remaining if self.prioritizer.is_expired(c, now)]
+        self.deferred = [c for c in remaining if not self.prioritizer.is_expired(c, now)]
+
+        self.last_shedding = {
+            'reason': reason,
+            'analyzed': analyzed,
+            'deferred': len(self.deferred),
+            'dropped': len(dropped),
+            'dropped_urls': [c.get('url') for c in dropped],
+            'timestamp': now
+        }
+        if remaining:
+            logger.warning(
+                f"Analysis stopped early ({reason}): analyzed {analyzed}, "
+                f"deferred {len(self.deferred)}, dropped {len(dropped)}"
+            )
+
     def get_aggregate_sentiment(self, contents: List[Dict]) -> Dict:
         """
         Calculate aggregate sentiment metrics from a list of analyzed content
@@ -0,0 +1,238 @@
+import asyncio
+import functools
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from analysis import SentimentAnalyzer
+from logger import get_logger
+from lease_store import LeaseLostError, LeaseStore
+
+logger = get_logger()
+
+
+def _lease_store_for(agent) -> LeaseStore:
+    """Open the shared lease store described by the agent's configuration"""
+    settings = agent.config.get('distributed', {})
+    path = settings.get('leaseStore', os.path.join(agent.data_dir, 'leases.db'))
+    return LeaseStore(path, lease_seconds=settings.get('leaseSeconds', 120))
+
+
+class _LeaseStoreClient:
+    """
+    Run lease store calls off the event loop.
+
+    The store is synchronous SQLite that may wait up to its busy timeout for
+    another process's write lock, so every call goes through one dedicated
+    thread. A single thread also keeps transactions on the shared connection
+    from interleaving.
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.store = _lease_store_for(agent)
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lease-store')
+
+    async def _call(self, func: Callable, *args, **kwargs):
+        return await asyncio.get_event_loop().run_in_executor(
+            self._store_executor, functools.partial(func, *args, **kwargs)
+        )
+
+
+class MonitoringCoordinator(_LeaseStoreClient):
+    """
+    Split each monitoring cycle into keyword x source fetch units, wait for
+    workers to fetch and analyze them, then merge the results into one file.
+    """
+
+    def __init__(self, agent):
+        super().__init__(agent)
+        settings = agent.config.get('distributed', {})
+        self.progress_interval = settings.get('progressInterval', 2)
+        # How long to keep finished cycles in the lease store, in hours
+        self.retention = settings.get('retentionHours', 24) * 3600
+
+    def _fetch_units(self, cycle_id: str) -> List[Dict]:
+        """One fetch unit per keyword and source, weighted like the analysis queue"""
+        source_weights = self.agent.config.get('sourceWeights', {})
+        keyword_weights = self.agent.config.get('keywordWeights', {})
+        return [
+            {
+                'unit_id': f"{cycle_id}:fetch:{source}:{keyword}",
+                'kind': 'fetch',
+                'payload': {'keyword': keyword, 'source': source},
+                'priority': source_weights.get(source, 1.0) * keyword_weights.get(keyword, 1.0)
+            }
+            for keyword in self.agent.config['searchKeywords']
+            for source in self.agent.scrapers
+        ]
+
+    async def run_cycle(self) -> Optional[Dict]:
+        """Publish one cycle, wait for it to finish or time out, and save the merged results"""
+        cycle_start = time.time()
+        cycle_id = f"cycle_{datetime.fromtimestamp(cycle_start).strftime('%Y%m%d_%H%M%S')}"
+        deadline = self.agent._analysis_deadline(cycle_start)
+
+        units = self._fetch_units(cycle_id)
+        await self._call(self.store.create_cycle, cycle_id, units, deadline)
+        logger.info(f"Published {len(units)} fetch units for {cycle_id}")
+
+        while not await self._call(self.store.is_cycle_complete, cycle_id) and time.time() < deadline:
+            await asyncio.sleep(self.progress_interval)
+
+        progress = await self._call(self.store.cycle_progress, cycle_id)
+        complete = await self._call(self.store.is_cycle_complete, cycle_id)
+        if not complete:
+            logger.warning(f"Cycle {cycle_id} hit its deadline with units outstanding: {progress}")
+        await self._call(self.store.close_cycle, cycle_id, 'closed' if complete else 'partial')
+
+        summary = await self._call(self._merge, cycle_id, cycle_start, complete, progress)
+        if summary['trend_analysis'].get('alerts'):
+            logger.warning("Alerts detected: " + str(summary['trend_analysis']['alerts']))
+        return summary
+
+    def _merge(self, cycle_id: str, cycle_start: float, complete: bool, progress: Dict) -> Dict:
+        """Stream a closed cycle's results into its results file (runs on the store thread)"""
+        analyzer = self.agent.analyzer
+        writer = self.agent._open_result_writer(cycle_start)
+        items = []
+        try:
+            for item in self.store.iter_results(cycle_id, 'analyze'):
+                writer.write_item(item)
+                items.append(item)
+
+            aggregate_metrics = analyzer.get_aggregate_sentiment(items)
+            trend_analysis = analyzer.get_sentiment_trend(aggregate_metrics, self.agent.last_results)
+            self.agent.last_results = aggregate_metrics
+            summary = {
+                'aggregate_metrics': aggregate_metrics,
+                'trend_analysis': trend_analysis,
+                'distributed': {'cycle_id': cycle_id, 'complete': complete, 'units': progress},
+                'timestamp': time.time()
+            }
+            writer.write_summary(summary)
+            writer.close()
+        except Exception:
+            writer.abort()
+            raise
+
+        logger.info(f"Merged {len(items)} items for {cycle_id} into {writer.filepath}")
+        self.agent._cleanup_old_results()
+        self.store.purge_before(time.time() - self.retention)
+        return summary
+
+    async def run(self):
+        """Publish cycles every polling interval"""
+        logger.info(f"Starting monitoring coordinator on {self.store.path}")
+        self.agent._reload_event = asyncio.Event()
+        while True:
+            cycle_start = time.time()
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Error in coordinator cycle: {str(e)}")
+            await self.agent._wait_for_next_cycle(cycle_start)
+
+
+class MonitoringWorker(_LeaseStoreClient):
+    """
+    Lease fetch and analysis units from the shared store and process them.
+
+    Any number of workers, on any number of machines sharing the store, can
+    run side by side; each unit is leased to one worker at a time.
+    """
+
+    def __init__(self, agent, worker_id: Optional[str] = None):
+        super().__init__(agent)
+        settings = agent.config.get('distributed', {})
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = settings.get('concurrency', 4)
+        self.heartbeat_interval = settings.get('heartbeatSeconds', self.store.lease_seconds / 4)
+        self.idle_interval = settings.get('idleInterval', 1)
+        self.max_attempts = settings.get('maxAttempts', 3)
+
+    async def _heartbeat(self, unit: Dict):
+        """Keep a lease alive while its unit is being processed"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not await self._call(self.store.heartbeat, unit):
+                logger.warning(f"Lost lease on {unit['unit_id']}")
+                return
+
+    async def _process_fetch(self, unit: Dict):
+        keyword = unit['payload']['keyword']
+        source = unit['payload']['source']
+        scraper = self.agent.scrapers.get(source)
+        items = await self.agent._scrape_website(source, scraper, keyword) if scraper else []
+
+        follow_up = []
+        if items:
+            follow_up.append({
+                'unit_id': unit['unit_id'].replace(':fetch:', ':analyze:', 1),
+                'kind': 'analyze',
+                'payload': {'items': items},
+                # Finish analysis of fetched items before starting new fetches
+                'priority': unit['priority'] + 1000
+            })
+        await self._call(self.store.complete, unit, [], follow_up)
+
+    async def _process_analyze(self, unit: Dict):
+        # A fresh analyzer per unit: lanes run concurrently and the analyzer
+        # keeps per-batch state (deferred items, quota and shedding flags)
+        analyzer = SentimentAnalyzer(self.agent.config)
+        analyzed = await asyncio.get_event_loop().run_in_executor(
+            None, analyzer.analyze_batch, unit['payload']['items']
+        )
+
+        follow_up = []
+        if analyzer.deferred:
+            # Items left over by the call budget or an exhausted quota go back
+            # into the cycle as a new unit; the coordinator's deadline ends it
+            follow_up.append({
+                'kind': 'analyze',
+                'payload': {'items': analyzer.deferred},
+                'priority': unit['priority'] - 1
+            })
+        await self._call(self.store.complete, unit, analyzed, follow_up)
+
+    async def _process(self, unit: Dict):
+        heartbeat = asyncio.ensure_future(self._heartbeat(unit))
+        try:
+            if unit['kind'] == 'fetch':
+                await self._process_fetch(unit)
+            else:
+                await self._process_analyze(unit)
+        except LeaseLostError as e:
+            logger.warning(f"Discarding result: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error processing {unit['unit_id']}: {str(e)}")
+            try:
+                if unit['attempts'] >= self.max_attempts:
+                    # Give up on the unit rather than let it block the cycle
+                    await self._call(self.store.complete, unit, [])
+                else:
+                    await self._call(self.store.release, unit)
+            except LeaseLostError:
+                pass
+        finally:
+            heartbeat.cancel()
+
+    async def _slot(self):
+        """One processing lane: claim, process, repeat"""
+        while True:
+            unit = await self._call(self.store.claim, self.worker_id)
+            if unit is None:
+                await asyncio.sleep(self.idle_interval)
+                continue
+            await self._process(unit)
+
+    async def run(self):
+        """Process units until stopped"""
+        logger.info(
+            f"Starting monitoring worker {self.worker_id} "
+            f"with {self.concurrency} lanes on {self.store.path}"
+        )
+        await asyncio.gather(*(self._slot() for _ in range(self.concurrency)))
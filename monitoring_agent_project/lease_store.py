@@ -0,0 +1,268 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+from logger import get_logger
+
+logger = get_logger()
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    cycle_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    deadline REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open'
+);
+CREATE TABLE IF NOT EXISTS work_units (
+    unit_id TEXT PRIMARY KEY,
+    cycle_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_units_claim ON work_units (status, lease_expires, priority);
+CREATE INDEX IF NOT EXISTS idx_units_cycle ON work_units (cycle_id, status);
+CREATE TABLE IF NOT EXISTS results (
+    unit_id TEXT PRIMARY KEY,
+    cycle_id TEXT NOT NULL,
+    items TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_cycle ON results (cycle_id);
+"""
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker tries to act on a lease it no longer holds"""
+    pass
+
+
+class LeaseStore:
+    """
+    Work units leased to monitoring workers from a shared SQLite database.
+
+    Units move pending -> leased -> done. A lease carries a random token and an
+    expiry that the holder extends with heartbeats; expired leases become
+    claimable again. Completion is fenced on the token, so if a lease expired
+    and was re-claimed, the late worker's result is rejected and every unit is
+    merged into ``results`` exactly once.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 120):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        """Start a write transaction that takes the lock up front"""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    # Coordinator side
+
+    def create_cycle(self, cycle_id: str, units: List[Dict], deadline: float) -> int:
+        """
+        Register a cycle and its fetch units
+
+        Args:
+            cycle_id (str): Unique id of the cycle
+            units (List[Dict]): Dicts with ``kind``, ``payload`` and optional ``priority``
+            deadline (float): Epoch time by which the cycle should finish
+
+        Returns:
+            int: Number of units created
+        """
+        self._transaction()
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO cycles (cycle_id, created_at, deadline) VALUES (?, ?, ?)",
+                (cycle_id, time.time(), deadline)
+            )
+            for unit in units:
+                self._insert_unit(cycle_id, unit)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(units)
+
+    def _insert_unit(self, cycle_id: str, unit: Dict):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO work_units (unit_id, cycle_id, kind, payload, priority) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                unit.get('unit_id') or f"{cycle_id}:{unit['kind']}:{uuid.uuid4().hex[:12]}",
+                cycle_id,
+                unit['kind'],
+                json.dumps(unit['payload'], ensure_ascii=False),
+                unit.get('priority', 0)
+            )
+        )
+
+    def cycle_progress(self, cycle_id: str) -> Dict:
+        """Count units of a cycle by status"""
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM work_units WHERE cycle_id = ? GROUP BY status",
+            (cycle_id,)
+        ).fetchall()
+        progress = {PENDING: 0, LEASED: 0, DONE: 0}
+        progress.update({row['status']: row['n'] for row in rows})
+        return progress
+
+    def is_cycle_complete(self, cycle_id: str) -> bool:
+        """Whether every unit of a cycle is done"""
+        progress = self.cycle_progress(cycle_id)
+        return progress[PENDING] == 0 and progress[LEASED] == 0
+
+    def close_cycle(self, cycle_id: str, status: str = 'closed'):
+        """Mark a cycle finished and drop its unfinished units"""
+        self._transaction()
+        try:
+            self.conn.execute("UPDATE cycles SET status = ? WHERE cycle_id = ?", (status, cycle_id))
+            self.conn.execute(
+                "DELETE FROM work_units WHERE cycle_id = ? AND status != ?", (cycle_id, DONE)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def iter_results(self, cycle_id: str, kind_prefix: str = '') -> Iterator[Dict]:
+        """Stream merged items of a cycle without loading every unit at once"""
+        cursor = self.conn.execute(
+            "SELECT items FROM results WHERE cycle_id = ? AND unit_id LIKE ?",
+            (cycle_id, f"{cycle_id}:{kind_prefix}%")
+        )
+        for row in cursor:
+            yield from json.loads(row['items'])
+
+    def purge_before(self, cutoff: float):
+        """Remove cycles, units and results created before ``cutoff``"""
+        self._transaction()
+        try:
+            old = "SELECT cycle_id FROM cycles WHERE created_at < ?"
+            self.conn.execute(f"DELETE FROM results WHERE cycle_id IN ({old})", (cutoff,))
+            self.conn.execute(f"DELETE FROM work_units WHERE cycle_id IN ({old})", (cutoff,))
+            self.conn.execute("DELETE FROM cycles WHERE created_at < ?", (cutoff,))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    # Worker side
+
+    def claim(self, worker_id: str, kinds: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Atomically lease the highest priority claimable unit
+
+        Returns:
+            Optional[Dict]: The leased unit with its ``lease_token``, or None
+        """
+        now = time.time()
+        kind_filter = ''
+        params: List = [PENDING, LEASED, now]
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+
+        self._transaction()
+        try:
+            row = self.conn.execute(
+                "SELECT * FROM work_units "
+                "WHERE (status = ? OR (status = ? AND lease_expires < ?))"
+                f"{kind_filter} ORDER BY priority DESC LIMIT 1",
+                params
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            token = uuid.uuid4().hex
+            self.conn.execute(
+                "UPDATE work_units SET status = ?, owner = ?, lease_token = ?, "
+                "lease_expires = ?, attempts = attempts + 1 WHERE unit_id = ?",
+                (LEASED, worker_id, token, now + self.lease_seconds, row['unit_id'])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        if row['status'] == LEASED:
+            logger.warning(f"Reclaimed expired lease on {row['unit_id']} from {row['owner']}")
+        unit = dict(row)
+        unit['payload'] = json.loads(unit['payload'])
+        unit['lease_token'] = token
+        unit['owner'] = worker_id
+        # The row was read before the UPDATE; report the attempt count including this claim
+        unit['attempts'] += 1
+        return unit
+
+    def heartbeat(self, unit: Dict) -> bool:
+        """Extend a lease; returns False if it has been lost"""
+        cursor = self.conn.execute(
+            "UPDATE work_units SET lease_expires = ? "
+            "WHERE unit_id = ? AND lease_token = ? AND status = ?",
+            (time.time() + self.lease_seconds, unit['unit_id'], unit['lease_token'], LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, unit: Dict, items: List[Dict], follow_up: Optional[List[Dict]] = None):
+        """
+        Finish a unit, merge its items and enqueue follow-up units atomically
+
+        Raises:
+            LeaseLostError: If the lease expired and was taken over
+        """
+        self._transaction()
+        try:
+            cursor = self.conn.execute(
+                "UPDATE work_units SET status = ?, lease_expires = NULL "
+                "WHERE unit_id = ? AND lease_token = ? AND status = ?",
+                (DONE, unit['unit_id'], unit['lease_token'], LEASED)
+            )
+            if cursor.rowcount != 1:
+                raise LeaseLostError(f"Lease on {unit['unit_id']} is no longer held")
+
+            self.conn.execute(
+                "INSERT INTO results (unit_id, cycle_id, items, worker, finished_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (unit['unit_id'], unit['cycle_id'], json.dumps(items, ensure_ascii=False),
+                 unit['owner'], time.time())
+            )
+            for next_unit in follow_up or []:
+                self._insert_unit(unit['cycle_id'], next_unit)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def release(self, unit: Dict):
+        """Give a unit back so another worker can pick it up immediately"""
+        self.conn.execute(
+            "UPDATE work_units SET status = ?, owner = NULL, lease_token = NULL, "
+            "lease_expires = NULL WHERE unit_id = ? AND lease_token = ?",
+            (PENDING, unit['unit_id'], unit['lease_token'])
+        )
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
@@ -7,13 +7,14 @@ import json
 
 logger = get_logger()
 
-def validate_config(config_path: str) -> bool:
+def validate_config(config) -> bool:
     """
-    Validate the configuration file
+    Validate the configuration file, or an already loaded configuration dict
     """
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        if not isinstance(config, dict):
+            with open(config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
         
         required_fields = [
             'companyName',
@@ -78,6 +79,18 @@ def main():
         default='config.json',
         help='Path to configuration file'
     )
+    parser.add_argument(
+        '--mode',
+        choices=['standalone', 'coordinator', 'worker'],
+        default='standalone',
+        help='Run whole cycles locally, or coordinate/process distributed work units'
+    )
+    parser.add_argument(
+        '--worker-id',
+        type=str,
+        default=None,
+        help='Worker name in worker mode (default: hostname:pid)'
+    )
     args = parser.parse_args()
 
     try:
@@ -112,7 +125,8 @@ def main():
         )
         
         # Start the agent
-        agent.start()
+        logger.info(f"Run mode: {args.mode}")
+        agent.start(args.mode, args.worker_id)
 
     except KeyboardInterrupt:
         logger.info("Monitoring agent stopped by user")
@@ -0,0 +1,110 @@
+import heapq
+import itertools
+import math
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from logger import get_logger
+
+logger = get_logger()
+
+# Terms that hint at negative coverage before any LLM call is made.
+DEFAULT_NEGATIVE_TERMS = [
+    'scandal', 'lawsuit', 'fraud', 'layoff', 'recall', 'complaint', 'fine',
+    'breach', 'leak', 'boycott', 'bankrupt', 'investigation', 'scam', 'crash',
+    '丑闻', '诉讼', '欺诈', '裁员', '召回', '投诉', '罚款', '泄露', '抵制',
+    '破产', '调查', '骗', '维权', '暴雷', '事故', '差评', '曝光', '造假'
+]
+
+
+def _term_pattern(term: str) -> re.Pattern:
+    """
+    Match latin terms as whole words, allowing plain inflections ('fine'
+    matches 'fines' and 'fined' but not 'define' or 'refined'). Chinese
+    text has no word boundaries, so other terms match as substrings.
+    """
+    if re.fullmatch(r'[a-z0-9 ]+', term):
+        return re.compile(r'(?<![a-z0-9])' + re.escape(term) + r'(?:s|es|d|ed)?(?![a-z0-9])')
+    return re.compile(re.escape(term))
+
+
+class AnalysisPrioritizer:
+    """
+    Score scraped items so that the most important sentiment signals are
+    analyzed first when the LLM budget for a cycle is limited.
+    """
+
+    def __init__(self, config: dict):
+        self.source_weights = config.get('sourceWeights', {})
+        self.keyword_weights = config.get('keywordWeights', {})
+        self.negative_terms = [
+            term.lower()
+            for term in DEFAULT_NEGATIVE_TERMS + config.get('negativeTerms', [])
+        ]
+        self._negative_patterns = [_term_pattern(term) for term in self.negative_terms]
+        budget = config.get('analysisBudget', {})
+        # Freshness halves every `freshnessHalfLife` hours
+        self.half_life = budget.get('freshnessHalfLife', 6) * 3600
+        # Deferred items older than this are dropped instead of retried
+        self.max_age = budget.get('maxDeferredAge', 24) * 3600
+
+    def negativity_prescore(self, content: Dict) -> float:
+        """Cheap local negativity estimate in [0, 1] from keyword hits"""
+        text = f"{content.get('title', '')} {content.get('snippet', '')}".lower()
+        hits = sum(1 for pattern in self._negative_patterns if pattern.search(text))
+        return min(hits / 3.0, 1.0)
+
+    def freshness(self, content: Dict, now: float) -> float:
+        """Exponential decay factor in (0, 1] based on the item timestamp"""
+        age = max(now - content.get('timestamp', now), 0)
+        return math.pow(0.5, age / self.half_life) if self.half_life > 0 else 1.0
+
+    def score(self, content: Dict, now: Optional[float] = None) -> float:
+        """Combine source weight, negativity, keyword importance and freshness"""
+        now = now or time.time()
+        source_weight = self.source_weights.get(content.get('source'), 1.0)
+        keyword_weight = self.keyword_weights.get(content.get('keyword'), 1.0)
+        negativity = self.negativity_prescore(content)
+        return source_weight * keyword_weight * (1 + 2 * negativity) * self.freshness(content, now)
+
+    def is_expired(self, content: Dict, now: float) -> bool:
+        """Whether an item is too old to be worth carrying over"""
+        return now - content.get('timestamp', now) > self.max_age
+
+
+class AnalysisQueue:
+    """Max-priority queue of items waiting for sentiment analysis"""
+
+    def __init__(self, prioritizer: AnalysisPrioritizer):
+        self.prioritizer = prioritizer
+        self._heap: List[Tuple[float, int, Dict]] = []
+        self._counter = itertools.count()
+
+    def push(self, content: Dict, now: Optional[float] = None):
+        """Add an item, scoring it on the way in"""
+        priority = self.prioritizer.score(content, now)
+        content['analysis_priority'] = round(priority, 4)
+        # heapq is a min-heap; negate so the highest priority pops first.
+        # The counter keeps insertion order stable for equal priorities.
+        heapq.heappush(self._heap, (-priority, next(self._counter), content))
+
+    def extend(self, contents: List[Dict]):
+        """Add many items with a shared timestamp"""
+        now = time.time()
+        for content in contents:
+            self.push(content, now)
+
+    def pop(self) -> Dict:
+        """Remove and return the highest priority item"""
+        return heapq.heappop(self._heap)[2]
+
+    def drain(self) -> List[Dict]:
+        """Remove and return all remaining items in priority order"""
+        remaining = []
+        while self._heap:
+            remaining.append(self.pop())
+        return remaining
+
+    def __len__(self) -> int:
+        return len(self._heap)
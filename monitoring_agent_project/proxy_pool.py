@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from logger import get_logger
+
+logger = get_logger()
+
+
+class ProxyHealth:
+    """Exponentially weighted latency and error rate of one proxy for one host"""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency = 1.0  # seconds; neutral prior until measured
+        self.error_rate = 0.0
+        self.samples = 0
+        self.successes = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def record(self, success: bool, latency: Optional[float]):
+        self.samples += 1
+        if success:
+            self.successes += 1
+            self.latency += self.alpha * (latency - self.latency)
+        else:
+            self.failures += 1
+        self.error_rate += self.alpha * ((0.0 if success else 1.0) - self.error_rate)
+
+    def weight(self) -> float:
+        """Selection weight: favour fast proxies, penalise errors sharply"""
+        return (1.0 - self.error_rate) ** 2 / max(self.latency, 0.05)
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            'latency': round(self.latency, 3),
+            'error_rate': round(self.error_rate, 3),
+            'samples': self.samples,
+            'successes': self.successes,
+            'failures': self.failures,
+            'ejected': self.ejected_until > now,
+            'ejected_for': max(round(self.ejected_until - now, 1), 0),
+            'ejections': self.ejections
+        }
+
+
+class ProxyPool:
+    """
+    Pool of outbound proxies shared by all scrapers.
+
+    Each proxy is scored per target host. Requests pick a proxy at random,
+    weighted by its health for that host. A proxy whose error rate crosses the
+    threshold is ejected for that host. The ejection lasts longer each time
+    it happens. Once it ends, the proxy is reinstated with its error rate
+    reset. If every proxy is ejected for a host, the one whose ejection ends
+    soonest is still used, so scraping slows down instead of stopping.
+    """
+
+    def __init__(self, config: dict):
+        self._lock = threading.Lock()
+        self._health: Dict[str, Dict[str, ProxyHealth]] = {}
+        self.proxies: List[str] = []
+        self.configure(config)
+
+    def configure(self, config: dict):
+        """Apply pool settings, keeping the stats of proxies that remain"""
+        settings = config.get('proxyPool', {})
+        with self._lock:
+            self.proxies = list(dict.fromkeys(settings.get('proxies', [])))
+            self.alpha = settings.get('smoothing', 0.3)
+            self.eject_error_rate = settings.get('ejectErrorRate', 0.5)
+            self.min_samples = settings.get('minSamples', 5)
+            self.eject_seconds = settings.get('ejectSeconds', 60)
+            self.max_eject_seconds = settings.get('maxEjectSeconds', 1800)
+            for proxy in list(self._health):
+                if proxy not in self.proxies:
+                    del self._health[proxy]
+
+    def __bool__(self) -> bool:
+        return bool(self.proxies)
+
+    def _get_health(self, proxy: str, host: str) -> ProxyHealth:
+        hosts = self._health.setdefault(proxy, {})
+        if host not in hosts:
+            hosts[host] = ProxyHealth(self.alpha)
+        return hosts[host]
+
+    def select(self, host: str, exclude: Optional[List[str]] = None) -> Optional[str]:
+        """Pick a proxy for a host, or None if the pool is empty"""
+        now = time.time()
+        with self._lock:
+            candidates = [p for p in self.proxies if p not in (exclude or [])] or self.proxies
+            if not candidates:
+                return None
+
+            healthy = []
+            for proxy in candidates:
+                health = self._get_health(proxy, host)
+                if health.ejected_until and health.ejected_until <= now:
+                    # Ejection over: reinstate with a clean error record
+                    health.ejected_until = 0.0
+                    health.error_rate = 0.0
+                    health.samples = 0
+                    logger.info(f"Reinstated proxy {proxy} for {host}")
+                if not health.ejected_until:
+                    healthy.append((proxy, health))
+
+            if not healthy:
+                return min(candidates, key=lambda p: self._get_health(p, host).ejected_until)
+
+            weights = [health.weight() for _, health in healthy]
+            return random.choices([proxy for proxy, _ in healthy], weights=weights)[0]
+
+    def is_ejected(self, proxy: str, host: str) -> bool:
+        """Whether a proxy is currently ejected for a host"""
+        with self._lock:
+            return self._get_health(proxy, host).ejected_until > time.time()
+
+    def record(self, proxy: str, host: str, success: bool, latency: Optional[float] = None):
+        """Record the outcome of a request through a proxy"""
+        with self._lock:
+            if proxy not in self.proxies:
+                return
+            health = self._get_health(proxy, host)
+            health.record(success, latency)
+            if (
+                not success
+                and not health.ejected_until
+                and health.samples >= self.min_samples
+                and health.error_rate >= self.eject_error_rate
+            ):
+                duration = min(self.eject_seconds * (2 ** health.ejections), self.max_eject_seconds)
+                health.ejected_until = time.time() + duration
+                health.ejections += 1
+                logger.warning(
+                    f"Ejected proxy {proxy} for {host} for {duration}s "
+                    f"(error rate {health.error_rate:.2f})"
+                )
+
+    def get_stats(self) -> Dict:
+        """Per-proxy, per-host health snapshot for monitoring"""
+        now = time.time()
+        with self._lock:
+            return {
+                proxy: {host: health.to_dict(now) for host, health in hosts.items()}
+                for proxy, hosts in self._health.items()
+            }
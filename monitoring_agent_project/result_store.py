@@ -0,0 +1,144 @@
+import gzip
+import json
+import mmap
+import os
+from typing import Dict, Iterator, Optional
+
+from logger import get_logger
+
+logger = get_logger()
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+RESULT_PREFIX = 'results_'
+RESULT_SUFFIXES = ('.ndjson', '.ndjson.gz', '.json')
+SUMMARY_TYPE = 'summary'
+
+
+def dumps_line(record: Dict) -> bytes:
+    """Serialize a record as a single NDJSON line"""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+
+def loads_line(line: bytes) -> Dict:
+    """Parse a single NDJSON line"""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def is_result_file(filename: str) -> bool:
+    """Whether a filename looks like a saved result file"""
+    return filename.startswith(RESULT_PREFIX) and filename.endswith(RESULT_SUFFIXES)
+
+
+class ResultWriter:
+    """
+    Stream analysis results to disk as newline-delimited JSON.
+
+    Items are written one line at a time as they are produced; the aggregate
+    metrics, trend and shedding records go in a final summary line. The file
+    is written under a temporary name and renamed on close, so readers never
+    see a half-written cycle.
+    """
+
+    def __init__(self, filepath: str, compression: Optional[str] = None):
+        self.compression = compression
+        if compression == 'gzip' and not filepath.endswith('.gz'):
+            filepath += '.gz'
+        self.filepath = filepath
+        self._tmp_path = filepath + '.tmp'
+        if compression == 'gzip':
+            self._file = gzip.open(self._tmp_path, 'wb', compresslevel=5)
+        else:
+            self._file = open(self._tmp_path, 'wb', buffering=1024 * 1024)
+        self.items_written = 0
+
+    def write_item(self, item: Dict):
+        """Append one analyzed item"""
+        self._file.write(dumps_line(item))
+        self.items_written += 1
+
+    def write_summary(self, summary: Dict):
+        """Append the closing summary record"""
+        self._file.write(dumps_line({'_type': SUMMARY_TYPE, **summary}))
+
+    def close(self):
+        """Flush and atomically publish the file"""
+        self._file.close()
+        os.replace(self._tmp_path, self.filepath)
+
+    def abort(self):
+        """Discard a partially written file"""
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def iter_records(filepath: str) -> Iterator[Dict]:
+    """Lazily yield every record (items, then the summary) in a result file"""
+    if filepath.endswith('.json'):
+        # Legacy single-document format
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        yield from data.get('results', [])
+        yield {'_type': SUMMARY_TYPE, **{k: v for k, v in data.items() if k != 'results'}}
+        return
+
+    opener = gzip.open if filepath.endswith('.gz') else open
+    with opener(filepath, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads_line(line)
+
+
+def iter_items(filepath: str) -> Iterator[Dict]:
+    """Lazily yield the analyzed items in a result file"""
+    for record in iter_records(filepath):
+        if record.get('_type') != SUMMARY_TYPE:
+            yield record
+
+
+def read_summary(filepath: str) -> Optional[Dict]:
+    """
+    Read only the summary record of a result file
+
+    Uncompressed NDJSON files are memory-mapped and scanned backwards for the
+    last line, so the items are never parsed.
+    """
+    if filepath.endswith('.ndjson'):
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = len(mm)
+                while end > 0 and mm[end - 1:end] in (b'\n', b'\r'):
+                    end -= 1
+                start = mm.rfind(b'\n', 0, end) + 1
+                record = loads_line(mm[start:end])
+    else:
+        record = None
+        for record in iter_records(filepath):
+            pass
+    if record and record.get('_type') == SUMMARY_TYPE:
+        record = dict(record)
+        record.pop('_type')
+        return record
+    return None
@@ -4,7 +4,8 @@ import json
 import time
 from typing import List, Dict, Optional
 from logger import get_logger
-from urllib.parse import quote
+from proxy_pool import ProxyPool
+from urllib.parse import quote, urlparse
 
 logger = get_logger()
 
@@ -13,20 +14,39 @@ class ScrapingError(Exception):
     pass
 
 class BaseScraper:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, proxy_pool: Optional[ProxyPool] = None):
         self.config = config
+        self.proxy_pool = proxy_pool
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.apply_config(config)
+
+    def apply_config(self, config: dict):
+        """Apply new settings while keeping the session and its open connections"""
+        self.config = config
+        self.session.proxies.clear()
         if config.get('proxy'):
             self.session.proxies.update(config['proxy'])
         self.timeout = config.get('timeout', 30)
         self.retries = config.get('retries', 3)
 
     def _make_request(self, url: str, method: str = 'GET', **kwargs) -> requests.Response:
-        """Make HTTP request with retry logic"""
+        """Make HTTP request with retry logic, rotating through the proxy pool if configured"""
+        host = urlparse(url).netloc
+        tried_proxies = []
+        failed_proxy = None
         for attempt in range(self.retries):
+            proxy = self.proxy_pool.select(host, exclude=tried_proxies) if self.proxy_pool else None
+            if attempt and (proxy is None or proxy == failed_proxy or self.proxy_pool.is_ejected(proxy, host)):
+                # No fresh healthy proxy to rotate to: back off before retrying the same path
+                time.sleep(2 ** (attempt - 1))
+            if proxy:
+                tried_proxies.append(proxy)
+                kwargs['proxies'] = {'http': proxy, 'https': proxy}
+
+            started = time.monotonic()
             try:
                 response = self.session.request(
                     method=method,
@@ -35,12 +55,24 @@ class BaseScraper:
                     **kwargs
                 )
                 response.raise_for_status()
+                if proxy:
+                    self.proxy_pool.record(proxy, host, True, time.monotonic() - started)
                 return response
             except requests.RequestException as e:
+                failed_proxy = proxy
+                if proxy and self._is_proxy_failure(e):
+                    self.proxy_pool.record(proxy, host, False)
                 logger.error(f"Request failed (attempt {attempt + 1}/{self.retries}): {str(e)}")
                 if attempt == self.retries - 1:
                     raise ScrapingError(f"Failed to fetch {url} after {self.retries} attempts")
-                time.sleep(2 ** attempt)  # Exponential backoff
+
+    @staticmethod
+    def _is_proxy_failure(error: requests.RequestException) -> bool:
+        """Transport errors, 407 and 5xx count against the proxy; other 4xx come from the target site"""
+        response = getattr(error, 'response', None)
+        if response is None:
+            return True
+        return response.status_code == 407 or response.status_code >= 500
 
 class ToutiaoScraper(BaseScraper):
     def search(self, keyword: str) -> List[Dict]:
@@ -173,14 +205,18 @@ class XiaohongshuScraper(BaseScraper):
             logger.error(f"Error scraping Xiaohongshu: {str(e)}")
             return []
 
-def create_scrapers(config: dict) -> Dict:
+def create_scrapers(config: dict, proxy_pool: Optional[ProxyPool] = None) -> Dict:
     """
     Factory function to create instances of all scrapers
+
+    All scrapers share one proxy pool so proxy health is learned once per host.
     """
+    if proxy_pool is None:
+        proxy_pool = ProxyPool(config)
     return {
-        'toutiao': ToutiaoScraper(config),
-        'baidu': BaiduScraper(config),
-        'google': GoogleScraper(config),
-        'douyin': DouyinScraper(config),
-        'xiaohongshu': XiaohongshuScraper(config)
+        'toutiao': ToutiaoScraper(config, proxy_pool),
+        'baidu': BaiduScraper(config, proxy_pool),
+        'google': GoogleScraper(config, proxy_pool),
+        'douyin': DouyinScraper(config, proxy_pool),
+        'xiaohongshu': XiaohongshuScraper(config, proxy_pool)
     }